@@ -1,12 +1,32 @@
-from PIL import Image
-from io import BytesIO
-from src.utils.captcha_ocr import get_ocr_res
 import os
 import json
 from dotenv import load_dotenv
-from src.core.course_selector import get_jx0502zbid
+from src.core.course_selector import get_selection_round, get_round_cache_stats
+from src.data.course_id_cache import set_jx0502zbid
 from src.core.search_and_select_course import search_and_select_course
-from src.utils.session_manager import init_session, get_session
+from src.core.concurrent_select import CourseStatus, select_courses_concurrently
+from src.core.seat_watcher import watch_seats
+from src.core.prepare import parse_start_time, prepare
+from src.data.timetable import get_timetable
+from src.core.session_heartbeat import start_session_heartbeat, get_session_heartbeat
+from src.utils.rate_controller import (
+    configure_rate_controllers,
+    get_pacing_interval,
+    pause,
+)
+from src.core.login import (
+    simulate_login,
+    restore_session,
+    save_session_cookies,
+    visit_main_pages,
+    create_logged_in_session,
+)
+from src.utils.session_manager import (
+    init_session,
+    get_session,
+    get_pool_config,
+    init_session_pool,
+)
 import colorlog
 import logging
 import datetime
@@ -67,99 +87,6 @@ logger = setup_logger()
 load_dotenv()
 
 
-# 设置基本的URL和数据
-
-# 验证码请求URL
-RandCodeUrl = "http://zhjw.qfnu.edu.cn/verifycode.servlet"
-# 登录请求URL
-loginUrl = "http://zhjw.qfnu.edu.cn/Logon.do?method=logonLdap"
-# 初始数据请求URL
-dataStrUrl = "http://zhjw.qfnu.edu.cn/Logon.do?method=logon&flag=sess"
-
-
-def get_initial_session():
-    """
-    创建会话并获取初始数据
-    返回: 初始数据字符串
-    """
-    session = init_session()  # 初始化全局session
-    response = session.get(dataStrUrl)
-    return response.text
-
-
-def handle_captcha():
-    """
-    获取并识别验证码
-    返回: 识别出的验证码字符串
-    """
-    session = get_session()
-    response = session.get(RandCodeUrl)
-
-    if response.status_code != 200:
-        logger.error(f"请求验证码失败，状态码: {response.status_code}")
-        return None
-
-    try:
-        image = Image.open(BytesIO(response.content))
-    except Exception as e:
-        logger.error(f"无法识别图像文件: {e}")
-        return None
-
-    return get_ocr_res(image)
-
-
-def generate_encoded_string(data_str, user_account, user_password):
-    """
-    生成登录所需的encoded字符串
-    参数:
-        data_str: 初始数据字符串
-        user_account: 用户账号
-        user_password: 用户密码
-    返回: encoded字符串
-    """
-    res = data_str.split("#")
-    code, sxh = res[0], res[1]
-    data = f"{user_account}%%%{user_password}"
-    encoded = ""
-    b = 0
-
-    for a in range(len(code)):
-        if a < 20:
-            encoded += data[a]
-            for _ in range(int(sxh[a])):
-                encoded += code[b]
-                b += 1
-        else:
-            encoded += data[a:]
-            break
-    return encoded
-
-
-def login(user_account, user_password, random_code, encoded):
-    """
-    执行登录操作
-    返回: 登录响应结果
-    """
-    session = get_session()
-    headers = {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-        "Content-Type": "application/x-www-form-urlencoded",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36",
-        "Origin": "http://zhjw.qfnu.edu.cn",
-        "Referer": "http://zhjw.qfnu.edu.cn/",
-        "Upgrade-Insecure-Requests": "1",
-    }
-
-    data = {
-        "userAccount": user_account,
-        "userPassword": user_password,
-        "RANDOMCODE": random_code,
-        "encoded": encoded,
-    }
-
-    return session.post(loginUrl, headers=headers, data=data, timeout=1000)
-
-
 def get_user_config():
     """
     获取用户配置
@@ -169,6 +96,8 @@ def get_user_config():
         select_semester: 选课学期
         mode: 选课模式
         courses: 课程列表
+        max_workers: 并发模式的最大工作线程数
+        start_time: 选课开始时间，为None表示立即开始选课
     """
     # 检查配置文件是否存在
     if not os.path.exists("config.json"):
@@ -182,6 +111,8 @@ def get_user_config():
             "feishu_webhook": "",
             "feishu_secret": "",
             "mode": "snipe",
+            "max_workers": 4,
+            "start_time": "",
             "courses": [
                 {
                     "course_id_or_name": "",
@@ -205,6 +136,13 @@ def get_user_config():
     with open("config.json", "r", encoding="utf-8") as f:
         config = json.load(f)
 
+    return parse_user_config(config)
+
+
+def parse_user_config(config):
+    """
+    校验配置内容并取出运行所需的字段，返回值与get_user_config相同
+    """
     # 验证必填字段
     required_fields = ["user_account", "user_password"]
     for field in required_fields:
@@ -232,8 +170,16 @@ def get_user_config():
                 "必须是 1-7 之间的数字"
             )
 
+    # 验证选课开始时间
+    try:
+        start_time = parse_start_time(config.get("start_time"))
+    except ValueError:
+        raise ValueError(
+            f"start_time 格式错误: {config['start_time']}，必须形如 2025-02-20 12:00:00"
+        )
+
     # 验证选课模式
-    valid_modes = ["fast", "normal", "snipe"]
+    valid_modes = ["fast", "normal", "snipe", "concurrent", "watch"]
     if config.get("mode") and config["mode"] not in valid_modes:
         logger.warning(f"无效的选课模式: {config['mode']}，将使用默认的 fast 模式")
         config["mode"] = "fast"
@@ -244,36 +190,11 @@ def get_user_config():
         config["select_semester"],
         config.get("mode", "fast"),
         config.get("courses", []),
+        int(config.get("max_workers", 4)),
+        start_time,
     )
 
 
-def simulate_login(user_account, user_password):
-    """
-    模拟登录过程
-    返回: 是否登录成功
-    """
-    data_str = get_initial_session()
-
-    for attempt in range(3):
-        random_code = handle_captcha()
-        logger.info(f"验证码: {random_code}")
-        encoded = generate_encoded_string(data_str, user_account, user_password)
-        response = login(user_account, user_password, random_code, encoded)
-
-        if response.status_code == 200:
-            if "验证码错误!!" in response.text:
-                logger.warning(f"验证码识别错误，重试第 {attempt + 1} 次")
-                continue
-            if "密码错误" in response.text:
-                raise Exception("用户名或密码错误")
-            logger.info("登录成功")
-            return True
-        else:
-            raise Exception("登录失败")
-
-    raise Exception("验证码识别错误，请重试")
-
-
 def print_welcome():
     logger.info(f"\n{'*' * 10} 曲阜师范大学教务系统抢课脚本 {'*' * 10}\n")
     logger.info("By W1ndys")
@@ -300,34 +221,62 @@ def print_welcome():
     logger.info("5. 开发者对使用本脚本造成的任何直接或间接损失不承担任何责任。")
 
 
-def select_courses(courses, mode, select_semester):
+def select_courses(courses, mode, select_semester, max_workers=4, on_selected=None):
     # 创建一个字典来跟踪每个课程的选课状态
     course_status = {
         f"{c['course_id_or_name']}-{c['teacher_name']}": False for c in courses
     }
+    # 与已选课程时间冲突、不再为其选课的课程
+    skipped_courses = set()
+
+    # 各模式使用对应的请求间隔预设，之后根据服务器的响应情况自动调整
+    configure_rate_controllers(mode)
+
+    def mark_selected(course):
+        course_key = f"{course['course_id_or_name']}-{course['teacher_name']}"
+        course_status[course_key] = True
+        if on_selected:
+            on_selected(course_key)
 
     if mode == "fast":
-        # 高速模式：以最快速度持续尝试选课
+        # 高速模式：以最快速度持续尝试选课，同时向所有选课分类发送请求
         for course in courses:
-            result = search_and_select_course(course)
+            result = search_and_select_course(course, concurrent=True)
             if result:
-                course_status[
-                    f"{course['course_id_or_name']}-{course['teacher_name']}"
-                ] = True
+                mark_selected(course)
 
             # 检查是否所有课程都已选上
             if all(course_status.values()):
                 logger.info("所有课程已选择成功，程序即将退出...")
                 exit(0)
 
+            # 服务器正常时不等待，过载时自动退避
+            pause()
+
+    elif mode == "concurrent":
+        # 并发模式：在有界线程池中同时为所有课程选课，每门课程选上后对应线程即退出
+        status = select_courses_concurrently(
+            courses, max_workers, CourseStatus(courses, on_selected)
+        )
+        if status.all_selected():
+            logger.info("所有课程已选择成功，程序即将退出...")
+            exit(0)
+
+    elif mode == "watch":
+        # 监控模式：轮询公选课搜索接口的剩余名额，出现名额时才发送选课请求
+        status = watch_seats(
+            courses, select_semester, CourseStatus(courses, on_selected), max_workers
+        )
+        if status.all_selected():
+            logger.info("所有课程已选择成功，程序即将退出...")
+            exit(0)
+
     elif mode == "normal":
         # 普通模式：正常速度选课，每次请求间隔较长
         for course in courses:
             result = search_and_select_course(course)
             if result:
-                course_status[
-                    f"{course['course_id_or_name']}-{course['teacher_name']}"
-                ] = True
+                mark_selected(course)
 
             # 检查是否所有课程都已选上
             if all(course_status.values()):
@@ -335,114 +284,150 @@ def select_courses(courses, mode, select_semester):
                 exit(0)
 
             logger.info(
-                f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课操作结束，等待5秒后继续选下一节课"
+                f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课操作结束，等待{get_pacing_interval():.1f}秒后继续选下一节课"
             )
-            time.sleep(5)
+            pause()
 
     elif mode == "snipe":
-        # 截胡模式：每次选课前刷新轮次，持续执行选课操作
+        # 截胡模式：每次选课前确认轮次，持续执行选课操作
         session = get_session()
         while True:
             # 检查是否所有课程都已选上
             if all(course_status.values()):
                 logger.info("所有课程已选择成功，程序即将退出...")
                 exit(0)
-
-            # 每次选课前刷新选课轮次ID
-            current_jx0502zbid = get_jx0502zbid(session, select_semester)
-            if not current_jx0502zbid:
+            if all(
+                selected or course_key in skipped_courses
+                for course_key, selected in course_status.items()
+            ):
                 logger.warning(
-                    "获取选课轮次失败，1秒后重试...若持续失败，可能是账号被踢，请重新运行脚本"
+                    f"其余课程【{'、'.join(sorted(skipped_courses))}】与已选课程时间冲突，程序即将退出..."
                 )
-                time.sleep(1)
-                continue
+                exit(0)
 
-            response = session.get(
-                f"http://zhjw.qfnu.edu.cn/jsxsd/xsxk/xsxk_index?jx0502zbid={current_jx0502zbid}"
-            )
-            logger.debug(f"选课页面响应状态码: {response.status_code}")
+            # 每次选课前确认选课轮次，缓存有效时不再请求轮次列表和选课页面
+            try:
+                current_jx0502zbid = get_selection_round(session, select_semester)
+            except Exception as e:
+                logger.warning(f"获取选课轮次出错: {e}")
+                current_jx0502zbid = None
+            if not current_jx0502zbid:
+                heartbeat = get_session_heartbeat()
+                if heartbeat is None:
+                    logger.warning(
+                        "获取选课轮次失败，1秒后重试...若持续失败，可能是账号被踢，请重新运行脚本"
+                    )
+                    time.sleep(1)
+                    continue
+                # 可能是账号被踢，让心跳线程立即检查，等检查（以及可能的重新登录）
+                # 真正结束后再等待会话可用，然后继续本轮选课
+                logger.warning("获取选课轮次失败，正在检查登录状态...")
+                heartbeat.check_now().wait()
+                heartbeat.wait_until_alive()
+                continue
+            set_jx0502zbid(current_jx0502zbid)
 
             # 执行选课操作
             for course in courses:
-                # 如果该课程已经选上，则跳过
-                if course_status[
-                    f"{course['course_id_or_name']}-{course['teacher_name']}"
-                ]:
+                # 如果该课程已经选上或时间冲突，则跳过
+                course_key = f"{course['course_id_or_name']}-{course['teacher_name']}"
+                if course_status[course_key] or course_key in skipped_courses:
                     continue
 
-                result = search_and_select_course(course)
+                result = search_and_select_course(course, concurrent=True)
                 if result:
-                    course_status[
-                        f"{course['course_id_or_name']}-{course['teacher_name']}"
-                    ] = True
+                    mark_selected(course)
+                elif result is None:
+                    skipped_courses.add(course_key)
                 logger.info(
                     f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课操作结束"
                 )
 
-            logger.info("本轮选课操作完成，2秒后开始新一轮选课...")
-            time.sleep(2)
+            round_stats = get_round_cache_stats()
+            logger.info(
+                f"本轮选课操作完成，{get_pacing_interval():.1f}秒后开始新一轮选课..."
+                f"（选课轮次缓存已节省 {round_stats['saved_requests']} 个请求）"
+            )
+            pause()
     else:
         logger.warning(
-            "模式错误，请检查配置文件的mode字段是否为fast、normal或snipe，即将默认使用snipe模式"
+            "模式错误，请检查配置文件的mode字段是否为fast、normal、snipe、concurrent或watch，即将默认使用snipe模式"
         )
         mode = "snipe"
-        select_courses(courses, mode, select_semester)
-
-
-def main():
+        select_courses(courses, mode, select_semester, max_workers, on_selected)
+
+
+def run_account(
+    user_account,
+    user_password,
+    select_semester,
+    mode,
+    courses,
+    max_workers,
+    start_time,
+    on_logged_in=None,
+    on_selected=None,
+):
     """
-    主函数，协调整个程序的执行流程
-    """
-    print_welcome()
-
-    # 获取环境变量
-    user_account, user_password, select_semester, mode, courses = get_user_config()
-
-    if user_account:
-        logger.info("成功获取配置文件")
-        logger.info(f"用户名: {user_account}")
+    为一个账号登录并选课，直到选课结束
 
+    Args:
+        on_logged_in: 登录成功并进入选课轮次后的回调
+        on_selected: 课程选上后的回调，参数为课程键
+    """
     while True:  # 添加外层循环
         try:
-            # 模拟登录
-            if not simulate_login(user_account, user_password):
-                logger.error("无法建立会话，请检查网络连接或教务系统的可用性。")
-                time.sleep(1)  # 添加重试间隔
-                continue  # 重试登录
+            # 优先复用本地保存的登录状态，失效时再模拟登录
+            if not restore_session(init_session(), user_account):
+                if not simulate_login(user_account, user_password):
+                    logger.error("无法建立会话，请检查网络连接或教务系统的可用性。")
+                    time.sleep(1)  # 添加重试间隔
+                    continue  # 重试登录
+
+                session = get_session()
+                if not session:
+                    logger.error("无法建立会话，请检查网络连接或教务系统的可用性。")
+                    time.sleep(1)
+                    continue
+
+                # 访问主页和选课页面
+                visit_main_pages(session)
+                save_session_cookies(session, user_account)
 
             session = get_session()
-            if not session:
-                logger.error("无法建立会话，请检查网络连接或教务系统的可用性。")
-                time.sleep(1)
-                continue
 
-            # 访问主页和选课页面
-            for page_url in [
-                "http://zhjw.qfnu.edu.cn/jsxsd/framework/xsMain.jsp",
-                "http://zhjw.qfnu.edu.cn/jsxsd/xsxk/xklc_list",
-            ]:
-                for attempt in range(3):
-                    try:
-                        response = session.get(page_url)
-                        logger.debug(f"页面响应状态码: {response.status_code}")
-                        if response.status_code == 200:
-                            break
-                    except Exception as e:
-                        if attempt == 2:
-                            logger.error(f"访问页面失败: {str(e)}")
-                            raise
-                        logger.warning(f"访问页面失败，正在进行第{attempt + 2}次尝试")
-                        continue
-
-            # 获取选课轮次编号
-            jx0502zbid = get_jx0502zbid(session, select_semester)
+            # 获取选课轮次编号并进入选课页面，结果在有效期内缓存
+            jx0502zbid = get_selection_round(session, select_semester)
             if jx0502zbid:
                 logger.critical(f"成功获取到选课轮次ID: {jx0502zbid}")
-                response = session.get(
-                    f"http://zhjw.qfnu.edu.cn/jsxsd/xsxk/xsxk_index?jx0502zbid={jx0502zbid}"
+                set_jx0502zbid(jx0502zbid)
+                if on_logged_in:
+                    on_logged_in()
+                # 后台检查登录状态，被踢下线时原地重新登录
+                start_session_heartbeat(
+                    session,
+                    user_account,
+                    user_password,
+                    select_semester,
+                    get_pool_config()["heartbeat_interval"],
                 )
-                logger.debug(f"选课页面响应状态码: {response.status_code}")
-                select_courses(courses, mode, select_semester)
+                session_pool_size = get_pool_config()["session_pool_size"]
+                if session_pool_size > 1:
+                    # 再登录session_pool_size-1个独立会话，与当前会话一起轮流使用
+                    init_session_pool(
+                        session_pool_size,
+                        lambda: create_logged_in_session(
+                            user_account, user_password, select_semester
+                        ),
+                    )
+                # 获取一次已选课程的上课时间，之后与其冲突的课程不再发送选课请求
+                get_timetable(session)
+                if start_time and start_time > datetime.datetime.now(
+                    datetime.timezone.utc
+                ):
+                    # 准备阶段：提前解析课程并等待，开始时间到达后只发送选课请求
+                    prepare(courses, start_time)
+                select_courses(courses, mode, select_semester, max_workers, on_selected)
                 break  # 成功后退出循环
             else:
                 logger.warning("获取选课轮次编号失败，正在重新登录...")
@@ -455,5 +440,22 @@ def main():
             continue  # 重新登录
 
 
+def main():
+    """
+    主函数，协调整个程序的执行流程
+    """
+    print_welcome()
+
+    # 获取环境变量
+    user_config = get_user_config()
+    user_account = user_config[0]
+
+    if user_account:
+        logger.info("成功获取配置文件")
+        logger.info(f"用户名: {user_account}")
+
+    run_account(*user_config)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener
+from main import logger, print_welcome, parse_user_config, run_account
+from src.utils.config_loader import set_config
+from src.utils.json_store import CACHE_DIR, set_cache_dir
+from src.utils.captcha_ocr import get_ocr_engine_config, preload_ocr
+
+# 多账号配置文件路径
+ACCOUNTS_FILE = "accounts.json"
+# 汇总输出各账号状态的间隔（秒）
+STATUS_INTERVAL = 30
+
+
+def load_account_configs(path=ACCOUNTS_FILE):
+    """
+    读取多账号配置
+
+    配置文件可以是账号配置的列表，也可以是 {"shared": 公共配置, "accounts": 账号配置列表}，
+    每个账号配置与config.json的格式相同，未填写的字段使用公共配置
+
+    Returns:
+        list: 每个账号的完整配置
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        shared, accounts = {}, data
+    else:
+        shared, accounts = data.get("shared", {}), data.get("accounts", [])
+    return [{**shared, **account} for account in accounts]
+
+
+class AccountStatus:
+    """父进程中记录的单个账号的运行状态"""
+
+    def __init__(self, user_account, total_courses):
+        self.user_account = user_account
+        self.total_courses = total_courses
+        self.state = "等待启动"
+        self.started_at = None
+        self.logged_in_at = None
+        self.finished_at = None
+        self.selected = {}
+        self.error = None
+
+    def elapsed(self):
+        return (self.finished_at or time.time()) - (self.started_at or time.time())
+
+    def __str__(self):
+        text = (
+            f"【{self.user_account}】{self.state}，"
+            f"已选上 {len(self.selected)}/{self.total_courses} 门课程，"
+            f"运行 {self.elapsed():.0f} 秒"
+        )
+        if self.logged_in_at:
+            text += f"，登录耗时 {self.logged_in_at - self.started_at:.1f} 秒"
+        if self.error:
+            text += f"，错误: {self.error}"
+        return text
+
+
+def run_account_process(config, status_queue, log_queue):
+    """子进程入口：使用该账号的配置运行选课，通过队列上报状态和日志"""
+    user_account = config.get("user_account", "")
+
+    # 日志交给父进程统一输出，每条日志带上账号
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    handler = QueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter(f"[{user_account}] %(message)s"))
+    root_logger.addHandler(handler)
+
+    def report(event, data=None):
+        status_queue.put((user_account, event, data, time.time()))
+
+    set_config(config)
+    # 课程缓存、分类记录和课程数据库都与学生的培养方案有关，每个账号单独保存，
+    # 也避免多个进程同时改写同一个文件
+    set_cache_dir(get_account_cache_dir(user_account))
+    report("started")
+    try:
+        run_account(
+            *parse_user_config(config),
+            on_logged_in=lambda: report("logged_in"),
+            on_selected=lambda course_key: report("selected", course_key),
+        )
+    except SystemExit:
+        pass
+    except Exception as e:
+        logging.error(f"运行出错: {e}")
+        report("error", str(e))
+    finally:
+        report("finished")
+
+
+def get_account_cache_dir(user_account):
+    """账号的缓存目录"""
+    return os.path.join(CACHE_DIR, f"account_{user_account}")
+
+
+def get_mp_context():
+    """优先使用fork，子进程直接共享父进程中已加载的识别模型"""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def handle_event(statuses, user_account, event, data, timestamp):
+    status = statuses[user_account]
+    if event == "started":
+        status.state = "登录中"
+        status.started_at = timestamp
+    elif event == "logged_in":
+        status.state = "选课中"
+        status.logged_in_at = timestamp
+    elif event == "selected":
+        status.selected[data] = timestamp
+        logger.critical(
+            f"【{user_account}】课程【{data}】选课成功，"
+            f"耗时 {timestamp - status.started_at:.1f} 秒"
+        )
+    elif event == "error":
+        status.error = data
+    elif event == "finished":
+        status.finished_at = timestamp
+        if status.error:
+            status.state = "出错退出"
+        elif len(status.selected) == status.total_courses:
+            status.state = "全部选上"
+        else:
+            status.state = "已结束"
+
+
+def orchestrate(configs):
+    """
+    每个账号在独立的子进程中运行，会话、登录状态、选课进度和缓存目录互相隔离；
+    日志输出在父进程中只初始化一次，各账号的识别引擎配置相同时识别模型也只加载一次
+
+    Args:
+        configs: 每个账号的完整配置
+
+    Returns:
+        dict: 账号到运行状态的映射
+    """
+    ctx = get_mp_context()
+    engine_configs = [get_ocr_engine_config(config) for config in configs]
+    if ctx.get_start_method() == "fork" and all(
+        engine_config == engine_configs[0] for engine_config in engine_configs
+    ):
+        # 所有账号的识别引擎配置相同时，按该配置在父进程中加载一次识别模型，
+        # fork出的子进程写时复制共享；配置不同时由各子进程按自己的配置加载
+        preload_ocr(engine_configs[0])
+
+    status_queue = ctx.Queue()
+    log_queue = ctx.Queue()
+    listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    listener.start()
+
+    statuses = {}
+    processes = {}
+    for config in configs:
+        user_account = config.get("user_account", "")
+        statuses[user_account] = AccountStatus(
+            user_account, len(config.get("courses", []))
+        )
+        processes[user_account] = ctx.Process(
+            target=run_account_process,
+            args=(config, status_queue, log_queue),
+            name=f"account-{user_account}",
+        )
+    logger.critical(f"共 {len(configs)} 个账号，进程启动方式: {ctx.get_start_method()}")
+    for process in processes.values():
+        process.start()
+
+    last_report = time.time()
+    try:
+        while any(p.is_alive() for p in processes.values()) or not status_queue.empty():
+            try:
+                handle_event(statuses, *status_queue.get(timeout=1))
+            except queue.Empty:
+                pass
+            if time.time() - last_report >= STATUS_INTERVAL:
+                last_report = time.time()
+                for status in statuses.values():
+                    logger.info(str(status))
+    except KeyboardInterrupt:
+        logger.warning("收到中断信号，正在停止所有账号...")
+        for process in processes.values():
+            process.terminate()
+    finally:
+        for user_account, process in processes.items():
+            process.join()
+            status = statuses[user_account]
+            if status.finished_at is None:
+                status.finished_at = time.time()
+                status.state = f"异常退出（退出码 {process.exitcode}）"
+        listener.stop()
+
+    logger.critical("所有账号运行结束:")
+    for status in statuses.values():
+        logger.critical(str(status))
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号同时选课")
+    parser.add_argument(
+        "accounts_file", nargs="?", default=ACCOUNTS_FILE, help="多账号配置文件"
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.accounts_file):
+        logger.error(f"多账号配置文件 {args.accounts_file} 不存在")
+        sys.exit(1)
+
+    print_welcome()
+    configs = load_account_configs(args.accounts_file)
+    for config in configs:
+        # 启动子进程前先校验所有账号的配置
+        parse_user_config(config)
+    orchestrate(configs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.session_manager import get_pool_config
+
+# 所有选课请求共用的线程池，各线程共享会话池中的会话及其连接池
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_oper_executor():
+    """
+    获取发送选课请求的线程池，首次调用时创建
+
+    线程数与所有会话的连接数之和（pool_maxsize × session_pool_size）相同，
+    多门课程同时向各分类发送的请求不会因为线程不足而分批发出
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            pool_config = get_pool_config()
+            max_workers = max(
+                1,
+                int(pool_config["pool_maxsize"])
+                * max(1, int(pool_config["session_pool_size"])),
+            )
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="oper"
+            )
+        return _executor
+
+
+async def _send_one(
+    category, method_name, method_func, course_name, course_jx02id_and_jx0404id
+):
+    """在线程池中发送单个分类的选课请求"""
+    loop = asyncio.get_running_loop()
+    result, message = await loop.run_in_executor(
+        get_oper_executor(), method_func, course_name, course_jx02id_and_jx0404id
+    )
+    return category, method_name, result, message
+
+
+async def send_course_data_concurrently_async(
+    course_name, course_jx02id_and_jx0404id, selection_methods, on_success=None
+):
+    """
+    同时发送所有分类的选课请求，取第一个成功的结果
+
+    Args:
+        course_name: 课程名称
+        course_jx02id_and_jx0404id: 包含jx02id和jx0404id的字典
+        selection_methods: [(分类, 选课方式名称, 选课函数), ...]
+        on_success: 选课成功时以成功的分类为参数调用的回调函数
+
+    Returns:
+        tuple: (result, message)，各分类的结果含义与send_oper_request（见parse_oper_response）相同：
+            - True, None: 任一分类选课成功
+            - False, message: 全部失败，message为各分类失败原因汇总
+            - None, message: 全部发生异常
+    """
+    tasks = [
+        asyncio.create_task(
+            _send_one(
+                category,
+                method_name,
+                method_func,
+                course_name,
+                course_jx02id_and_jx0404id,
+            )
+        )
+        for category, method_name, method_func in selection_methods
+    ]
+    error_messages = []
+    has_failure = False
+
+    try:
+        for finished in asyncio.as_completed(tasks):
+            category, method_name, result, message = await finished
+            if result is True:
+                logging.info(f"【{course_name}】通过【{method_name}】选课成功")
+                if on_success:
+                    on_success(category)
+                return True, None
+            elif result is False:
+                has_failure = True
+                error_messages.append(f"【{method_name}】失败: {message}")
+            else:
+                error_messages.append(f"【{method_name}】发生异常: {message}")
+    finally:
+        # 已经发出的请求无法撤回，取消只是不再等待其结果
+        for task in tasks:
+            task.cancel()
+
+    return (False if has_failure else None), "\n\n".join(error_messages)
+
+
+def send_course_data_concurrently(
+    course_name, course_jx02id_and_jx0404id, selection_methods, on_success=None
+):
+    """send_course_data_concurrently_async的同步入口"""
+    return asyncio.run(
+        send_course_data_concurrently_async(
+            course_name, course_jx02id_and_jx0404id, selection_methods, on_success
+        )
+    )
@@ -0,0 +1,136 @@
+"""
+选课请求构建开销的基准测试
+
+对比旧版每次调用都重新构建请求地址、参数和请求头、每次都从环境变量查找代理设置的写法，
+与预先构建请求模板、按主机缓存代理设置的写法。请求由一个直接返回固定响应的适配器处理，
+不访问网络，测得的就是每次调用在本地的开销
+
+用法:
+    python -m src.core.benchmark_send_course_data
+    python -m src.core.benchmark_send_course_data --calls 20000
+"""
+
+import time
+import logging
+import argparse
+from unittest import mock
+from functools import partial
+from requests import Request, Response, Session
+from requests.adapters import BaseAdapter
+from src.utils.session_manager import create_browser_session
+from src.core import send_course_data
+from src.core.send_course_data import get_oper_template, send_oper_request
+
+COURSE_IDS = {"jx02id": "3F2A9C0B1D7E4A", "jx0404id": "202420252012345"}
+RESPONSE_BODY = b'{"success":false,"message":"\\u9009\\u8bfe\\u5931\\u8d25"}'
+
+
+class StubAdapter(BaseAdapter):
+    """直接返回固定响应的适配器"""
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.status_code = 200
+        response._content = RESPONSE_BODY
+        response.headers["Content-Type"] = "application/json"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def legacy_build(course_jx02id_and_jx0404id):
+    """旧版的选课请求写法，每次调用都重新构建地址、参数和请求头"""
+    url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/ggxxkxkOper"
+    params = {
+        "kcid": course_jx02id_and_jx0404id["jx02id"],
+        "cfbs": "null",
+        "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
+        "xkzy": "",
+        "trjf": "",
+        "_": str(int(time.time() * 1000)),
+    }
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
+        "Accept": "*/*",
+        "X-Requested-With": "XMLHttpRequest",
+        "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInGgxxkxk",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
+    }
+    return url, params, headers
+
+
+def legacy_send(session, course_name, course_jx02id_and_jx0404id):
+    url, params, headers = legacy_build(course_jx02id_and_jx0404id)
+    response = session.get(url, params=params, headers=headers)
+    return response.json()
+
+
+def legacy_prepare(session):
+    url, params, headers = legacy_build(COURSE_IDS)
+    return session.prepare_request(Request("GET", url, params=params, headers=headers))
+
+
+def template_prepare(session):
+    template = get_oper_template("ggxxkxk", COURSE_IDS)
+    return session.prepare_request(
+        Request("GET", template.url(), headers=template.headers)
+    )
+
+
+def measure(func, calls):
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="选课请求构建开销基准测试")
+    parser.add_argument("--calls", type=int, default=10000, help="每种写法的调用次数")
+    args = parser.parse_args()
+
+    # 只测请求本身的开销，关闭日志输出
+    logging.disable(logging.CRITICAL)
+    session = create_browser_session()
+    session.mount("http://", StubAdapter())
+    # 旧版的会话每次请求都从环境变量中查找代理设置
+    legacy_session = create_browser_session()
+    legacy_session.mount("http://", StubAdapter())
+    legacy_session.merge_environment_settings = partial(
+        Session.merge_environment_settings, legacy_session
+    )
+
+    build_only = {
+        "旧版: 构建参数并准备请求": lambda: legacy_prepare(legacy_session),
+        "模板: 拼接时间戳并准备请求": lambda: template_prepare(session),
+    }
+    full_call = {
+        "旧版: 完整选课调用": lambda: legacy_send(
+            legacy_session, "benchmark", COURSE_IDS
+        ),
+        "模板: 完整选课调用": lambda: send_oper_request(
+            "ggxxkxk", "benchmark", COURSE_IDS
+        ),
+    }
+
+    with mock.patch.object(send_course_data, "get_session", return_value=session):
+        for title, cases in (("构建请求", build_only), ("完整调用", full_call)):
+            print(f"\n{title}（{args.calls} 次）")
+            results = {}
+            for name, func in cases.items():
+                measure(func, min(args.calls, 500))  # 预热
+                results[name] = measure(func, args.calls)
+                print(f"  {name:<20}{results[name]:>10.1f} µs/次")
+            legacy, template = results.values()
+            print(
+                f"  每次调用节省 {legacy - template:.1f} µs（{1 - template / legacy:.0%}）"
+            )
+
+
+if __name__ == "__main__":
+    main()
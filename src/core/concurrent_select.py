@@ -0,0 +1,151 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.search_and_select_course import search_and_select_course
+from src.utils.rate_controller import get_pacing_interval
+
+# 选课失败后重试的最短和最长间隔（秒），连续失败时在两者之间指数退避，
+# 与选课模式的请求间隔取较大值，避免无法选上的课程不停地发送搜索和选课请求
+MIN_RETRY_INTERVAL = 0.5
+MAX_RETRY_INTERVAL = 8
+
+
+def get_course_key(course):
+    """获取课程在状态表中的键"""
+    return f"{course['course_id_or_name']}-{course['teacher_name']}"
+
+
+class CourseStatus:
+    """线程安全的课程选课状态表"""
+
+    def __init__(self, courses, on_selected=None):
+        """
+        Args:
+            courses: 课程列表
+            on_selected: 课程选上后的回调，参数为课程键
+        """
+        self._lock = threading.Lock()
+        self._status = {get_course_key(course): False for course in courses}
+        # 因时间冲突等原因不会再选课的课程
+        self._skipped = set()
+        self._on_selected = on_selected
+
+    def mark_selected(self, course):
+        with self._lock:
+            self._status[get_course_key(course)] = True
+        if self._on_selected:
+            self._on_selected(get_course_key(course))
+
+    def is_selected(self, course):
+        with self._lock:
+            return self._status[get_course_key(course)]
+
+    def mark_skipped(self, course):
+        with self._lock:
+            self._skipped.add(get_course_key(course))
+
+    def is_done(self, course):
+        """课程已选上或已放弃选课"""
+        course_key = get_course_key(course)
+        with self._lock:
+            return self._status[course_key] or course_key in self._skipped
+
+    def all_selected(self):
+        with self._lock:
+            return all(self._status.values())
+
+    def all_done(self):
+        """所有课程都已选上或已放弃选课"""
+        with self._lock:
+            return all(
+                selected or course_key in self._skipped
+                for course_key, selected in self._status.items()
+            )
+
+    def skipped(self):
+        """已放弃选课的课程键"""
+        with self._lock:
+            return set(self._skipped)
+
+    def snapshot(self):
+        """返回当前状态的副本"""
+        with self._lock:
+            return dict(self._status)
+
+
+def get_retry_interval(failures):
+    """连续失败failures次后重试前等待的秒数"""
+    backoff = min(MAX_RETRY_INTERVAL, MIN_RETRY_INTERVAL * 2 ** (failures - 1))
+    return max(get_pacing_interval(), backoff)
+
+
+def _select_until_success(course, course_status, stop_event):
+    """
+    持续为单个课程选课，直到选课成功、确定无法选上或收到停止信号
+
+    每次失败后至少等待MIN_RETRY_INTERVAL秒再重试，连续失败时指数退避；
+    选课失败的通知只在第一次失败时发送
+    """
+    course_key = get_course_key(course)
+    attempt = 0
+    while not stop_event.is_set() and not course_status.is_done(course):
+        attempt += 1
+        result = search_and_select_course(
+            course, concurrent=True, notify_failure=attempt == 1
+        )
+        if result:
+            course_status.mark_selected(course)
+            logging.critical(f"课程【{course_key}】第 {attempt} 次尝试选课成功")
+            return True
+        if result is None:
+            # 与已选课程时间冲突，冲突已在检查时输出，该线程直接退出
+            course_status.mark_skipped(course)
+            return False
+        interval = get_retry_interval(attempt)
+        logging.info(
+            f"课程【{course_key}】第 {attempt} 次尝试选课失败，{interval:.1f}秒后继续尝试"
+        )
+        # 收到停止信号时立即结束等待
+        stop_event.wait(interval)
+    return False
+
+
+def select_courses_concurrently(courses, max_workers, course_status=None):
+    """
+    在有界线程池中同时为所有课程选课，所有请求共享同一个会话
+
+    Args:
+        courses: 课程列表
+        max_workers: 最大工作线程数
+        course_status: 课程选课状态表，默认新建
+
+    Returns:
+        CourseStatus: 选课结束后的状态表
+    """
+    if course_status is None:
+        course_status = CourseStatus(courses)
+    pending_courses = [c for c in courses if not course_status.is_done(c)]
+    if not pending_courses:
+        return course_status
+
+    stop_event = threading.Event()
+    max_workers = max(1, min(max_workers, len(pending_courses)))
+    logging.info(
+        f"并发选课开始，共 {len(pending_courses)} 门课程，{max_workers} 个工作线程"
+    )
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="course")
+    try:
+        futures = [
+            executor.submit(_select_until_success, course, course_status, stop_event)
+            for course in pending_courses
+        ]
+        for future in futures:
+            future.result()
+    finally:
+        # 主线程被中断时通知所有工作线程退出
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return course_status
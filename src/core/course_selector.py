@@ -1,8 +1,26 @@
 import re
+import json
+import time
 import logging
+import threading
 from typing import Optional
 from bs4 import BeautifulSoup
 from requests.exceptions import RequestException
+from src.utils.config_loader import load_config
+from src.utils.session_manager import (
+    add_response_observer,
+    on_session_unhealthy,
+    get_all_sessions,
+)
+
+# 选课页面地址，进入后服务器才会接受该轮次的搜索和选课请求
+XSXK_INDEX_URL = "http://zhjw.qfnu.edu.cn/jsxsd/xsxk/xsxk_index"
+# 选课轮次缓存的有效期（秒）
+DEFAULT_ROUND_TTL = 60
+# 选课请求返回这些关键字时认为选课轮次或选课页面已失效
+ROUND_STALE_KEYWORDS = ("轮次", "未开放", "不在选课时间", "进入选课")
+# 搜索和选课接口的路径，这些接口返回404时说明没有进入选课页面
+XSXKKC_PATH = "/jsxsd/xsxkkc/"
 
 
 def get_jx0502zbid(session, select_semester):
@@ -73,64 +91,225 @@ def get_jx0502zbid(session, select_semester):
         raise
 
 
-def get_xxxk_course_list(session):
+def enter_selection_round(session, jx0502zbid):
+    """
+    进入选课轮次对应的选课页面
+    参数:
+        session: 已登录的会话
+        jx0502zbid: 选课轮次编号
+    """
+    response = session.get(f"{XSXK_INDEX_URL}?jx0502zbid={jx0502zbid}")
+    logging.debug(f"选课页面响应状态码: {response.status_code}")
+
+
+def get_round_ttl():
+    """获取选课轮次缓存的有效期，config.json的round_cache_ttl优先"""
+    try:
+        return load_config().get("round_cache_ttl", DEFAULT_ROUND_TTL)
+    except (FileNotFoundError, ValueError):
+        return DEFAULT_ROUND_TTL
+
+
+def is_round_stale_message(message):
+    """判断选课失败信息是否表示选课轮次或选课页面已失效"""
+    return bool(message) and any(k in str(message) for k in ROUND_STALE_KEYWORDS)
+
+
+class SelectionRoundCache:
+    """
+    缓存选课轮次编号和是否已进入选课页面
+
+    截胡模式每轮都需要确认选课轮次，命中缓存时省去获取轮次列表和进入选课页面的请求；
+    超过有效期或选课请求表明轮次已失效时才重新获取。进入选课页面是每个会话各自的
+    服务器状态，重新获取时会话池中的每个会话都重新进入选课页面
+    """
+
+    # 只有一个会话时每次命中缓存省去的请求数：获取轮次列表、进入选课页面
+    REQUESTS_PER_REFRESH = 2
+
+    def __init__(self, ttl=DEFAULT_ROUND_TTL):
+        self.ttl = ttl
+        self.jx0502zbid = None
+        self.entered_at = 0
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.requests_per_refresh = self.REQUESTS_PER_REFRESH
+        # 获取轮次的请求完成时会触发响应回调，回调中可能再次使缓存失效
+        self._lock = threading.RLock()
+
+    def is_valid(self):
+        return bool(self.jx0502zbid) and time.time() - self.entered_at < self.ttl
+
+    def get(self, session, select_semester):
+        """
+        获取选课轮次编号，缓存失效时重新获取并进入选课页面
+
+        Returns:
+            Optional[str]: 选课轮次编号，获取失败时返回None
+        """
+        with self._lock:
+            if self.is_valid():
+                self.hits += 1
+                logging.debug(
+                    f"使用缓存的选课轮次: {self.jx0502zbid}，累计节省 {self.saved_requests} 个请求"
+                )
+                return self.jx0502zbid
+
+            jx0502zbid = get_jx0502zbid(session, select_semester)
+            if not jx0502zbid:
+                self.jx0502zbid = None
+                return None
+            sessions = self._enter_all_sessions(session, jx0502zbid)
+            self.requests_per_refresh = 1 + sessions
+            self.refreshes += 1
+            if jx0502zbid != self.jx0502zbid:
+                logging.info(f"当前选课轮次: {jx0502zbid}")
+            self.jx0502zbid = jx0502zbid
+            self.entered_at = time.time()
+            return jx0502zbid
+
+    def _enter_all_sessions(self, session, jx0502zbid):
+        """
+        在调用方的会话和会话池中的其他会话中进入选课页面，某个会话失败时不影响其他会话
+
+        Returns:
+            int: 进入选课页面的会话数
+        """
+        enter_selection_round(session, jx0502zbid)
+        entered = 1
+        for other in get_all_sessions():
+            if other is session:
+                continue
+            try:
+                enter_selection_round(other, jx0502zbid)
+                entered += 1
+            except Exception as e:
+                logging.warning(f"在会话池的其他会话中进入选课页面失败: {e}")
+        return entered
+
+    def invalidate(self, reason):
+        """使缓存失效，下次获取时重新获取选课轮次并进入选课页面"""
+        with self._lock:
+            if not self.jx0502zbid or not self.entered_at:
+                return
+            self.entered_at = 0
+            self.invalidations += 1
+        logging.warning(f"选课轮次缓存已失效（{reason}），下一轮将重新进入选课页面")
+
+    @property
+    def saved_requests(self):
+        return self.hits * self.requests_per_refresh
+
+    def snapshot(self):
+        return {
+            "jx0502zbid": self.jx0502zbid,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "saved_requests": self.saved_requests,
+        }
+
+
+_round_cache = None
+_round_cache_lock = threading.Lock()
+
+
+def _observe_response(url, latency, status_code, error):
+    """搜索或选课接口返回404时说明选课页面已失效"""
+    if status_code == 404 and XSXKKC_PATH in url:
+        invalidate_selection_round(f"{url.split('?')[0]} 返回404")
+
+
+def _on_session_unhealthy(session):
+    invalidate_selection_round("登录状态异常")
+
+
+def get_round_cache():
+    """获取选课轮次缓存，首次调用时创建并开始监听失效信号"""
+    global _round_cache
+    with _round_cache_lock:
+        if _round_cache is None:
+            _round_cache = SelectionRoundCache(get_round_ttl())
+            add_response_observer(_observe_response)
+            on_session_unhealthy(_on_session_unhealthy)
+        return _round_cache
+
+
+def get_selection_round(session, select_semester):
+    """获取选课轮次编号，有效期内直接使用缓存，否则重新获取并进入选课页面"""
+    return get_round_cache().get(session, select_semester)
+
+
+def invalidate_selection_round(reason):
+    """使选课轮次缓存失效，未启用缓存时不做任何事"""
+    if _round_cache is not None:
+        _round_cache.invalidate(reason)
+
+
+def report_round_message(message):
+    """选课失败信息表明选课轮次已失效时使缓存失效"""
+    if is_round_stale_message(message):
+        invalidate_selection_round(message)
+
+
+def get_round_cache_stats():
+    """获取选课轮次缓存的命中次数和节省的请求数，未启用缓存时返回None"""
+    return _round_cache.snapshot() if _round_cache is not None else None
+
+
+def get_xxxk_course_list(session, filters=None, window=4):
     """
     获取选修选课课程列表
 
+    由get_xxxk_course_rows分页获取全部课程，再按接口的格式组装成一个响应，
+    aaData中是所有页的课程
+
     Args:
         session: 请求会话
-        cookies: cookies信息
+        filters: 搜索条件，见build_search_request，默认获取全部课程
+        window: 同时请求的最大页数
 
     Returns:
-        str: 选修选课课程列表的响应内容
+        str: 选修选课课程列表的响应内容（JSON）
 
     Raises:
         RequestException: 当网络请求失败时
         Exception: 其他未知错误
     """
-    try:
-        headers = {
-            "X-Requested-With": "XMLHttpRequest",
-            "Accept": "*/*",
-            "Accept-Encoding": "gzip, deflate",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-            "Connection": "keep-alive",
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-        }
+    rows = get_xxxk_course_rows(session, filters, window)
+    return json.dumps(
+        {
+            "sEcho": "1",
+            "iTotalRecords": len(rows),
+            "iTotalDisplayRecords": len(rows),
+            "aaData": rows,
+        },
+        ensure_ascii=False,
+    )
 
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkXxxk"
 
-        params = {
-            "kcxx": "",
-            "skls": "",
-            "skxq": "",
-            "sfym": "false",
-            "sfct": "false",
-            "sfxx": "true",
-        }
+def get_xxxk_course_rows(session, filters=None, window=4):
+    """
+    获取选修选课的全部课程数据，超过一页时并发请求其余各页
 
-        data = {
-            "sEcho": "1",
-            "iColumns": "11",
-            "sColumns": "",
-            "iDisplayStart": "0",
-            "iDisplayLength": "15",
-            "mDataProp_0": "kch",
-            "mDataProp_1": "kcmc",
-            "mDataProp_2": "fzmc",
-            "mDataProp_3": "ktmc",
-            "mDataProp_4": "xf",
-            "mDataProp_5": "skls",
-            "mDataProp_6": "sksj",
-            "mDataProp_7": "skdd",
-            "mDataProp_8": "xqmc",
-            "mDataProp_9": "ctsm",
-            "mDataProp_10": "czOper",
-        }
-        response = session.post(url, data=data, headers=headers, params=params)
-        response.raise_for_status()
-        return response.text
+    Args:
+        session: 请求会话
+        filters: 搜索条件，见build_search_request，默认获取全部课程
+        window: 同时请求的最大页数
+
+    Returns:
+        list: 选修选课的所有课程数据
+
+    Raises:
+        RequestException: 当网络请求失败时
+        Exception: 其他未知错误
+    """
+    # 课程搜索模块依赖选课请求模块，而选课请求模块依赖本模块，在这里导入避免循环导入
+    from src.data.course_catalog import iter_search_rows
+
+    try:
+        return list(iter_search_rows(session, "xxxk", filters, window=window))
 
     except RequestException as e:
         logging.error(f"获取选修选课课程列表失败: {str(e)}")
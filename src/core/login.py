@@ -0,0 +1,310 @@
+from PIL import Image
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import logging
+from src.utils.captcha_ocr import get_ocr_res_with_confidence, warm_up_ocr_in_background
+from src.utils.session_manager import init_session, get_session, create_browser_session
+from src.core.course_selector import get_jx0502zbid, enter_selection_round
+from src.utils.json_store import load_json, save_json
+
+# 设置基本的URL和数据
+
+# 验证码请求URL
+RandCodeUrl = "http://zhjw.qfnu.edu.cn/verifycode.servlet"
+# 登录请求URL
+loginUrl = "http://zhjw.qfnu.edu.cn/Logon.do?method=logonLdap"
+# 初始数据请求URL
+dataStrUrl = "http://zhjw.qfnu.edu.cn/Logon.do?method=logon&flag=sess"
+# 检查登录状态的URL
+mainPageUrl = "http://zhjw.qfnu.edu.cn/jsxsd/framework/xsMain.jsp"
+# 保存登录状态的目录
+COOKIE_DIR = "cache"
+# 验证码长度
+CAPTCHA_LENGTH = 4
+# 识别置信度低于该值的验证码不提交，直接换一张
+CAPTCHA_MIN_CONFIDENCE = 0.5
+# 最多提交登录请求的次数
+MAX_LOGIN_ATTEMPTS = 3
+# 最多获取验证码的次数
+MAX_CAPTCHA_FETCHES = 8
+
+
+def get_initial_session(session=None):
+    """
+    创建会话并获取初始数据
+    参数:
+        session: 用于登录的会话，默认初始化全局session
+    返回: 初始数据字符串
+    """
+    session = session or init_session()
+    response = session.get(dataStrUrl)
+    return response.text
+
+
+def fetch_captcha_image(session=None):
+    """
+    获取验证码图片
+    返回: 验证码图片，获取失败时返回None
+    """
+    session = session or get_session()
+    response = session.get(RandCodeUrl)
+
+    if response.status_code != 200:
+        logging.error(f"请求验证码失败，状态码: {response.status_code}")
+        return None
+
+    try:
+        return Image.open(BytesIO(response.content))
+    except Exception as e:
+        logging.error(f"无法识别图像文件: {e}")
+        return None
+
+
+def recognize_captcha(image):
+    """
+    识别验证码图片
+    返回: (识别出的验证码字符串, 置信度)，图片为空时返回(None, 0)
+    """
+    if image is None:
+        return None, 0
+    return get_ocr_res_with_confidence(image)
+
+
+def handle_captcha(session=None):
+    """
+    获取并识别验证码
+    返回: (识别出的验证码字符串, 置信度)
+    """
+    return recognize_captcha(fetch_captcha_image(session))
+
+
+def is_plausible_captcha(random_code, confidence):
+    """判断识别结果是否值得提交，明显错误的识别结果直接换一张验证码"""
+    return (
+        bool(random_code)
+        and len(random_code) == CAPTCHA_LENGTH
+        and random_code.isascii()
+        and random_code.isalnum()
+        and confidence >= CAPTCHA_MIN_CONFIDENCE
+    )
+
+
+def generate_encoded_string(data_str, user_account, user_password):
+    """
+    生成登录所需的encoded字符串
+    参数:
+        data_str: 初始数据字符串
+        user_account: 用户账号
+        user_password: 用户密码
+    返回: encoded字符串
+    """
+    res = data_str.split("#")
+    code, sxh = res[0], res[1]
+    data = f"{user_account}%%%{user_password}"
+    encoded = ""
+    b = 0
+
+    for a in range(len(code)):
+        if a < 20:
+            encoded += data[a]
+            for _ in range(int(sxh[a])):
+                encoded += code[b]
+                b += 1
+        else:
+            encoded += data[a:]
+            break
+    return encoded
+
+
+def login(user_account, user_password, random_code, encoded, session=None):
+    """
+    执行登录操作
+    返回: 登录响应结果
+    """
+    session = session or get_session()
+    headers = {
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+        "Content-Type": "application/x-www-form-urlencoded",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36",
+        "Origin": "http://zhjw.qfnu.edu.cn",
+        "Referer": "http://zhjw.qfnu.edu.cn/",
+        "Upgrade-Insecure-Requests": "1",
+    }
+
+    data = {
+        "userAccount": user_account,
+        "userPassword": user_password,
+        "RANDOMCODE": random_code,
+        "encoded": encoded,
+    }
+
+    return session.post(loginUrl, headers=headers, data=data, timeout=1000)
+
+
+def simulate_login(user_account, user_password, session=None):
+    """
+    模拟登录过程
+
+    先获取验证码让服务器分配会话，之后识别验证码与获取初始数据同时进行；
+    识别结果格式不对或置信度过低时不提交登录，直接换一张验证码
+    参数:
+        session: 用于登录的会话，默认使用全局session
+    返回: 是否登录成功
+    """
+    start = time.perf_counter()
+    session = session or init_session()
+    # 获取验证码的同时在后台加载识别模型
+    warm_up_ocr_in_background()
+
+    image = fetch_captcha_image(session)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        data_str_future = executor.submit(get_initial_session, session)
+        random_code, confidence = recognize_captcha(image)
+        data_str = data_str_future.result()
+    encoded = generate_encoded_string(data_str, user_account, user_password)
+
+    attempts = 0
+    for fetch in range(MAX_CAPTCHA_FETCHES):
+        if fetch > 0:
+            random_code, confidence = handle_captcha(session)
+        logging.info(f"验证码: {random_code}，置信度: {confidence:.2f}")
+        if not is_plausible_captcha(random_code, confidence):
+            logging.warning("验证码识别结果不可信，换一张验证码")
+            continue
+
+        attempts += 1
+        response = login(user_account, user_password, random_code, encoded, session)
+
+        if response.status_code == 200:
+            if "验证码错误!!" in response.text:
+                logging.warning(f"验证码识别错误，重试第 {attempts} 次")
+                if attempts >= MAX_LOGIN_ATTEMPTS:
+                    break
+                continue
+            if "密码错误" in response.text:
+                raise Exception("用户名或密码错误")
+            logging.info(
+                f"登录成功，耗时 {(time.perf_counter() - start) * 1000:.0f}ms，"
+                f"获取验证码 {fetch + 1} 次，提交登录 {attempts} 次"
+            )
+            return True
+        else:
+            raise Exception("登录失败")
+
+    raise Exception("验证码识别错误，请重试")
+
+
+def visit_main_pages(session):
+    """
+    访问主页和选课页面
+    参数:
+        session: 已登录的会话
+    """
+    for page_url in [
+        mainPageUrl,
+        "http://zhjw.qfnu.edu.cn/jsxsd/xsxk/xklc_list",
+    ]:
+        for attempt in range(3):
+            try:
+                response = session.get(page_url)
+                logging.debug(f"页面响应状态码: {response.status_code}")
+                if response.status_code == 200:
+                    break
+            except Exception as e:
+                if attempt == 2:
+                    logging.error(f"访问页面失败: {str(e)}")
+                    raise
+                logging.warning(f"访问页面失败，正在进行第{attempt + 2}次尝试")
+                continue
+
+
+def create_logged_in_session(user_account, user_password, select_semester):
+    """
+    新建一个独立登录并进入选课页面的会话，拥有自己的JSESSIONID和连接池
+    参数:
+        user_account: 用户账号
+        user_password: 用户密码
+        select_semester: 选课学期
+    返回: 已登录的会话
+    """
+    session = create_browser_session()
+    simulate_login(user_account, user_password, session)
+    visit_main_pages(session)
+    jx0502zbid = get_jx0502zbid(session, select_semester)
+    if not jx0502zbid:
+        session.close()
+        raise Exception("获取选课轮次编号失败")
+    enter_selection_round(session, jx0502zbid)
+    return session
+
+
+def get_cookie_file(user_account):
+    """获取账号保存登录状态的文件路径"""
+    return os.path.join(COOKIE_DIR, f"cookies_{user_account}.json")
+
+
+def save_session_cookies(session, user_account):
+    """
+    登录成功后把会话的cookie保存到本地
+    参数:
+        session: 已登录的会话
+        user_account: 用户账号
+    """
+    cookies = [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+        }
+        for cookie in session.cookies
+    ]
+    save_json(get_cookie_file(user_account), cookies)
+    logging.info(f"已保存登录状态，共 {len(cookies)} 个cookie")
+
+
+def is_session_alive(session):
+    """
+    通过访问主页检查会话是否仍处于登录状态，失效时教务系统会跳转到登录页
+    参数:
+        session: 要检查的会话
+    返回: 会话是否有效
+    """
+    try:
+        response = session.get(mainPageUrl, allow_redirects=False)
+    except Exception as e:
+        logging.warning(f"检查登录状态失败: {e}")
+        return False
+    return response.status_code == 200 and "userAccount" not in response.text
+
+
+def restore_session(session, user_account):
+    """
+    加载本地保存的cookie并检查是否仍然有效
+    参数:
+        session: 要恢复登录状态的会话
+        user_account: 用户账号
+    返回: 是否成功恢复登录状态
+    """
+    cookies = load_json(get_cookie_file(user_account))
+    if not cookies:
+        return False
+
+    for cookie in cookies:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
+
+    if is_session_alive(session):
+        logging.critical("已保存的登录状态仍然有效，跳过验证码登录")
+        return True
+
+    logging.info("已保存的登录状态已失效，重新登录")
+    session.cookies.clear()
+    os.remove(get_cookie_file(user_account))
+    return False
@@ -0,0 +1,201 @@
+import time
+import logging
+import datetime
+import threading
+from src.utils.session_manager import (
+    get_session,
+    get_all_sessions,
+    warm_connections,
+)
+from src.data.get_course_jx02id_and_jx0404id import get_course_jx02id_and_jx0404id
+from src.data.category_affinity import get_preferred_category
+from src.data.timetable import report_candidate_conflicts
+from src.core.send_course_data import COME_IN_URLS, prebuild_oper_templates
+from src.utils.clock_sync import (
+    estimate_clock_offset,
+    get_fire_time,
+    wait_until_local_time,
+)
+
+# 教务系统使用北京时间
+SERVER_TIMEZONE = datetime.timezone(datetime.timedelta(hours=8), "Asia/Shanghai")
+
+# 等待期间保持连接的间隔（秒），教务系统空闲连接约20秒后会被关闭
+KEEP_ALIVE_INTERVAL = 15
+# 开始选课前多少秒重新进入选课页面
+FINAL_WARM_UP_SECONDS = 2
+
+
+def parse_start_time(start_time):
+    """
+    解析配置中的选课开始时间
+
+    Args:
+        start_time: 形如 "2025-02-20 12:00:00" 的北京时间字符串，为空表示不等待
+
+    Returns:
+        Optional[datetime.datetime]: 带时区的选课开始时间
+    """
+    if not start_time:
+        return None
+    return datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").replace(
+        tzinfo=SERVER_TIMEZONE
+    )
+
+
+def has_manual_ids(course):
+    """判断课程是否已手动配置jx02id和jx0404id"""
+    return bool(course.get("jx02id", "").strip() and course.get("jx0404id", "").strip())
+
+
+def resolve_courses(courses):
+    """
+    解析所有课程的jx02id、jx0404id和所在分类，结果写入本地缓存，
+    同时构建好这些课程的选课请求模板，并检查课程之间以及与已选课程的时间冲突
+
+    Returns:
+        set: 选课时需要进入的选课分类
+    """
+    categories = set()
+    resolved = []
+    for course in courses:
+        course_key = f"{course['course_id_or_name']}-{course['teacher_name']}"
+        if has_manual_ids(course):
+            result = course
+            category = get_preferred_category(course["jx0404id"])
+        else:
+            result = get_course_jx02id_and_jx0404id(course)
+            if not result:
+                logging.warning(
+                    f"预先解析课程【{course_key}】失败，开始选课后将重新搜索"
+                )
+                categories.update(COME_IN_URLS)
+                continue
+            category = result.get("category")
+        resolved.append((course, result))
+
+        if category:
+            logging.info(f"课程【{course_key}】属于选课分类: {category}")
+            categories.add(category)
+            prebuild_oper_templates(result, [category])
+        else:
+            # 不知道课程所在分类时，所有分类都可能用到
+            categories.update(COME_IN_URLS)
+            prebuild_oper_templates(result)
+
+    skipped = report_candidate_conflicts(resolved)
+    if skipped:
+        logging.warning(f"共 {skipped} 门课程与已选课程时间冲突，选课时将跳过")
+    return categories
+
+
+def enter_selection_pages(categories, timeout=None):
+    """
+    在每个会话中进入各选课分类的页面，同时建立到教务系统的长连接
+
+    Args:
+        timeout: 每个请求的超时时间（秒），默认使用会话的超时时间
+    """
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    for session in get_all_sessions():
+        for category in sorted(categories):
+            try:
+                response = session.get(COME_IN_URLS[category], **kwargs)
+                logging.debug(
+                    f"进入选课分类【{category}】页面响应状态码: {response.status_code}"
+                )
+            except Exception as e:
+                logging.warning(f"进入选课分类【{category}】页面失败: {e}")
+
+
+def warm_all_sessions(timeout=None):
+    """预热所有会话的连接池"""
+    for session in get_all_sessions():
+        warm_connections(session=session, timeout=timeout)
+
+
+def start_warm_up(categories, timeout=None):
+    """
+    在后台线程中进入选课页面并预热连接，等待过程不会被请求阻塞
+
+    Returns:
+        threading.Thread: 执行预热的线程
+    """
+
+    def warm_up():
+        enter_selection_pages(categories, timeout)
+        warm_all_sessions(timeout)
+
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_until(fire_time, categories):
+    """
+    等待到本地发送时间，期间定期访问选课页面保持连接和登录状态
+
+    访问选课页面和预热连接都在后台线程中进行，请求再慢也不会推迟发送时间；
+    最后一次预热的请求超时时间不超过到发送时间为止的剩余时间
+
+    Args:
+        fire_time: 本地发送时间戳
+        categories: 需要保持的选课分类
+    """
+    target = fire_time
+    last_keep_alive = time.time()
+    final_warmed_up = False
+    warm_up_thread = None
+
+    while True:
+        remaining = target - time.time()
+        if remaining <= 0:
+            break
+
+        if not final_warmed_up and remaining <= FINAL_WARM_UP_SECONDS:
+            warm_up_thread = start_warm_up(categories, timeout=remaining)
+            final_warmed_up = True
+            continue
+
+        if time.time() - last_keep_alive >= KEEP_ALIVE_INTERVAL:
+            # 上一次保持连接的请求还没有结束时不再重复发送
+            if warm_up_thread is None or not warm_up_thread.is_alive():
+                warm_up_thread = start_warm_up(categories)
+            last_keep_alive = time.time()
+            logging.info(f"准备就绪，距离选课开始还有 {remaining:.1f} 秒")
+            continue
+
+        if remaining > 1:
+            time.sleep(min(remaining - 1, 1))
+        else:
+            wait_until_local_time(target)
+
+
+def prepare(courses, start_time):
+    """
+    选课开始前的准备阶段：解析所有课程、进入选课页面、与服务器对时并等待到开始时间，
+    开始时间到达后只需要发送选课请求
+
+    Args:
+        courses: 课程列表
+        start_time: 服务器上的选课开始时间
+    """
+    logging.critical(f"进入准备阶段，选课开始时间: {start_time}")
+    categories = resolve_courses(courses)
+    enter_selection_pages(categories)
+    warm_all_sessions()
+
+    try:
+        clock_offset = estimate_clock_offset(get_session())
+        logging.critical(f"与服务器对时完成，{clock_offset}")
+        fire_time = get_fire_time(start_time.timestamp(), clock_offset)
+    except Exception as e:
+        logging.warning(f"与服务器对时失败，将按本地时间开始选课: {e}")
+        fire_time = start_time.timestamp()
+
+    logging.critical(
+        f"准备阶段完成，共解析 {len(courses)} 门课程，涉及选课分类: {', '.join(sorted(categories))}，"
+        f"将在本地时间 {datetime.datetime.fromtimestamp(fire_time).strftime('%H:%M:%S.%f')[:-3]} 发送第一批选课请求"
+    )
+    wait_until(fire_time, categories)
+    logging.critical("选课开始时间已到，开始选课")
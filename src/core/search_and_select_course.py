@@ -1,17 +1,97 @@
-from src.data.get_course_jx02id_and_jx0404id import get_course_jx02id_and_jx0404id
-from src.core.send_course_data import (
-    send_ggxxkxkOper_course_jx02id_and_jx0404id,
-    send_knjxkOper_course_jx02id_and_jx0404id,
-    send_bxqjhxkOper_course_jx02id_and_jx0404id,
-    send_xxxkOper_course_jx02id_and_jx0404id,
-    send_fawxkOper_course_jx02id_and_jx0404id,
+from src.data.get_course_jx02id_and_jx0404id import (
+    get_course_jx02id_and_jx0404id,
+    invalidate_course,
 )
+from src.data.course_id_cache import is_course_not_found
+from src.data.category_affinity import (
+    record_oper_category,
+    split_selection_methods,
+    is_definitive_failure,
+    forget_category,
+)
+from src.data.timetable import check_timetable_conflicts, record_selected_course
+from src.core.send_course_data import get_selection_methods
+from src.core.async_send_course_data import send_course_data_concurrently
 from src.utils.dingtalk import dingtalk
 from src.utils.feishu import feishu
 import logging
 
+# 选课分类及其对应的选课请求，顺序即依次尝试的顺序
+SELECTION_METHODS = get_selection_methods()
+
+
+def _send_requests(
+    course_name, course_jx02id_and_jx0404id, selection_methods, concurrent
+):
+    """
+    向指定的选课分类发送选课请求
+
+    Returns:
+        tuple: (result, error_messages)，result与选课函数的返回值含义相同
+    """
+    jx0404id = course_jx02id_and_jx0404id["jx0404id"]
+
+    def on_success(category):
+        record_oper_category(jx0404id, category)
+
+    if concurrent and len(selection_methods) > 1:
+        result, message = send_course_data_concurrently(
+            course_name, course_jx02id_and_jx0404id, selection_methods, on_success
+        )
+        return result, [message] if message else []
+
+    error_messages = []
+    has_failure = False
+    for category, method_name, method_func in selection_methods:
+        result, message = method_func(course_name, course_jx02id_and_jx0404id)
+        if result is True:
+            on_success(category)
+            return True, []
+        elif result is False:
+            has_failure = True
+            error_messages.append(f"【{method_name}】失败: {message}")
+        elif result is None:
+            error_messages.append(f"【{method_name}】发生异常: {message}")
+    return (False if has_failure else None), error_messages
+
+
+def send_selection_requests(course_name, course_jx02id_and_jx0404id, concurrent):
+    """
+    向各选课分类发送选课请求
+
+    已记录课程所属分类时先只向该分类发送请求；该分类返回名额已满、时间冲突等
+    换分类也无法选上的原因时不再尝试其他分类，其余失败（例如课程不在该分类或
+    不在培养方案中）和请求异常时退回到其余分类
+
+    Args:
+        course_name: 课程名称
+        course_jx02id_and_jx0404id: 包含jx02id和jx0404id的字典
+        concurrent: 是否同时向所有分类发送请求，否则依次尝试
+
+    Returns:
+        tuple: (result, error_messages)，result为True表示选课成功
+    """
+    preferred, fallback = split_selection_methods(
+        course_jx02id_and_jx0404id["jx0404id"], SELECTION_METHODS
+    )
+    error_messages = []
+    if preferred:
+        result, error_messages = _send_requests(
+            course_name, course_jx02id_and_jx0404id, preferred, concurrent
+        )
+        if result is True or (
+            result is False and is_definitive_failure(error_messages)
+        ):
+            return result is True, error_messages
+        logging.warning(f"【{course_name}】在已记录的选课分类中选课失败，尝试其他分类")
 
-def search_and_select_course(course):
+    result, messages = _send_requests(
+        course_name, course_jx02id_and_jx0404id, fallback, concurrent
+    )
+    return result is True, error_messages + messages
+
+
+def search_and_select_course(course, concurrent=False, notify_failure=True):
     """
     通过依次从公选课选课、本学期计划选课、选修选课、专业内跨年级选课、计划外选课、辅修选课搜索课程
 
@@ -25,10 +105,13 @@ def search_and_select_course(course):
             - weeks: 上课周次
             - jx02id: 课程jx02id
             - jx0404id: 课程jx0404id
+        concurrent (bool): 是否同时向所有选课分类发送请求
+        notify_failure (bool): 选课失败时是否发送钉钉、飞书通知，持续重试的调用方只需通知一次
 
 
     Returns:
-        bool: 如果成功找到并选择课程返回True，否则返回False
+        Optional[bool]: 如果成功找到并选择课程返回True，否则返回False；
+            与已选课程时间冲突、再次尝试也不会选上时返回None，调用方应不再为该课程选课
     """
     try:
         logging.info(f"开始搜索课程: {course}")
@@ -37,8 +120,6 @@ def search_and_select_course(course):
             logging.error(f"课程信息缺少必要的字段，需要: {', '.join(required_keys)}")
             return False
 
-        error_messages = []  # 用于收集所有错误信息
-
         # 已手动配置jx02id和jx0404id的情况
         if (
             course.get("jx02id")
@@ -48,31 +129,7 @@ def search_and_select_course(course):
         ):
             logging.critical(f"已手动配置jx02id和jx0404id，跳过搜索直接选课: {course}")
 
-            # 依次尝试不同的选课方式
-            selection_methods = [
-                ("专业内跨年级选课", send_knjxkOper_course_jx02id_and_jx0404id),
-                ("本学期计划选课", send_bxqjhxkOper_course_jx02id_and_jx0404id),
-                ("公选课选课", send_ggxxkxkOper_course_jx02id_and_jx0404id),
-                ("选修选课", send_xxxkOper_course_jx02id_and_jx0404id),
-                ("计划外选课", send_fawxkOper_course_jx02id_and_jx0404id),
-            ]
-
-            for method_name, method_func in selection_methods:
-                result, message = method_func(course["course_id_or_name"], course)
-                if result is True:
-                    dingtalk(
-                        "选课成功 🎉 ✨ 🌟 🎊",
-                        f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
-                    )
-                    feishu(
-                        "选课成功 🎉 ✨ 🌟 🎊",
-                        f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
-                    )
-                    return True
-                elif result is False:
-                    error_messages.append(f"【{method_name}】失败: {message}")
-                elif result is None:
-                    error_messages.append(f"【{method_name}】发生异常: {message}")
+            course_jx02id_and_jx0404id = course
 
         # 未手动配置jx02id和jx0404id的情况
         else:
@@ -84,36 +141,37 @@ def search_and_select_course(course):
                 )
                 return False
             course_jx02id_and_jx0404id = get_course_jx02id_and_jx0404id(course)
-            if course_jx02id_and_jx0404id:
-                selection_methods = [
-                    ("专业内跨年级选课", send_knjxkOper_course_jx02id_and_jx0404id),
-                    ("本学期计划选课", send_bxqjhxkOper_course_jx02id_and_jx0404id),
-                    ("公选课选课", send_ggxxkxkOper_course_jx02id_and_jx0404id),
-                    ("选修选课", send_xxxkOper_course_jx02id_and_jx0404id),
-                    ("计划外选课", send_fawxkOper_course_jx02id_and_jx0404id),
-                ]
-
-                for method_name, method_func in selection_methods:
-                    result, message = method_func(
-                        course["course_id_or_name"], course_jx02id_and_jx0404id
-                    )
-                    if result is True:
-                        dingtalk(
-                            "选课成功 🎉 ✨ 🌟 🎊",
-                            f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
-                        )
-                        feishu(
-                            "选课成功 🎉 ✨ 🌟 🎊",
-                            f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
-                        )
-                        return True
-                    elif result is False:
-                        error_messages.append(f"【{method_name}】失败: {message}")
-                    elif result is None:
-                        error_messages.append(f"【{method_name}】发生异常: {message}")
+            if not course_jx02id_and_jx0404id:
+                return False
+
+        # 与已选课程时间冲突的课程必然选课失败，不再发送选课请求
+        if check_timetable_conflicts(course, course_jx02id_and_jx0404id):
+            return None
+
+        result, error_messages = send_selection_requests(
+            course["course_id_or_name"], course_jx02id_and_jx0404id, concurrent
+        )
+        if result:
+            record_selected_course(course, course_jx02id_and_jx0404id)
+            dingtalk(
+                "选课成功 🎉 ✨ 🌟 🎊",
+                f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
+            )
+            feishu(
+                "选课成功 🎉 ✨ 🌟 🎊",
+                f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课成功！",
+            )
+            return True
+
+        # 搜索得到的课程在选课时提示不存在，说明缓存已失效
+        if course_jx02id_and_jx0404id is not course and is_course_not_found(
+            error_messages
+        ):
+            invalidate_course(course, course_jx02id_and_jx0404id["jx0404id"])
+            forget_category(course_jx02id_and_jx0404id["jx0404id"])
 
         # 如果所有尝试都失败，发送错误汇总
-        if error_messages:
+        if error_messages and notify_failure:
             error_summary = (
                 f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课失败，遇到以下错误：\n\n"
                 + "\n\n".join(error_messages)
@@ -125,6 +183,8 @@ def search_and_select_course(course):
     except Exception as e:
         error_msg = str(e)
         logging.error(f"搜索选课失败: {error_msg}")
+        if not notify_failure:
+            return False
         dingtalk(
             "选课失败 😭 😢 😔",
             f"课程【{course['course_id_or_name']}-{course['teacher_name']}】选课过程发生异常：{error_msg}",
@@ -0,0 +1,275 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.concurrent_select import CourseStatus, get_course_key
+from src.core.course_selector import (
+    get_round_cache,
+    get_selection_round,
+    invalidate_selection_round,
+)
+from src.core.search_and_select_course import search_and_select_course
+from src.core.send_course_data import COME_IN_URLS
+from src.data.get_course_jx02id_and_jx0404id import find_course_jx02id_and_jx0404id
+from src.data.course_catalog import is_bulk_catalog_enabled, iter_search_rows
+from src.data.catalog_diff import CatalogSync, parse_seat_count
+from src.utils.session_manager import get_session
+from src.utils.rate_controller import get_pacing_interval, pause
+
+
+class SeatWatcher:
+    """
+    轮询公选课搜索接口，记录所有关注课程的容量、已选人数和剩余名额
+
+    公选课搜索接口的每行数据都带有xxrs（容量）、xkrs（已选人数）和syrs（剩余名额），
+    只在剩余名额大于0时才发送选课请求；在公选课中搜索不到的课程无法获知名额，
+    每轮照常直接选课
+
+    启用整表下载时不再逐个课程搜索，而是每轮增量同步整个公选课列表，
+    只处理名额有变化的课程
+    """
+
+    def __init__(self, courses, select_semester, course_status=None, max_workers=4):
+        """
+        Args:
+            courses: 关注的课程列表
+            select_semester: 选课学期，用于确认选课轮次
+            course_status: 课程选课状态表，默认新建
+            max_workers: 同时搜索的最大线程数
+        """
+        self.courses = courses
+        self.select_semester = select_semester
+        self.course_status = course_status or CourseStatus(courses)
+        self.max_workers = max(1, min(max_workers, len(courses) or 1))
+        # 课程键 -> 名额信息
+        self.seats = {}
+        # 在公选课中搜索不到的课程键
+        self.unwatchable = set()
+        self.polls = 0
+        self.oper_requests = 0
+        self._entered = False
+        self._round_refreshes = None
+        self._lock = threading.Lock()
+        # 整表同步模式下，jx0404id到关注课程的映射
+        self.sync = CatalogSync(["ggxxkxk"]) if is_bulk_catalog_enabled() else None
+        self.watched_ids = {}
+
+    def enter_category_page(self, session):
+        """进入公选课选课页面，搜索接口需要先进入该页面，重新进入选课轮次后也要重新进入"""
+        refreshes = get_round_cache().refreshes
+        if refreshes != self._round_refreshes:
+            self._round_refreshes = refreshes
+            self._entered = False
+        if not self._entered:
+            response = session.get(COME_IN_URLS["ggxxkxk"])
+            logging.debug(f"公选课选课页面响应状态码: {response.status_code}")
+            self._entered = True
+
+    def _row_seats(self, row):
+        return {
+            "jx02id": row["jx02id"],
+            "jx0404id": row["jx0404id"],
+            "xxrs": parse_seat_count(row.get("xxrs")),
+            "xkrs": parse_seat_count(row.get("xkrs")),
+            "syrs": parse_seat_count(row.get("syrs")),
+            "updated_at": time.time(),
+        }
+
+    def fetch_seats(self, session, course):
+        """
+        搜索课程并更新其名额信息
+
+        Returns:
+            dict: 名额信息，包含jx02id、jx0404id、xxrs、xkrs、syrs；搜索不到时返回None
+        """
+        course_key = get_course_key(course)
+        # 已知jx0404id时直接按其查找，找到后不再请求其余各页，也不再逐行匹配周次
+        jx0404id = (self.seats.get(course_key) or course).get("jx0404id")
+        rows = []
+        row = None
+        for r in iter_search_rows(session, "ggxxkxk", course):
+            if jx0404id and r.get("jx0404id") == jx0404id:
+                row = r
+                break
+            rows.append(r)
+        if row is None:
+            ids = find_course_jx02id_and_jx0404id(course, rows)
+            if not ids:
+                return None
+            row = next(r for r in rows if r.get("jx0404id") == ids["jx0404id"])
+        seats = self._row_seats(row)
+        self._update_seats(course_key, seats)
+        return seats
+
+    def _update_seats(self, course_key, seats):
+        with self._lock:
+            previous = self.seats.get(course_key)
+            self.seats[course_key] = seats
+        if previous is None or previous["syrs"] != seats["syrs"]:
+            logging.info(
+                f"课程【{course_key}】名额: 已选 {seats['xkrs']}/{seats['xxrs']}，剩余 {seats['syrs']}"
+            )
+
+    def select(self, course, seats=None):
+        """发送选课请求，已知jx02id和jx0404id时跳过搜索"""
+        with self._lock:
+            self.oper_requests += 1
+        if seats:
+            course = {
+                **course,
+                "jx02id": seats["jx02id"],
+                "jx0404id": seats["jx0404id"],
+            }
+        result = search_and_select_course(course, concurrent=True)
+        if result:
+            self.course_status.mark_selected(course)
+            return True
+        if result is None:
+            # 与已选课程时间冲突，冲突已在检查时输出，之后不再关注该课程
+            self.course_status.mark_skipped(course)
+        return False
+
+    def watch_course(self, session, course):
+        """检查一门课程的名额，有剩余名额时立即选课"""
+        course_key = get_course_key(course)
+        if course_key in self.unwatchable:
+            return self.select(course)
+
+        try:
+            seats = self.fetch_seats(session, course)
+        except ValueError:
+            # 返回的不是JSON，通常是选课页面已失效
+            self._entered = False
+            invalidate_selection_round("公选课搜索返回的不是JSON")
+            return False
+        except Exception as e:
+            if "404" in str(e):
+                self._entered = False
+            logging.warning(f"查询课程【{course_key}】的名额失败: {e}")
+            return False
+
+        if seats is None:
+            logging.warning(
+                f"公选课中搜索不到课程【{course_key}】，无法获知剩余名额，之后每轮直接选课"
+            )
+            self.unwatchable.add(course_key)
+            return self.select(course)
+
+        if seats["syrs"] is not None and seats["syrs"] > 0:
+            logging.critical(
+                f"课程【{course_key}】出现 {seats['syrs']} 个剩余名额，立即选课"
+            )
+            return self.select(course, seats)
+        return False
+
+    def map_watched_courses(self, pending):
+        """在整表快照中查找还没有对应到jx0404id的关注课程，找不到的改为每轮直接选课"""
+        mapped = {get_course_key(c) for c in self.watched_ids.values()}
+        rows = self.sync.get_rows("ggxxkxk").values()
+        for course in pending:
+            course_key = get_course_key(course)
+            if course_key in mapped or course_key in self.unwatchable:
+                continue
+            candidates = [
+                r
+                for r in rows
+                if r.get("kch") == course["course_id_or_name"]
+                and r.get("skls") == course["teacher_name"]
+            ]
+            ids = find_course_jx02id_and_jx0404id(course, candidates)
+            if ids:
+                self.watched_ids[ids["jx0404id"]] = course
+            else:
+                logging.warning(
+                    f"公选课中搜索不到课程【{course_key}】，无法获知剩余名额，之后每轮直接选课"
+                )
+                self.unwatchable.add(course_key)
+
+    def sync_catalog(self, session, executor, pending):
+        """
+        增量同步公选课列表，对所有还有剩余名额且未选上的关注课程发送选课请求
+
+        不只处理名额有变化的课程：选课请求失败（超时、服务器繁忙等）而名额没有变化时，
+        下一轮仍会重试
+        """
+        try:
+            diff = self.sync.poll("ggxxkxk", session)
+        except ValueError:
+            self._entered = False
+            invalidate_selection_round("公选课搜索返回的不是JSON")
+            return
+        except Exception as e:
+            if "404" in str(e):
+                self._entered = False
+            logging.warning(f"同步公选课列表失败: {e}")
+            return
+
+        self.map_watched_courses(pending)
+        changed = {row.get("jx0404id") for row in diff.changed_rows()}
+        rows = self.sync.get_rows("ggxxkxk")
+        opened = []
+        for jx0404id, course in self.watched_ids.items():
+            row = rows.get(jx0404id)
+            if row is None or self.course_status.is_done(course):
+                continue
+            seats = self._row_seats(row)
+            self._update_seats(get_course_key(course), seats)
+            if seats["syrs"] is not None and seats["syrs"] > 0:
+                if jx0404id in changed:
+                    logging.critical(
+                        f"课程【{get_course_key(course)}】出现 {seats['syrs']} 个剩余名额，立即选课"
+                    )
+                else:
+                    logging.info(
+                        f"课程【{get_course_key(course)}】仍有 {seats['syrs']} 个剩余名额，重试选课"
+                    )
+                opened.append((course, seats))
+
+        blind = [c for c in pending if get_course_key(c) in self.unwatchable]
+        list(executor.map(lambda item: self.select(*item), opened))
+        list(executor.map(self.select, blind))
+
+    def poll_once(self, executor):
+        """检查所有未选上课程的名额一次"""
+        session = get_session()
+        if not get_selection_round(session, self.select_semester):
+            logging.warning("获取选课轮次失败，稍后重试")
+            return
+        self.enter_category_page(session)
+        self.polls += 1
+        pending = [c for c in self.courses if not self.course_status.is_done(c)]
+        if self.sync is not None:
+            self.sync_catalog(session, executor, pending)
+            return
+        list(executor.map(lambda c: self.watch_course(session, c), pending))
+
+    def run(self):
+        """持续轮询直到所有课程都选上"""
+        logging.info(
+            f"名额监控开始，共 {len(self.courses)} 门课程，有剩余名额时才发送选课请求"
+        )
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="watch"
+        ) as executor:
+            while not self.course_status.all_done():
+                self.poll_once(executor)
+                if self.course_status.all_done():
+                    break
+                logging.debug(
+                    f"第 {self.polls} 轮名额检查完成，{get_pacing_interval():.1f}秒后继续，"
+                    f"累计选课请求 {self.oper_requests} 次"
+                )
+                pause()
+        return self.course_status
+
+
+def watch_seats(courses, select_semester, course_status=None, max_workers=4):
+    """
+    监控课程的剩余名额，出现名额时立即选课，直到所有课程都选上
+
+    Returns:
+        CourseStatus: 选课结束后的状态表
+    """
+    watcher = SeatWatcher(courses, select_semester, course_status, max_workers)
+    return watcher.run()
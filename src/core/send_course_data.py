@@ -1,313 +1,200 @@
 import time
 import logging
-from src.utils.session_manager import get_session
-
-
-def send_ggxxkxkOper_course_jx02id_and_jx0404id(
-    course_name, course_jx02id_and_jx0404id
-):
-    """发送公选课选课请求"""
-    try:
-        session = get_session()
-
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/ggxxkxkOper"
-        params = {
-            "kcid": course_jx02id_and_jx0404id["jx02id"],
-            "cfbs": "null",
-            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
-            "xkzy": "",
-            "trjf": "",
-            "_": str(int(time.time() * 1000)),
-        }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-            "Accept": "*/*",
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInGgxxkxk",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-        }
-
-        response = session.get(url, params=params, headers=headers)
-        response_json = response.json()
-
-        logging.info(
-            f"已发送【{course_name}】的公选课选课请求, 响应代码: {response.status_code}"
+from functools import partial
+from urllib.parse import urlencode
+from src.utils.session_manager import get_session, mark_session_unhealthy
+from src.utils.fast_json import decode_response
+from src.utils.rate_controller import get_endpoint, get_rate_controller, report_message
+from src.core.course_selector import invalidate_selection_round, report_round_message
+
+# 选课请求的地址前缀
+XSXKKC_URL = "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc"
+
+# 选课分类表：名称、选课请求接口和选课页面，顺序即依次尝试的顺序
+OPER_CATEGORIES = {
+    "knjxk": {
+        "name": "专业内跨年级选课",
+        "oper_url": f"{XSXKKC_URL}/knjxkOper",
+        "come_in_url": f"{XSXKKC_URL}/comeInKnjxk",
+    },
+    "bxqjhxk": {
+        "name": "本学期计划选课",
+        "oper_url": f"{XSXKKC_URL}/bxqjhxkOper",
+        "come_in_url": f"{XSXKKC_URL}/comeInBxqjhxk",
+    },
+    "ggxxkxk": {
+        "name": "公选课选课",
+        "oper_url": f"{XSXKKC_URL}/ggxxkxkOper",
+        "come_in_url": f"{XSXKKC_URL}/comeInGgxxkxk",
+    },
+    "xxxk": {
+        "name": "选修选课",
+        "oper_url": f"{XSXKKC_URL}/xxxkOper",
+        "come_in_url": f"{XSXKKC_URL}/comeInXxxk",
+    },
+    "fawxk": {
+        "name": "计划外选课",
+        "oper_url": f"{XSXKKC_URL}/fawxkOper",
+        "come_in_url": f"{XSXKKC_URL}/comeInFawxk",
+    },
+}
+
+# 各选课分类的选课页面，选课请求前需要先进入对应页面
+COME_IN_URLS = {
+    category: info["come_in_url"] for category, info in OPER_CATEGORIES.items()
+}
+
+OPER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
+    "Accept": "*/*",
+    "X-Requested-With": "XMLHttpRequest",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
+}
+
+# 已构建的选课请求模板，键为(选课分类, jx02id, jx0404id)
+_templates = {}
+
+
+class OperRequestTemplate:
+    """
+    某门课程在某个选课分类下的选课请求，除时间戳外的部分只构建一次
+    """
+
+    def __init__(self, category, course_jx02id_and_jx0404id):
+        info = OPER_CATEGORIES[category]
+        self.category = category
+        self.name = info["name"]
+        query = urlencode(
+            {
+                "kcid": course_jx02id_and_jx0404id["jx02id"],
+                "cfbs": "null",
+                "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
+                "xkzy": "",
+                "trjf": "",
+            }
         )
-
-        if "flag1" in response_json:
-            if response_json["flag1"] == 3:
-                message = response_json.get("msgContent", "未知原因")
-                logging.warning(f"登录状态异常: {message}")
-                return None, message
-            elif response_json["flag1"] == 1:
-                logging.info(f"【{course_name}】的公选课选课成功")
-                return True, None
-        elif "success" in response_json:
-            message = response_json.get("message", "未知原因")
-            if isinstance(response_json["success"], list):
-                success = all(response_json["success"])
-            else:
-                success = response_json["success"]
-
-            if success:
-                logging.info(f"【{course_name}】的公选课选课成功: {message}")
-                return True, None
-            else:
-                logging.warning(f"【{course_name}】的公选课选课失败: {message}")
-                return False, message
-
-        logging.warning(f"【{course_name}】的公选课选课失败: {response_json}")
-        return False, str(response_json)
-
-    except Exception as e:
-        error_msg = str(e)
-        logging.error(f"发送【{course_name}】的公选课选课请求数据失败: {error_msg}")
-        return None, error_msg
-
-
-def send_knjxkOper_course_jx02id_and_jx0404id(course_name, course_jx02id_and_jx0404id):
-    """发送专业内跨年级选课请求"""
+        self.endpoint = get_endpoint(info["oper_url"])
+        # 时间戳参数放在最后，发送时直接拼接
+        self.url_prefix = f"{info['oper_url']}?{query}&_="
+        self.headers = {**OPER_HEADERS, "Referer": info["come_in_url"]}
+
+    def url(self):
+        return f"{self.url_prefix}{int(time.time() * 1000)}"
+
+
+def get_oper_template(category, course_jx02id_and_jx0404id):
+    """获取选课请求模板，不存在时构建"""
+    key = (
+        category,
+        course_jx02id_and_jx0404id["jx02id"],
+        course_jx02id_and_jx0404id["jx0404id"],
+    )
+    template = _templates.get(key)
+    if template is None:
+        template = OperRequestTemplate(category, course_jx02id_and_jx0404id)
+        _templates[key] = template
+    return template
+
+
+def prebuild_oper_templates(course_jx02id_and_jx0404id, categories=None):
+    """
+    提前构建一门课程在各选课分类下的选课请求模板
+
+    Args:
+        course_jx02id_and_jx0404id: 课程的jx02id和jx0404id
+        categories: 需要构建的选课分类，默认全部分类
+    """
+    for category in categories or OPER_CATEGORIES:
+        get_oper_template(category, course_jx02id_and_jx0404id)
+
+
+def parse_oper_response(name, course_name, response_json, session):
+    """
+    解析选课请求的响应
+
+    Returns:
+        tuple: (result, message)，result为True表示选课成功，False表示选课失败，
+        None表示登录状态异常
+    """
+    if "flag1" in response_json:
+        if response_json["flag1"] == 3:
+            message = response_json.get("msgContent", "未知原因")
+            logging.warning(f"登录状态异常: {message}")
+            mark_session_unhealthy(session)
+            return None, message
+        elif response_json["flag1"] == 1:
+            logging.info(f"【{course_name}】的{name}成功")
+            return True, None
+    elif "success" in response_json:
+        message = response_json.get("message", "未知原因")
+        if isinstance(response_json["success"], list):
+            success = all(response_json["success"])
+        else:
+            success = response_json["success"]
+
+        if success:
+            logging.info(f"【{course_name}】的{name}成功: {message}")
+            return True, None
+        else:
+            logging.warning(f"【{course_name}】的{name}失败: {message}")
+            return False, message
+
+    logging.warning(f"【{course_name}】的{name}失败: {response_json}")
+    return False, str(response_json)
+
+
+def send_oper_request(category, course_name, course_jx02id_and_jx0404id):
+    """
+    向指定的选课分类发送选课请求
+
+    Args:
+        category: 选课分类，见OPER_CATEGORIES
+        course_name: 课程名称，用于日志
+        course_jx02id_and_jx0404id: 课程的jx02id和jx0404id
+
+    Returns:
+        tuple: (result, message)，含义见parse_oper_response
+    """
+    template = get_oper_template(category, course_jx02id_and_jx0404id)
     try:
         session = get_session()
-
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/knjxkOper"
-        params = {
-            "kcid": course_jx02id_and_jx0404id["jx02id"],
-            "cfbs": "null",
-            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
-            "xkzy": "",
-            "trjf": "",
-            "_": str(int(time.time() * 1000)),
-        }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-            "Accept": "*/*",
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInKnjxk",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-        }
-
-        response = session.get(url, params=params, headers=headers)
-        response_json = response.json()
+        # 服务器过载时各线程按该接口的请求间隔依次发送
+        get_rate_controller(template.endpoint).wait()
+        response = session.get(template.url(), headers=template.headers)
+        response_json = decode_response(response)
 
         logging.info(
-            f"已发送【{course_name}】的专业内跨年级选课请求, 响应代码: {response.status_code}"
+            f"已发送【{course_name}】的{template.name}请求, 响应代码: {response.status_code}"
         )
-
-        if "flag1" in response_json:
-            if response_json["flag1"] == 3:
-                message = response_json.get("msgContent", "未知原因")
-                logging.warning(f"登录状态异常: {message}")
-                return None, message
-            elif response_json["flag1"] == 1:
-                logging.info(f"【{course_name}】的专业内跨年级选课成功")
-                return True, None
-        elif "success" in response_json:
-            message = response_json.get("message", "未知原因")
-            if isinstance(response_json["success"], list):
-                success = all(response_json["success"])
-            else:
-                success = response_json["success"]
-
-            if success:
-                logging.info(f"【{course_name}】的专业内跨年级选课成功: {message}")
-                return True, None
-            else:
-                logging.warning(f"【{course_name}】的专业内跨年级选课失败: {message}")
-                return False, message
-
-        logging.warning(f"【{course_name}】的专业内跨年级选课失败: {response_json}")
-        return False, str(response_json)
-
-    except Exception as e:
-        error_msg = str(e)
-        logging.error(
-            f"发送【{course_name}】的专业内跨年级选课请求数据失败: {error_msg}"
-        )
-        return None, error_msg
-
-
-def send_bxqjhxkOper_course_jx02id_and_jx0404id(
-    course_name, course_jx02id_and_jx0404id
-):
-    """发送本学期计划选课请求"""
-    try:
-        session = get_session()
-
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/bxqjhxkOper"
-        params = {
-            "kcid": course_jx02id_and_jx0404id["jx02id"],
-            "cfbs": "null",
-            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
-            "xkzy": "",
-            "trjf": "",
-            "_": str(int(time.time() * 1000)),
-        }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-            "Accept": "*/*",
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInBxqjhxk",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-        }
-
-        response = session.get(url, params=params, headers=headers)
-        response_json = response.json()
-
-        logging.info(
-            f"已发送【{course_name}】的本学期计划选课请求, 响应代码: {response.status_code}"
+        result, message = parse_oper_response(
+            template.name, course_name, response_json, session
         )
-
-        if "flag1" in response_json:
-            if response_json["flag1"] == 3:
-                message = response_json.get("msgContent", "未知原因")
-                logging.warning(f"登录状态异常: {message}")
-                return None, message
-            elif response_json["flag1"] == 1:
-                logging.info(f"【{course_name}】的本学期计划选课成功")
-                return True, None
-        elif "success" in response_json:
-            message = response_json.get("message", "未知原因")
-            if isinstance(response_json["success"], list):
-                success = all(response_json["success"])
-            else:
-                success = response_json["success"]
-
-            if success:
-                logging.info(f"【{course_name}】的本学期计划选课成功: {message}")
-                return True, None
-            else:
-                logging.warning(f"【{course_name}】的本学期计划选课失败: {message}")
-                return False, message
-
-        logging.warning(f"【{course_name}】的本学期计划选课失败: {response_json}")
-        return False, str(response_json)
-
+        report_message(template.url_prefix, message)
+        report_round_message(message)
+        return result, message
+
+    except ValueError as e:
+        # 选课页面失效时服务器返回的是HTML页面而不是JSON
+        invalidate_selection_round(f"{template.name}请求返回的不是JSON")
+        logging.error(f"【{course_name}】的{template.name}请求响应无法解析: {e}")
+        return None, str(e)
     except Exception as e:
         error_msg = str(e)
-        logging.error(f"发送【{course_name}】的本学期计划选课请求数据失败: {error_msg}")
-        return None, error_msg
-
-
-def send_xxxkOper_course_jx02id_and_jx0404id(course_name, course_jx02id_and_jx0404id):
-    """发送选修选课请求"""
-    try:
-        session = get_session()
-
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xxxkOper"
-        params = {
-            "kcid": course_jx02id_and_jx0404id["jx02id"],
-            "cfbs": "null",
-            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
-            "xkzy": "",
-            "trjf": "",
-            "_": str(int(time.time() * 1000)),
-        }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-            "Accept": "*/*",
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInXxxk",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-        }
-        response = session.get(url, params=params, headers=headers)
-        response_json = response.json()
-
-        logging.info(
-            f"已发送【{course_name}】的选修选课请求, 响应代码: {response.status_code}"
+        logging.error(
+            f"发送【{course_name}】的{template.name}请求数据失败: {error_msg}"
         )
-
-        if "flag1" in response_json:
-            if response_json["flag1"] == 3:
-                message = response_json.get("msgContent", "未知原因")
-                logging.warning(f"登录状态异常: {message}")
-                return None, message
-            elif response_json["flag1"] == 1:
-                logging.info(f"【{course_name}】的选修选课成功")
-                return True, None
-        elif "success" in response_json:
-            message = response_json.get("message", "未知原因")
-            if isinstance(response_json["success"], list):
-                success = all(response_json["success"])
-            else:
-                success = response_json["success"]
-
-            if success:
-                logging.info(f"【{course_name}】的选修选课成功: {message}")
-                return True, None
-            else:
-                logging.warning(f"【{course_name}】的选修选课失败: {message}")
-                return False, message
-
-        logging.warning(f"【{course_name}】的选修选课失败: {response_json}")
-        return False, str(response_json)
-
-    except Exception as e:
-        error_msg = str(e)
-        logging.error(f"发送【{course_name}】的选修选课请求数据失败: {error_msg}")
         return None, error_msg
 
 
-def send_fawxkOper_course_jx02id_and_jx0404id(course_name, course_jx02id_and_jx0404id):
-    """发送计划外选课请求"""
-    try:
-        session = get_session()
-
-        url = f"http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/fawxkOper"
-        params = {
-            "kcid": course_jx02id_and_jx0404id["jx02id"],
-            "cfbs": "null",
-            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
-            "xkzy": "",
-            "trjf": "",
-            "_": str(int(time.time() * 1000)),
-        }
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-            "Accept": "*/*",
-            "X-Requested-With": "XMLHttpRequest",
-            "Referer": "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInFawxk",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6",
-        }
+def get_selection_methods():
+    """
+    获取所有选课分类及其选课请求函数
 
-        response = session.get(url, params=params, headers=headers)
-        response_json = response.json()
-
-        logging.info(
-            f"已发送【{course_name}】的计划外选课请求, 响应代码: {response.status_code}"
-        )
-
-        if "flag1" in response_json:
-            if response_json["flag1"] == 3:
-                message = response_json.get("msgContent", "未知原因")
-                logging.warning(f"登录状态异常: {message}")
-                return None, message
-            elif response_json["flag1"] == 1:
-                logging.info(f"【{course_name}】的计划外选课成功")
-                return True, None
-        elif "success" in response_json:
-            message = response_json.get("message", "未知原因")
-            if isinstance(response_json["success"], list):
-                success = all(response_json["success"])
-            else:
-                success = response_json["success"]
-
-            if success:
-                logging.info(f"【{course_name}】的计划外选课成功: {message}")
-                return True, None
-            else:
-                logging.warning(f"【{course_name}】的计划外选课失败: {message}")
-                return False, message
-
-        logging.warning(f"【{course_name}】的计划外选课失败: {response_json}")
-        return False, str(response_json)
-
-    except Exception as e:
-        error_msg = str(e)
-        logging.error(f"发送【{course_name}】的计划外选课请求数据失败: {error_msg}")
-        return None, error_msg
+    Returns:
+        list: (选课分类, 名称, 选课请求函数) 列表，选课请求函数的参数为(course_name, course_jx02id_and_jx0404id)
+    """
+    return [
+        (category, info["name"], partial(send_oper_request, category))
+        for category, info in OPER_CATEGORIES.items()
+    ]
@@ -0,0 +1,206 @@
+import time
+import logging
+import datetime
+import threading
+from src.core.login import (
+    is_session_alive,
+    create_logged_in_session,
+    save_session_cookies,
+)
+from src.utils.session_manager import (
+    on_session_unhealthy,
+    mark_session_unhealthy,
+    restore_pooled_session,
+)
+
+# 全局心跳实例
+_heartbeat = None
+
+
+class SessionHeartbeat:
+    """
+    后台定期检查会话的登录状态，会话失效（被踢下线或过期）时重新登录，
+    并把新的cookie换到原会话上，正在使用该会话的选课循环不需要重建
+    """
+
+    def __init__(
+        self, session, user_account, user_password, select_semester, interval=30
+    ):
+        """
+        Args:
+            session: 需要保持登录的会话
+            user_account: 用户账号
+            user_password: 用户密码
+            select_semester: 选课学期，重新登录后用于重新进入选课轮次
+            interval: 检查间隔（秒）
+        """
+        self.session = session
+        # 该会话失效时只由心跳重新登录，会话池不再另外补充
+        self.session.external_recovery = True
+        self.user_account = user_account
+        self.user_password = user_password
+        self.select_semester = select_semester
+        self.interval = interval
+        self.last_alive = time.time()
+        self.outages = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._alive = threading.Event()
+        self._alive.set()
+        self._recover_lock = threading.Lock()
+        # check_now返回的事件，在下一次检查（以及可能的重新登录）结束后设置
+        self._pending_checks = []
+        self._pending_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="session-heartbeat", daemon=True
+        )
+        self._thread.start()
+        logging.info(f"会话心跳已启动，每 {self.interval} 秒检查一次登录状态")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._finish_checks(self._take_pending_checks())
+
+    def notify_dead(self, session=None):
+        """
+        选课请求返回登录状态异常时调用，立即唤醒心跳线程重新登录
+
+        Args:
+            session: 失效的会话，不是本心跳负责的会话时忽略
+        """
+        if session is not None and session is not self.session:
+            return
+        if self._alive.is_set():
+            logging.warning("选课请求提示登录状态异常，立即重新登录")
+            self._alive.clear()
+        self._wake.set()
+
+    def check_now(self):
+        """
+        立即唤醒心跳线程检查一次登录状态
+
+        Returns:
+            threading.Event: 本次检查结束（会话有效，或已尝试重新登录）后被设置的事件，
+                之后再用wait_until_alive等待会话可用
+        """
+        done = threading.Event()
+        with self._pending_lock:
+            self._pending_checks.append(done)
+        self._wake.set()
+        return done
+
+    def _take_pending_checks(self):
+        with self._pending_lock:
+            pending, self._pending_checks = self._pending_checks, []
+        return pending
+
+    def _finish_checks(self, pending):
+        for done in pending:
+            done.set()
+
+    def wait_until_alive(self, timeout=None):
+        """等待会话恢复登录状态，返回会话是否可用"""
+        return self._alive.wait(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            # 在检查开始前登记的check_now请求由本次检查完成
+            pending = self._take_pending_checks()
+            if self._stop.is_set():
+                self._finish_checks(pending)
+                break
+            try:
+                self._check()
+            except Exception as e:
+                logging.error(f"检查登录状态时出错: {e}")
+            finally:
+                self._finish_checks(pending)
+
+    def _check(self):
+        """检查一次登录状态，失效时重新登录"""
+        if self._alive.is_set() and is_session_alive(self.session):
+            self.last_alive = time.time()
+            return
+        self._alive.clear()
+        if self.session.healthy:
+            # 心跳自己发现的掉线，先移出会话池，避免恢复期间继续分配给选课请求
+            mark_session_unhealthy(self.session)
+        self.recover()
+
+    def recover(self):
+        """
+        重新登录并把新会话的cookie换到原会话上，失败时在下一次心跳继续尝试
+
+        Returns:
+            bool: 是否恢复成功
+        """
+        with self._recover_lock:
+            detected_at = time.time()
+            logging.critical(
+                f"检测到会话已失效，最后一次确认有效是在 "
+                f"{datetime.datetime.fromtimestamp(self.last_alive).strftime('%H:%M:%S')}，正在重新登录..."
+            )
+            try:
+                new_session = create_logged_in_session(
+                    self.user_account, self.user_password, self.select_semester
+                )
+            except Exception as e:
+                logging.error(f"重新登录失败，{self.interval} 秒后重试: {e}")
+                return False
+
+            # 替换cookie而不是会话对象，其他线程持有的会话引用继续有效
+            self.session.cookies = new_session.cookies
+            self.session.healthy = True
+            new_session.close()
+            save_session_cookies(self.session, self.user_account)
+            restore_pooled_session(self.session)
+
+            recovered_at = time.time()
+            outage = recovered_at - self.last_alive
+            self.outages.append(outage)
+            self.last_alive = recovered_at
+            self._alive.set()
+            logging.critical(
+                f"重新登录成功，本次掉线最长持续 {outage:.1f} 秒"
+                f"（发现掉线后 {recovered_at - detected_at:.1f} 秒恢复），累计掉线 {len(self.outages)} 次"
+            )
+            return True
+
+
+def start_session_heartbeat(
+    session, user_account, user_password, select_semester, interval=30
+):
+    """
+    启动全局会话心跳，会话被标记为失效时立即重新登录
+
+    Args:
+        interval: 检查间隔（秒），为0时不启动
+    """
+    global _heartbeat
+    if not interval:
+        return None
+    if _heartbeat is not None:
+        _heartbeat.stop()
+    else:
+        on_session_unhealthy(_notify_dead)
+    _heartbeat = SessionHeartbeat(
+        session, user_account, user_password, select_semester, interval
+    ).start()
+    return _heartbeat
+
+
+def _notify_dead(session):
+    if _heartbeat is not None:
+        _heartbeat.notify_dead(session)
+
+
+def get_session_heartbeat():
+    """获取全局会话心跳，未启动时返回None"""
+    return _heartbeat
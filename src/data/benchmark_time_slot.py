@@ -0,0 +1,190 @@
+"""
+上课时间匹配的基准测试
+
+以 test_get_course_jx02id_and_jx0404id.py 中的测试用例为基础生成大量课程数据，对比旧版每行都重新
+切分sksj、重建周次集合的写法，与按字符串缓存解析结果、用位掩码判断周次的写法。
+目标课程放在最后，每次查找都要检查全部课程；同时用原测试用例核对两种写法的结果一致
+
+用法:
+    python -m src.data.benchmark_time_slot
+    python -m src.data.benchmark_time_slot --rows 10000 --repeat 20
+"""
+
+import time
+import random
+import logging
+import argparse
+from src.data.time_slot import parse_sksj, parse_weeks
+from src.data.get_course_jx02id_and_jx0404id import find_course_jx02id_and_jx0404id
+from src.data.test_get_course_jx02id_and_jx0404id import (
+    find_course_jx02id_and_jx0404id as legacy_find_course_jx02id_and_jx0404id,
+)
+
+# test_get_course_jx02id_and_jx0404id.py 中出现的上课时间写法
+SKSJ_SAMPLES = [
+    "1,3,5,7,9,11,13,15,17周 星期三 3-4节",
+    "2,4,6,8,10,12,14,16,18周 星期三 3-4节",
+    "1-18周 星期一 1-2节",
+    "1-8周 星期二 5-6节",
+    "11-18周 星期四 7-8节",
+    "6-13周 星期五 9-10节",
+    "1-4,6,8-10周 星期一 1-2节",
+    "1,3,5,7,9,11,13,15,17周 星期三 5-6节",
+    "2,4,6,8,10,12,14,16周 星期三 3-4节",
+    "1-10周 星期二 5-6节",
+    "1-8周 星期二 1-2节",
+    "1-4周 星期一 1-2节<br>6-8周 星期一 1-2节",
+]
+
+# 测试用例：(课程, 预期的jx0404id)，课程数据见 make_test_rows
+TEST_CASES = [
+    (
+        {
+            "course_id_or_name": "530009",
+            "teacher_name": "李大新",
+            "weeks": "1,3,5,7,9,11,13,15,17",
+        },
+        "202420252014272",
+    ),
+    (
+        {
+            "course_id_or_name": "530009",
+            "teacher_name": "李大新",
+            "weeks": "2,4,6,8,10,12,14,16,18",
+        },
+        "202420252014273",
+    ),
+    (
+        {"course_id_or_name": "530009", "teacher_name": "张三", "weeks": "1-18"},
+        "202420252014274",
+    ),
+    (
+        {"course_id_or_name": "530010", "teacher_name": "李四", "weeks": "1-8"},
+        "202420252014275",
+    ),
+    (
+        {"course_id_or_name": "530011", "teacher_name": "王五", "weeks": "11-18"},
+        "202420252014276",
+    ),
+    (
+        {"course_id_or_name": "530012", "teacher_name": "赵六", "weeks": "6-13"},
+        "202420252014277",
+    ),
+    (
+        {"course_id_or_name": "530009", "teacher_name": "李大新", "weeks": "1,3,5"},
+        "202420252014272",
+    ),
+    (
+        {"course_id_or_name": "530013", "teacher_name": "钱七", "weeks": "1-4,6,8-10"},
+        "202420252014278",
+    ),
+]
+
+
+def make_test_rows():
+    """与 test_get_course_jx02id_and_jx0404id.py 相同的课程数据（只保留匹配用到的列）"""
+    rows = [
+        ("530009", "李大新", SKSJ_SAMPLES[0], "202420252014272"),
+        ("530009", "李大新", SKSJ_SAMPLES[1], "202420252014273"),
+        ("530009", "张三", SKSJ_SAMPLES[2], "202420252014274"),
+        ("530010", "李四", SKSJ_SAMPLES[3], "202420252014275"),
+        ("530011", "王五", SKSJ_SAMPLES[4], "202420252014276"),
+        ("530012", "赵六", SKSJ_SAMPLES[5], "202420252014277"),
+        ("530013", "钱七", SKSJ_SAMPLES[6], "202420252014278"),
+        ("530009", "王教练", SKSJ_SAMPLES[0], "202420252014279"),
+        ("530099", "李大新", SKSJ_SAMPLES[0], "202420252014280"),
+        ("530009", "李大新", SKSJ_SAMPLES[7], "202420252014281"),
+        ("530009", "李大新", SKSJ_SAMPLES[8], "202420252014282"),
+        ("530010", "李四", SKSJ_SAMPLES[9], "202420252014283"),
+        ("530011", "王五", SKSJ_SAMPLES[10], "202420252014284"),
+        ("530013", "钱七", SKSJ_SAMPLES[11], "202420252014285"),
+    ]
+    return [
+        {
+            "kch": kch,
+            "skls": skls,
+            "sksj": sksj,
+            "jx0404id": jx0404id,
+            "jx02id": f"X{jx0404id}",
+        }
+        for kch, skls, sksj, jx0404id in rows
+    ]
+
+
+def make_rows(count, seed=0):
+    """
+    生成count行同一课程、同一教师的课程数据，只有最后一行的周次包含目标周次1-18
+
+    Returns:
+        tuple: (课程, 课程数据)
+    """
+    rng = random.Random(seed)
+    # 除最后一行外都不包含第18周
+    samples = [
+        s for s in SKSJ_SAMPLES if not parse_sksj(s).covers_weeks(parse_weeks("1-18"))
+    ]
+    rows = [
+        {
+            "kch": "530009",
+            "skls": "李大新",
+            "sksj": rng.choice(samples),
+            "jx0404id": f"2024202520{i:05d}",
+            "jx02id": f"J{i:05d}",
+        }
+        for i in range(count - 1)
+    ]
+    rows.append(
+        {
+            "kch": "530009",
+            "skls": "李大新",
+            "sksj": "1-18周 星期三 3-4节",
+            "jx0404id": "target",
+            "jx02id": "target",
+        }
+    )
+    course = {"course_id_or_name": "530009", "teacher_name": "李大新", "weeks": "1-18"}
+    return course, rows
+
+
+def measure(func, repeat):
+    """返回每次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上课时间匹配基准测试")
+    parser.add_argument("--rows", type=int, default=10000, help="课程数据的行数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种写法的查找次数")
+    args = parser.parse_args()
+
+    # 匹配函数每次找到课程都会输出日志，只测匹配本身的开销
+    logging.disable(logging.CRITICAL)
+
+    test_rows = make_test_rows()
+    for course, expected in TEST_CASES:
+        legacy = legacy_find_course_jx02id_and_jx0404id(course, test_rows)
+        result = find_course_jx02id_and_jx0404id(course, test_rows)
+        assert legacy["jx0404id"] == result["jx0404id"] == expected, course
+    print(f"{len(TEST_CASES)} 个测试用例的结果一致")
+
+    course, rows = make_rows(args.rows)
+    assert find_course_jx02id_and_jx0404id(course, rows)["jx0404id"] == "target"
+    print(f"\n{args.rows} 行课程数据，查找 {args.repeat} 次")
+
+    legacy = measure(
+        lambda: legacy_find_course_jx02id_and_jx0404id(course, rows), args.repeat
+    )
+    print(f"  {'旧版: 每行重新解析':<20}{legacy:>10.2f} ms/次")
+    parse_sksj.cache_clear()
+    parse_weeks.cache_clear()
+    first = measure(lambda: find_course_jx02id_and_jx0404id(course, rows), 1)
+    print(f"  {'位掩码: 首次（无缓存）':<20}{first:>10.2f} ms/次")
+    cached = measure(lambda: find_course_jx02id_and_jx0404id(course, rows), args.repeat)
+    print(f"  {'位掩码: 已缓存':<20}{cached:>10.2f} ms/次{legacy / cached:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
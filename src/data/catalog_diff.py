@@ -0,0 +1,254 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from src.utils.session_manager import get_session
+from src.utils.fast_json import decode_response
+from src.data.catalog_store import get_catalog_store, record_search_rows
+from src.data.course_catalog import (
+    DEFAULT_PAGE_SIZE,
+    SEARCH_CATEGORIES,
+    fetch_category_page,
+    get_total,
+)
+
+# 名额相关的列：容量、已选人数、剩余名额
+SEAT_FIELDS = ("xxrs", "xkrs", "syrs")
+# 保留最近多少次轮询的统计
+METRICS_HISTORY = 200
+
+
+def parse_seat_count(value):
+    """把接口返回的人数转换为整数，无法转换时返回None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_seats(row):
+    """课程的(容量, 已选人数, 剩余名额)"""
+    return tuple(parse_seat_count(row.get(field)) for field in SEAT_FIELDS)
+
+
+class CatalogDiff:
+    """
+    选课分类的一次轮询与上一次快照之间的差异
+
+    Attributes:
+        added: 新出现的课程
+        removed: 消失的课程
+        seat_changes: 名额有变化的课程，每项为(上一次的数据, 本次的数据)
+    """
+
+    def __init__(self, category, added=None, removed=None, seat_changes=None):
+        self.category = category
+        self.added = added or []
+        self.removed = removed or []
+        self.seat_changes = seat_changes or []
+
+    @property
+    def size(self):
+        return len(self.added) + len(self.removed) + len(self.seat_changes)
+
+    def __bool__(self):
+        return self.size > 0
+
+    def changed_rows(self):
+        """新出现或名额有变化的课程的最新数据"""
+        return self.added + [new for _, new in self.seat_changes]
+
+    def opened(self):
+        """剩余名额从0变为大于0的课程，以及新出现的有剩余名额的课程"""
+        rows = [r for r in self.added if (get_seats(r)[2] or 0) > 0]
+        for old, new in self.seat_changes:
+            if (get_seats(old)[2] or 0) <= 0 < (get_seats(new)[2] or 0):
+                rows.append(new)
+        return rows
+
+
+def compute_diff(category, old_rows, new_rows):
+    """
+    比较两次快照
+
+    Args:
+        old_rows: 上一次快照，jx0404id到课程数据的映射
+        new_rows: 本次快照，jx0404id到课程数据的映射
+    """
+    added = [row for key, row in new_rows.items() if key not in old_rows]
+    removed = [row for key, row in old_rows.items() if key not in new_rows]
+    seat_changes = [
+        (old_rows[key], row)
+        for key, row in new_rows.items()
+        if key in old_rows and get_seats(old_rows[key]) != get_seats(row)
+    ]
+    return CatalogDiff(category, added, removed, seat_changes)
+
+
+class CategorySnapshot:
+    """选课分类的一次完整快照：每页响应内容的哈希、解析出的课程和总行数"""
+
+    def __init__(self):
+        self.page_hashes = []
+        self.page_rows = []
+        self.page_totals = []
+        self.rows = {}
+
+
+class CatalogSync:
+    """
+    增量同步选课分类的课程列表
+
+    每次轮询都分页下载整个分类，响应内容与上一次相同的页直接沿用上一次的解析结果，
+    只把与上一次快照的差异（新增、消失、名额变化的课程）交给调用方，
+    并记录每次轮询下载的字节数、耗时、解析的页数和差异大小，用于调整轮询频率
+    """
+
+    def __init__(self, categories=None, page_size=DEFAULT_PAGE_SIZE):
+        self.categories = list(categories or SEARCH_CATEGORIES)
+        self.page_size = page_size
+        self.snapshots = {}
+        self.metrics = deque(maxlen=METRICS_HISTORY)
+        self._lock = threading.Lock()
+
+    def fetch(self, session, category, previous):
+        """
+        分页下载选课分类，返回新的快照和本次下载的统计
+
+        Returns:
+            tuple: (CategorySnapshot, metrics)
+        """
+        snapshot = CategorySnapshot()
+        metrics = {
+            "pages": 0,
+            "pages_parsed": 0,
+            "bytes": 0,
+            "fetch_time": 0.0,
+            "parse_time": 0.0,
+        }
+        seen = set()
+        while True:
+            index = len(snapshot.page_hashes)
+            start = time.perf_counter()
+            response = fetch_category_page(
+                session, category, start=len(snapshot.rows), length=self.page_size
+            )
+            content = response.content
+            metrics["fetch_time"] += time.perf_counter() - start
+            metrics["pages"] += 1
+            metrics["bytes"] += len(content)
+
+            digest = hashlib.blake2b(content, digest_size=16).digest()
+            if (
+                previous is not None
+                and index < len(previous.page_hashes)
+                and previous.page_hashes[index] == digest
+            ):
+                # 这一页与上一次完全相同，不需要解析
+                rows = previous.page_rows[index]
+                total = previous.page_totals[index]
+            else:
+                start = time.perf_counter()
+                data = decode_response(response)
+                rows = data.get("aaData") or []
+                for row in rows:
+                    row["category"] = category
+                total = get_total(data)
+                metrics["parse_time"] += time.perf_counter() - start
+                metrics["pages_parsed"] += 1
+
+            snapshot.page_hashes.append(digest)
+            snapshot.page_rows.append(rows)
+            snapshot.page_totals.append(total)
+            # 服务器忽略分页参数重复返回同一页时停止
+            new_rows = [r for r in rows if r.get("jx0404id") not in seen]
+            for row in new_rows:
+                seen.add(row.get("jx0404id"))
+                snapshot.rows[row.get("jx0404id")] = row
+            if not new_rows or len(snapshot.rows) >= total:
+                return snapshot, metrics
+
+    def poll(self, category, session=None):
+        """
+        轮询一个选课分类，返回与上一次快照的差异
+
+        第一次轮询时分类中的所有课程都是新增的课程
+        """
+        session = session or get_session()
+        with self._lock:
+            previous = self.snapshots.get(category)
+        snapshot, metrics = self.fetch(session, category, previous)
+
+        start = time.perf_counter()
+        if (
+            previous is not None
+            and metrics["pages_parsed"] == 0
+            and len(snapshot.page_hashes) == len(previous.page_hashes)
+        ):
+            diff = CatalogDiff(category)
+            snapshot.rows = previous.rows
+        else:
+            diff = compute_diff(
+                category, previous.rows if previous else {}, snapshot.rows
+            )
+        metrics["diff_time"] = time.perf_counter() - start
+        with self._lock:
+            self.snapshots[category] = snapshot
+
+        # 课程数据库只写入有变化的课程，其余仍在列表中的课程只更新快照时间，
+        # 已从列表中消失的课程标记为过期，查找课程时不再返回
+        try:
+            store = get_catalog_store()
+            store.touch(category, list(snapshot.rows))
+            if diff.removed:
+                store.expire([row.get("jx0404id") for row in diff.removed])
+        except Exception as e:
+            logging.warning(f"更新课程数据库的快照时间失败: {e}")
+        record_search_rows(category, diff.changed_rows())
+
+        metrics.update(
+            {
+                "time": time.time(),
+                "category": category,
+                "rows": len(snapshot.rows),
+                "added": len(diff.added),
+                "removed": len(diff.removed),
+                "seat_changes": len(diff.seat_changes),
+            }
+        )
+        self.metrics.append(metrics)
+        logging.debug(
+            f"{SEARCH_CATEGORIES[category]['name']}同步完成: {metrics['pages']} 页"
+            f"（解析 {metrics['pages_parsed']} 页），{metrics['bytes'] / 1024:.1f} KB，"
+            f"下载 {metrics['fetch_time'] * 1000:.0f} ms，解析 {metrics['parse_time'] * 1000:.1f} ms，"
+            f"新增 {metrics['added']}，消失 {metrics['removed']}，名额变化 {metrics['seat_changes']}"
+        )
+        return diff
+
+    def poll_all(self, session=None):
+        """轮询所有选课分类，返回有差异的分类的差异列表"""
+        diffs = []
+        for category in self.categories:
+            try:
+                diff = self.poll(category, session)
+            except Exception as e:
+                logging.warning(
+                    f"同步{SEARCH_CATEGORIES[category]['name']}的课程列表失败: {e}"
+                )
+                continue
+            if diff:
+                diffs.append(diff)
+        return diffs
+
+    def get_rows(self, category):
+        """选课分类最近一次快照中的课程，jx0404id到课程数据的映射"""
+        with self._lock:
+            snapshot = self.snapshots.get(category)
+        return snapshot.rows if snapshot else {}
+
+    def get_metrics(self, category=None):
+        """最近各次轮询的统计，可以按选课分类筛选"""
+        return [
+            m for m in self.metrics if category is None or m["category"] == category
+        ]
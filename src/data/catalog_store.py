@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from src.utils.json_store import get_cache_path
+
+# 数据库文件名，位于缓存目录下
+STORE_FILE = "catalog.db"
+# 用于选课的课程数据的最长有效期（秒），更早的快照只用于查询
+DEFAULT_MAX_AGE = 10 * 60
+
+WEEKDAYS = "一二三四五六日"
+SKSJ_SLOT_PATTERN = re.compile(r"星期([一二三四五六日天])\s*(\d+(?:-\d+)?)节")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    jx0404id TEXT PRIMARY KEY,
+    jx02id TEXT,
+    category TEXT,
+    kch TEXT,
+    kcmc TEXT,
+    skls TEXT,
+    sksj TEXT,
+    xxrs INTEGER,
+    xkrs INTEGER,
+    syrs INTEGER,
+    data TEXT,
+    snapshot_at REAL
+);
+CREATE TABLE IF NOT EXISTS course_slots (
+    jx0404id TEXT,
+    weekday TEXT,
+    period TEXT,
+    PRIMARY KEY (jx0404id, weekday, period)
+);
+-- 按课程编号和教师查找最常用，两列一起索引；也可以单独按课程编号查找
+CREATE INDEX IF NOT EXISTS idx_courses_kch_skls ON courses (kch, skls);
+CREATE INDEX IF NOT EXISTS idx_courses_kcmc ON courses (kcmc);
+CREATE INDEX IF NOT EXISTS idx_courses_skls ON courses (skls);
+CREATE INDEX IF NOT EXISTS idx_courses_category ON courses (category);
+CREATE INDEX IF NOT EXISTS idx_courses_syrs ON courses (syrs);
+CREATE INDEX IF NOT EXISTS idx_slots_weekday_period ON course_slots (weekday, period);
+"""
+
+
+def get_row_slots(row):
+    """
+    获取课程的上课星期和节次
+
+    Returns:
+        set: (上课星期, 上课节次) 集合，例如 {("1", "1-2")}
+    """
+    slots = set()
+    for arrangement in row.get("kkapList") or []:
+        week_day = str(arrangement.get("xq", ""))
+        period = str(arrangement.get("skjcmc", "")).rstrip("节")
+        if week_day and period:
+            slots.add((week_day, period))
+    if not slots:
+        for weekday, period in SKSJ_SLOT_PATTERN.findall(row.get("sksj") or ""):
+            slots.add((str(WEEKDAYS.find(weekday.replace("天", "日")) + 1), period))
+    return slots
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CatalogStore:
+    """
+    保存在本地SQLite数据库中的课程数据
+
+    每次搜索返回的课程都写入数据库，按课程编号、课程名称、教师、上课星期、节次和
+    选课分类建立索引，每行记录最后一次搜索到的时间（snapshot_at）
+    """
+
+    def __init__(self, path=None):
+        path = path or get_cache_path(STORE_FILE)
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # 多个线程共用一个连接，由锁保证同一时间只有一个线程访问；多个进程之间由SQLite加锁
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def upsert_rows(self, category, rows, snapshot_at=None):
+        """
+        写入一次搜索返回的课程数据，已存在的课程更新为最新的数据
+
+        Returns:
+            int: 写入的行数
+        """
+        snapshot_at = snapshot_at or time.time()
+        records = []
+        slots = []
+        for row in rows:
+            jx0404id = row.get("jx0404id")
+            if not jx0404id:
+                continue
+            records.append(
+                (
+                    jx0404id,
+                    row.get("jx02id"),
+                    category,
+                    str(row.get("kch", "")),
+                    str(row.get("kcmc", "")),
+                    str(row.get("skls", "")),
+                    row.get("sksj"),
+                    _to_int(row.get("xxrs")),
+                    _to_int(row.get("xkrs")),
+                    _to_int(row.get("syrs")),
+                    json.dumps(row, ensure_ascii=False),
+                    snapshot_at,
+                )
+            )
+            slots.extend((jx0404id, w, p) for w, p in get_row_slots(row))
+        if not records:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            self._conn.executemany(
+                "DELETE FROM course_slots WHERE jx0404id = ?",
+                [(r[0],) for r in records],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO course_slots VALUES (?, ?, ?)", slots
+            )
+        return len(records)
+
+    def touch(self, category, jx0404ids=None, snapshot_at=None):
+        """
+        把课程的快照时间更新为现在，用于再次搜索到但数据没有变化的课程
+
+        Args:
+            category: 选课分类
+            jx0404ids: 需要更新的课程，默认该分类的全部课程
+        """
+        snapshot_at = snapshot_at or time.time()
+        with self._lock, self._conn:
+            if jx0404ids is None:
+                self._conn.execute(
+                    "UPDATE courses SET snapshot_at = ? WHERE category = ?",
+                    (snapshot_at, category),
+                )
+            else:
+                self._conn.executemany(
+                    "UPDATE courses SET snapshot_at = ? WHERE jx0404id = ?",
+                    [(snapshot_at, jx0404id) for jx0404id in jx0404ids],
+                )
+
+    def expire(self, jx0404ids):
+        """
+        把课程标记为过期，之后按有效期查找时不再返回，但仍可以按jx0404id获取
+
+        用于选课时提示不存在或已从课程列表中消失的课程
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE courses SET snapshot_at = 0 WHERE jx0404id = ?",
+                [(str(jx0404id),) for jx0404id in jx0404ids],
+            )
+
+    def find(
+        self,
+        kch=None,
+        kcmc=None,
+        skls=None,
+        week_day=None,
+        period=None,
+        category=None,
+        max_age=None,
+        min_syrs=None,
+    ):
+        """
+        按条件查找课程，未指定的条件不参与筛选
+
+        Args:
+            max_age: 只返回最近max_age秒内搜索到的课程
+            min_syrs: 只返回剩余名额不少于该值的课程
+
+        Returns:
+            list: 课程数据列表，与搜索接口返回的行格式相同，另带有category和snapshot_at
+        """
+        conditions = []
+        args = []
+        for column, value in (
+            ("c.kch", kch),
+            ("c.kcmc", kcmc),
+            ("c.skls", skls),
+            ("c.category", category),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(str(value))
+        if week_day is not None or period is not None:
+            slot_conditions = ["s.jx0404id = c.jx0404id"]
+            if week_day is not None:
+                slot_conditions.append("s.weekday = ?")
+                args.append(str(week_day))
+            if period is not None:
+                slot_conditions.append("s.period = ?")
+                args.append(str(period))
+            conditions.append(
+                f"EXISTS (SELECT 1 FROM course_slots s WHERE {' AND '.join(slot_conditions)})"
+            )
+        if max_age is not None:
+            conditions.append("c.snapshot_at >= ?")
+            args.append(time.time() - max_age)
+        if min_syrs is not None:
+            conditions.append("c.syrs >= ?")
+            args.append(min_syrs)
+
+        sql = "SELECT c.category, c.data, c.snapshot_at FROM courses c"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            records = self._conn.execute(sql, args).fetchall()
+        return [
+            {
+                **json.loads(r["data"]),
+                "category": r["category"],
+                "snapshot_at": r["snapshot_at"],
+            }
+            for r in records
+        ]
+
+    def get(self, jx0404id):
+        """按jx0404id获取课程数据，不存在时返回None"""
+        with self._lock:
+            record = self._conn.execute(
+                "SELECT category, data, snapshot_at FROM courses WHERE jx0404id = ?",
+                (str(jx0404id),),
+            ).fetchone()
+        if record is None:
+            return None
+        return {
+            **json.loads(record["data"]),
+            "category": record["category"],
+            "snapshot_at": record["snapshot_at"],
+        }
+
+    def find_course(self, course, max_age=DEFAULT_MAX_AGE):
+        """查找与课程配置的课程编号、教师、上课星期和节次相符且足够新的课程数据"""
+        return self.find(
+            kch=course["course_id_or_name"],
+            skls=course["teacher_name"],
+            week_day=course.get("week_day") or None,
+            period=course.get("class_period") or None,
+            max_age=max_age,
+        )
+
+    def open_courses(self, category=None, max_age=DEFAULT_MAX_AGE):
+        """查找还有剩余名额的课程"""
+        return self.find(category=category, max_age=max_age, min_syrs=1)
+
+    def snapshot_time(self, category=None):
+        """最近一次写入课程数据的时间，没有数据时返回None"""
+        sql = "SELECT MAX(snapshot_at) FROM courses"
+        args = []
+        if category is not None:
+            sql += " WHERE category = ?"
+            args.append(category)
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_catalog_store():
+    """获取课程数据库，首次调用时打开"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CatalogStore()
+        return _store
+
+
+def record_search_rows(category, rows):
+    """把搜索返回的课程数据写入课程数据库，写入失败不影响选课"""
+    if not rows:
+        return
+    try:
+        get_catalog_store().upsert_rows(category, rows)
+    except sqlite3.Error as e:
+        logging.warning(f"写入课程数据库失败: {e}")
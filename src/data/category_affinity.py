@@ -0,0 +1,84 @@
+import time
+import logging
+import threading
+from src.utils.json_store import load_json, save_json, get_cache_path
+
+# 记录文件名，位于缓存目录下
+AFFINITY_FILE = "category_affinity.json"
+# 选课失败信息包含这些关键字时，换其他分类选课也不会成功
+DEFINITIVE_FAILURE_KEYWORDS = ("已满", "冲突", "已选", "已经选")
+
+_affinity = None
+_affinity_lock = threading.Lock()
+
+
+def _load_affinity():
+    global _affinity
+    if _affinity is None:
+        _affinity = load_json(get_cache_path(AFFINITY_FILE), {})
+    return _affinity
+
+
+def _record(jx0404id, field, category):
+    if not jx0404id or not category:
+        return
+    with _affinity_lock:
+        entry = _load_affinity().setdefault(jx0404id, {})
+        if entry.get(field) == category:
+            return
+        entry[field] = category
+        entry["updated_at"] = time.time()
+        save_json(get_cache_path(AFFINITY_FILE), _affinity)
+
+
+def record_search_category(jx0404id, category):
+    """记录课程是在哪个选课分类中搜索到的"""
+    _record(jx0404id, "search_category", category)
+
+
+def record_oper_category(jx0404id, category):
+    """记录课程是通过哪个选课分类的选课请求选上的"""
+    _record(jx0404id, "oper_category", category)
+
+
+def get_preferred_category(jx0404id):
+    """获取课程优先使用的选课分类，选课成功的分类优先于搜索到的分类"""
+    with _affinity_lock:
+        entry = _load_affinity().get(jx0404id)
+    if not entry:
+        return None
+    return entry.get("oper_category") or entry.get("search_category")
+
+
+def forget_category(jx0404id):
+    """删除课程的分类记录"""
+    with _affinity_lock:
+        if _load_affinity().pop(jx0404id, None) is not None:
+            logging.info(f"已删除jx0404id: {jx0404id} 的选课分类记录")
+            save_json(get_cache_path(AFFINITY_FILE), _affinity)
+
+
+def is_definitive_failure(messages):
+    """判断选课失败信息是否表示课程本身无法选上（名额已满、时间冲突、已经选过）"""
+    return any(
+        keyword in message
+        for message in messages
+        for keyword in DEFINITIVE_FAILURE_KEYWORDS
+    )
+
+
+def split_selection_methods(jx0404id, selection_methods):
+    """
+    根据分类记录拆分选课方式
+
+    Args:
+        jx0404id: 课程jx0404id
+        selection_methods: [(分类, 选课方式名称, 选课函数), ...]
+
+    Returns:
+        tuple: (优先尝试的选课方式列表, 其余选课方式列表)，没有记录时优先列表为空
+    """
+    category = get_preferred_category(jx0404id)
+    preferred = [m for m in selection_methods if m[0] == category]
+    fallback = [m for m in selection_methods if m[0] != category]
+    return preferred, fallback
@@ -0,0 +1,358 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.session_manager import get_session
+from src.utils.config_loader import load_config
+from src.utils.fast_json import decode_response
+from src.core.send_course_data import XSXKKC_URL, COME_IN_URLS
+from src.data.catalog_store import get_row_slots, record_search_rows
+
+# 课程列表的公共列
+BASE_COLUMNS = [
+    "kch",
+    "kcmc",
+    "fzmc",
+    "ktmc",
+    "xf",
+    "skls",
+    "sksj",
+    "skdd",
+    "xqmc",
+    "ctsm",
+    "czOper",
+]
+
+# 各选课分类的搜索接口：名称、接口地址、返回的列和额外的查询参数，顺序即依次搜索的顺序
+SEARCH_CATEGORIES = {
+    "knjxk": {
+        "name": "专业内跨年级选课",
+        "search_url": f"{XSXKKC_URL}/xsxkKnjxk",
+        "columns": BASE_COLUMNS,
+        "params": {},
+    },
+    "bxqjhxk": {
+        "name": "本学期计划选课",
+        "search_url": f"{XSXKKC_URL}/xsxkBxqjhxk",
+        "columns": BASE_COLUMNS,
+        "params": {},
+    },
+    "xxxk": {
+        "name": "选修选课",
+        "search_url": f"{XSXKKC_URL}/xsxkXxxk",
+        "columns": BASE_COLUMNS,
+        "params": {},
+    },
+    "ggxxkxk": {
+        "name": "公选课选课",
+        "search_url": f"{XSXKKC_URL}/xsxkGgxxkxk",
+        # 公选课的列表带有容量、已选人数和剩余名额
+        "columns": [
+            "kch",
+            "kcmc",
+            "xf",
+            "skls",
+            "sksj",
+            "skdd",
+            "xqmc",
+            "xxrs",
+            "xkrs",
+            "syrs",
+            "ctsm",
+            "szkcflmc",
+            "czOper",
+        ],
+        "params": {"szjylb": ""},
+    },
+    "fawxk": {
+        "name": "计划外选课",
+        "search_url": f"{XSXKKC_URL}/xsxkFawxk",
+        "columns": BASE_COLUMNS,
+        "params": {},
+    },
+}
+
+# 下载整个课程列表时每页的行数
+DEFAULT_PAGE_SIZE = 500
+# 分页搜索时同时请求的最大页数
+DEFAULT_WINDOW = 4
+# 课程列表的有效期（秒），超过后下次查找时重新下载
+DEFAULT_CATALOG_TTL = 10 * 60
+
+
+def build_search_request(category, filters=None, start=0, length=15):
+    """
+    构建选课分类搜索接口的请求
+
+    Args:
+        category: 选课分类，见SEARCH_CATEGORIES
+        filters: 搜索条件，可包含course_id_or_name、teacher_name、week_day、class_period，
+            为空时搜索该分类的全部课程
+        start: 起始行（iDisplayStart）
+        length: 每页行数（iDisplayLength）
+
+    Returns:
+        tuple: (url, params, data)
+    """
+    info = SEARCH_CATEGORIES[category]
+    filters = filters or {}
+    params = {
+        "kcxx": filters.get("course_id_or_name", ""),  # 课程名称
+        "skls": filters.get("teacher_name", ""),  # 教师姓名
+        "skxq": filters.get("week_day", ""),  # 上课星期
+        "skjc": filters.get("class_period", ""),  # 上课节次
+        **info["params"],
+        "sfym": "false",  # 是否已满
+        "sfct": "true",  # 是否冲突
+        "sfxx": "true",  # 是否限选
+    }
+    data = {
+        "sEcho": 1,
+        "iColumns": len(info["columns"]),
+        "sColumns": "",
+        "iDisplayStart": start,
+        "iDisplayLength": length,
+    }
+    for i, column in enumerate(info["columns"]):
+        data[f"mDataProp_{i}"] = column
+    return info["search_url"], params, data
+
+
+def fetch_category_page(session, category, filters=None, start=0, length=15):
+    """
+    请求选课分类搜索接口的一页数据，不解析响应内容
+
+    Raises:
+        Exception: 接口返回404时
+    """
+    url, params, data = build_search_request(category, filters, start, length)
+    response = session.post(url, params=params, data=data)
+    if response.status_code == 404:
+        raise Exception("404 Not Found")
+    return response
+
+
+def search_category(session, category, filters=None, start=0, length=15):
+    """
+    请求选课分类搜索接口的一页数据，返回的课程同时写入课程数据库
+
+    Returns:
+        dict: 接口返回的JSON数据
+
+    Raises:
+        Exception: 接口返回404时
+        ValueError: 接口返回的不是JSON时
+    """
+    response = fetch_category_page(session, category, filters, start, length)
+    response_data = decode_response(response)
+    record_search_rows(category, response_data.get("aaData"))
+    return response_data
+
+
+def get_total(page):
+    """搜索结果的总行数"""
+    return int(page.get("iTotalDisplayRecords") or page.get("iTotalRecords") or 0)
+
+
+def iter_search_rows(
+    session, category, filters=None, page_size=15, window=DEFAULT_WINDOW
+):
+    """
+    分页获取选课分类的搜索结果，逐行返回
+
+    先请求第一页得到总行数，之后最多同时请求window页，按页的顺序返回每页的课程，
+    调用方找到需要的课程后停止迭代即可，尚未发出的请求不再发送
+
+    Args:
+        session: 请求会话
+        category: 选课分类，见SEARCH_CATEGORIES
+        filters: 搜索条件，见build_search_request
+        page_size: 每页行数
+        window: 同时请求的最大页数
+
+    Yields:
+        dict: 课程数据，带有所在的选课分类category
+
+    Raises:
+        Exception: 接口返回404时
+        ValueError: 接口返回的不是JSON时
+    """
+    seen = set()
+
+    def new_rows(page):
+        # 服务器忽略分页参数重复返回同一页时，重复的行会被过滤掉
+        rows = []
+        for row in page.get("aaData") or []:
+            key = row.get("jx0404id")
+            if key in seen:
+                continue
+            seen.add(key)
+            row["category"] = category
+            rows.append(row)
+        return rows
+
+    first = search_category(session, category, filters, 0, page_size)
+    rows = new_rows(first)
+    yield from rows
+    total = get_total(first)
+    if not rows or len(rows) >= total:
+        return
+
+    # 服务器限制了每页行数时按实际返回的行数翻页
+    step = len(first.get("aaData"))
+    starts = iter(range(step, total, step))
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, window), thread_name_prefix="search"
+    )
+    pending = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            pending.append(
+                executor.submit(
+                    search_category, session, category, filters, start, page_size
+                )
+            )
+
+    try:
+        for _ in range(max(1, window)):
+            submit_next()
+        while pending:
+            page = pending.popleft().result()
+            submit_next()
+            rows = new_rows(page)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        # 调用方提前停止时取消还没有开始的请求
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def download_category(session, category, page_size=DEFAULT_PAGE_SIZE):
+    """
+    不带搜索条件分页下载选课分类的全部课程
+
+    Returns:
+        list: 课程数据列表，每行带有所在的选课分类category
+    """
+    response = session.get(COME_IN_URLS[category])
+    if response.status_code == 404:
+        raise Exception("404 Not Found")
+    return list(iter_search_rows(session, category, page_size=page_size))
+
+
+class CourseCatalog:
+    """
+    各选课分类全部课程的本地索引
+
+    按(课程编号, 教师)和(课程编号, 教师, 上课星期, 上课节次)索引，
+    所有配置的课程都在本地查找，不再逐个课程请求搜索接口
+    """
+
+    def __init__(self, rows=None):
+        self.rows = []
+        self.by_teacher = {}
+        self.by_slot = {}
+        self.downloaded_at = time.time()
+        for row in rows or []:
+            self.add(row)
+
+    def add(self, row):
+        key = (str(row.get("kch", "")), str(row.get("skls", "")))
+        self.rows.append(row)
+        self.by_teacher.setdefault(key, []).append(row)
+        for week_day, period in get_row_slots(row):
+            self.by_slot.setdefault((*key, week_day, period), []).append(row)
+
+    def remove(self, jx0404id):
+        """从索引中删除课程"""
+
+        def keep(rows):
+            return [row for row in rows if row.get("jx0404id") != jx0404id]
+
+        self.rows = keep(self.rows)
+        for index in (self.by_teacher, self.by_slot):
+            for key in list(index):
+                index[key] = keep(index[key])
+                if not index[key]:
+                    del index[key]
+
+    def candidates(self, course):
+        """
+        查找与课程编号、教师、上课星期和节次相符的课程数据
+
+        未填写上课星期和节次时返回该课程编号和教师的全部数据
+        """
+        key = (str(course["course_id_or_name"]), str(course["teacher_name"]))
+        if course.get("week_day") and course.get("class_period"):
+            return self.by_slot.get(
+                (*key, str(course["week_day"]), str(course["class_period"])), []
+            )
+        return self.by_teacher.get(key, [])
+
+    def is_expired(self, ttl=DEFAULT_CATALOG_TTL):
+        return time.time() - self.downloaded_at > ttl
+
+
+def download_catalog(session=None, categories=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    下载各选课分类的全部课程并建立本地索引，某个分类下载失败时跳过该分类
+
+    Args:
+        session: 请求会话，默认使用当前会话
+        categories: 需要下载的选课分类，默认全部分类
+        page_size: 每页的行数
+    """
+    session = session or get_session()
+    catalog = CourseCatalog()
+    for category in categories or SEARCH_CATEGORIES:
+        name = SEARCH_CATEGORIES[category]["name"]
+        try:
+            rows = download_category(session, category, page_size)
+        except Exception as e:
+            logging.warning(f"下载{name}的课程列表失败: {e}")
+            continue
+        for row in rows:
+            catalog.add(row)
+        logging.info(f"已下载{name}的课程列表，共 {len(rows)} 门")
+    logging.info(f"课程列表下载完成，共 {len(catalog.rows)} 门课程")
+    return catalog
+
+
+def is_bulk_catalog_enabled():
+    """是否启用整表下载，由config.json的bulk_catalog控制"""
+    try:
+        return bool(load_config().get("bulk_catalog", False))
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    获取本地课程索引，未启用整表下载时返回None
+
+    首次调用或索引过期时重新下载，多个线程同时调用时只下载一次
+    """
+    global _catalog
+    if not is_bulk_catalog_enabled():
+        return None
+    with _catalog_lock:
+        if _catalog is None or _catalog.is_expired():
+            _catalog = download_catalog()
+        return _catalog
+
+
+def forget_catalog_course(jx0404id):
+    """从已下载的本地课程索引中删除课程，下次查找该课程时不再命中"""
+    with _catalog_lock:
+        if _catalog is not None:
+            _catalog.remove(jx0404id)
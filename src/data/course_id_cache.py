@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+from src.utils.json_store import load_json, save_json, get_cache_path
+
+# 缓存文件名，位于缓存目录下
+CACHE_FILE = "course_id_cache.json"
+# 缓存有效期（秒）
+DEFAULT_TTL = 6 * 60 * 60
+# 选课请求返回这些关键字时认为缓存的课程已失效
+COURSE_NOT_FOUND_KEYWORDS = ("不存在", "未找到", "找不到")
+
+_cache = None
+_cache_lock = threading.Lock()
+# 当前选课轮次编号，作为缓存键的一部分，避免不同学期的缓存互相干扰
+_jx0502zbid = ""
+
+
+def set_jx0502zbid(jx0502zbid):
+    """设置当前选课轮次编号"""
+    global _jx0502zbid
+    _jx0502zbid = jx0502zbid or ""
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = load_json(get_cache_path(CACHE_FILE), {})
+    return _cache
+
+
+def get_cache_key(course):
+    """根据选课轮次和课程的搜索条件生成缓存键"""
+    return "|".join(
+        [
+            _jx0502zbid,
+            str(course.get("course_id_or_name", "")),
+            str(course.get("teacher_name", "")),
+            str(course.get("weeks", "")),
+            str(course.get("week_day", "")),
+            str(course.get("class_period", "")),
+        ]
+    )
+
+
+def get_cached_course_ids(course, ttl=DEFAULT_TTL):
+    """
+    获取缓存的课程jx02id和jx0404id
+
+    Returns:
+        dict: 包含jx02id、jx0404id和category的字典，未命中或已过期返回None
+    """
+    key = get_cache_key(course)
+    with _cache_lock:
+        entry = _load_cache().get(key)
+        if not entry:
+            return None
+        if time.time() - entry.get("cached_at", 0) > ttl:
+            logging.info(f"课程【{key}】的jx02id和jx0404id缓存已过期")
+            del _cache[key]
+            save_json(get_cache_path(CACHE_FILE), _cache)
+            return None
+        return {
+            "jx02id": entry["jx02id"],
+            "jx0404id": entry["jx0404id"],
+            "category": entry.get("category"),
+        }
+
+
+def save_course_ids(course, course_jx02id_and_jx0404id):
+    """缓存课程的jx02id、jx0404id以及所在的选课分类"""
+    key = get_cache_key(course)
+    with _cache_lock:
+        _load_cache()[key] = {
+            "jx02id": course_jx02id_and_jx0404id["jx02id"],
+            "jx0404id": course_jx02id_and_jx0404id["jx0404id"],
+            "category": course_jx02id_and_jx0404id.get("category"),
+            "cached_at": time.time(),
+        }
+        save_json(get_cache_path(CACHE_FILE), _cache)
+
+
+def invalidate_course_ids(course):
+    """删除课程的缓存，下次选课时重新搜索"""
+    key = get_cache_key(course)
+    with _cache_lock:
+        if _load_cache().pop(key, None) is not None:
+            logging.warning(
+                f"课程【{key}】的jx02id和jx0404id缓存已失效，下次将重新搜索"
+            )
+            save_json(get_cache_path(CACHE_FILE), _cache)
+
+
+def is_course_not_found(messages):
+    """判断选课失败信息是否全部表示课程不存在"""
+    segments = [m for m in "\n\n".join(messages).split("\n\n") if m]
+    return bool(segments) and all(
+        any(keyword in segment for keyword in COURSE_NOT_FOUND_KEYWORDS)
+        for segment in segments
+    )
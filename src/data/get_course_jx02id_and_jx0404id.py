@@ -1,6 +1,21 @@
-import os
-import json
+import sqlite3
 from src.utils.session_manager import get_session
+from src.utils.fast_json import decode_response
+from src.data.course_id_cache import (
+    get_cached_course_ids,
+    save_course_ids,
+    invalidate_course_ids,
+)
+from src.data.category_affinity import record_search_category
+from src.data.time_slot import parse_sksj, parse_weeks
+from src.data.course_catalog import (
+    SEARCH_CATEGORIES,
+    get_catalog,
+    iter_search_rows,
+    forget_catalog_course,
+)
+from src.data.catalog_store import get_catalog_store
+from src.core.send_course_data import COME_IN_URLS
 import logging
 
 
@@ -22,25 +37,8 @@ def find_course_jx02id_and_jx0404id(course, course_data):
                 )
                 return {"jx02id": jx02id, "jx0404id": jx0404id}
 
-        # 处理周次信息
-        def parse_weeks(weeks_str):
-            weeks = set()
-            # 处理多个周次范围（用逗号分隔）
-            for part in weeks_str.split(","):
-                part = part.strip()
-                if "-" in part:
-                    start, end = map(int, part.split("-"))
-                    weeks.update(range(start, end + 1))
-                else:
-                    weeks.add(int(part))
-            return weeks
-
-        def check_weeks_match(target_weeks, actual_weeks):
-            """检查实际周次是否匹配目标周次"""
-            target_set = parse_weeks(target_weeks)
-            actual_set = actual_weeks
-            # 判断实际周次是否完全包含目标周次
-            return target_set.issubset(actual_set)
+        # 目标周次只解析一次，每行的上课时间按字符串缓存解析结果，匹配时只做位运算
+        target_weeks = parse_weeks(course["weeks"]) if "weeks" in course else None
 
         # 遍历所有匹配的课程数据
         for data in course_data:
@@ -58,24 +56,10 @@ def find_course_jx02id_and_jx0404id(course, course_data):
             # 从sksj中提取周次信息
             sksj = data.get("sksj", "")
 
-            # 判断是否匹配周次
+            # 判断实际周次是否完全包含目标周次
             weeks_match = True
-            if "weeks" in course and "周" in sksj:  # 使用新的weeks字段
-                # 处理可能包含多个时间段的情况
-                time_slots = []
-                for part in sksj.split("<br>"):
-                    time_slots.extend(part.strip().split("、"))
-
-                # 合并所有时间段的周次
-                actual_weeks = set()
-                for slot in time_slots:
-                    if "周" not in slot:
-                        continue
-                    weeks_str = slot.split("周")[0].strip()
-                    actual_weeks.update(parse_weeks(weeks_str))
-
-                # 检查是否匹配目标周次
-                weeks_match = check_weeks_match(course["weeks"], actual_weeks)
+            if target_weeks is not None and "周" in sksj:
+                weeks_match = parse_sksj(sksj).covers_weeks(target_weeks)
 
             # 确保两个ID都存在且周次匹配
             if jx02id and jx0404id and weeks_match:
@@ -101,36 +85,17 @@ def get_course_jx02id_and_jx0404id_by_api(course):
 
         while retry_count < max_retries:
             try:
-                # 依次从专业内跨年级选课、本学期计划选课、选修选课、公选课选课、计划外选课、辅修选课搜索课程
-                result = get_course_jx02id_and_jx0404id_xsxkKnjxk_by_api(course)
-                if result:
-                    result = find_course_jx02id_and_jx0404id(course, result["aaData"])
-                    if result:
-                        return result
-
-                result = get_course_jx02id_and_jx0404id_xsxkBxqjhxk_by_api(course)
-                if result:
-                    result = find_course_jx02id_and_jx0404id(course, result["aaData"])
-                    if result:
-                        return result
-
-                result = get_course_jx02id_and_jx0404id_xsxkXxxk_by_api(course)
-                if result:
-                    result = find_course_jx02id_and_jx0404id(course, result["aaData"])
-                    if result:
-                        return result
-
-                result = get_course_jx02id_and_jx0404id_xsxkGgxxkxk_by_api(course)
-                if result:
-                    result = find_course_jx02id_and_jx0404id(course, result["aaData"])
-                    if result:
-                        return result
-
-                result = get_course_jx02id_and_jx0404id_xsxkFawxk_by_api(course)
-                if result:
-                    result = find_course_jx02id_and_jx0404id(course, result["aaData"])
+                # 依次从专业内跨年级选课、本学期计划选课、选修选课、公选课选课、计划外选课搜索课程
+                for category, search_func in SEARCH_METHODS:
+                    result = search_func(course)
                     if result:
-                        return result
+                        result = find_course_jx02id_and_jx0404id(
+                            course, result["aaData"]
+                        )
+                        if result:
+                            # 记录课程所在的选课分类
+                            result["category"] = category
+                            return result
 
                 # 如果所有请求都成功但没有找到结果，跳出循环
                 break
@@ -151,11 +116,63 @@ def get_course_jx02id_and_jx0404id_by_api(course):
         return None
 
 
+def find_in_candidates(course, candidates):
+    """在候选课程数据中查找课程，返回的结果带有所在的选课分类"""
+    result = find_course_jx02id_and_jx0404id(course, candidates)
+    if not result:
+        return None
+    row = next(r for r in candidates if r.get("jx0404id") == result["jx0404id"])
+    result["category"] = row["category"]
+    return result
+
+
+def get_course_jx02id_and_jx0404id_from_catalog(course):
+    """在整表下载的本地课程索引中查找课程，未启用整表下载或找不到时返回None"""
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    result = find_in_candidates(course, catalog.candidates(course))
+    if not result:
+        logging.warning(
+            f"本地课程列表中没有课程【{course['course_id_or_name']}-{course['teacher_name']}】，改为逐个分类搜索"
+        )
+    return result
+
+
+def get_course_jx02id_and_jx0404id_from_store(course):
+    """在课程数据库中查找最近搜索到的课程，找不到时返回None"""
+    try:
+        candidates = get_catalog_store().find_course(course)
+    except sqlite3.Error as e:
+        logging.warning(f"查询课程数据库失败: {e}")
+        return None
+    if not candidates:
+        return None
+    return find_in_candidates(course, candidates)
+
+
 def get_course_jx02id_and_jx0404id(course):
-    """通过API获取课程的jx02id和jx0404id"""
+    """
+    获取课程的jx02id和jx0404id，依次查找本地缓存、整表下载的课程索引、
+    课程数据库中最近搜索到的课程，都找不到时通过API搜索
+    """
     try:
-        result = get_course_jx02id_and_jx0404id_by_api(course)
+        result = get_cached_course_ids(course)
+        if result:
+            logging.critical(
+                f"命中缓存，课程【{course['course_id_or_name']}-{course['teacher_name']}】的jx02id: {result['jx02id']} 和 jx0404id: {result['jx0404id']}"
+            )
+            record_search_category(result["jx0404id"], result.get("category"))
+            return result
+
+        result = get_course_jx02id_and_jx0404id_from_catalog(course)
+        if result is None:
+            result = get_course_jx02id_and_jx0404id_from_store(course)
+        if result is None:
+            result = get_course_jx02id_and_jx0404id_by_api(course)
         if result:
+            save_course_ids(course, result)
+            record_search_category(result["jx0404id"], result.get("category"))
             return result
 
         logging.warning(
@@ -167,320 +184,86 @@ def get_course_jx02id_and_jx0404id(course):
         return None
 
 
-def get_course_jx02id_and_jx0404id_xsxkGgxxkxk_by_api(course):
-    """通过教务系统API获取公选课课程的jx02id和jx0404id"""
+def invalidate_course(course, jx0404id):
+    """
+    课程在选课时提示不存在时，删除其缓存，并让本地课程索引和课程数据库不再返回该课程，
+    下次查找时重新搜索，避免把同一个失效的jx0404id再次写回缓存
+    """
+    invalidate_course_ids(course)
+    forget_catalog_course(jx0404id)
     try:
-        session = get_session()
-        course_id = course["course_id_or_name"]
-        teacher_name = course["teacher_name"]
-        class_period = course["class_period"]
-        week_day = course["week_day"]
-
-        # 选修选课页面
-        response = session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInXxxk",
-        )
-        if response.status_code == 404:
-            raise Exception("404 Not Found")
-        logging.info(f"获取公选选课页面响应值: {response.status_code}")
-
-        # 请求选课列表数据
-        response = session.post(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkGgxxkxk",
-            params={
-                "kcxx": course_id,
-                "skls": teacher_name,
-                "skxq": week_day,
-                "skjc": class_period,
-                "szjylb": "",
-                "sfym": "false",
-                "sfct": "true",
-                "sfxx": "true",
-            },
-            data={
-                "sEcho": 1,
-                "iColumns": 13,
-                "sColumns": "",
-                "iDisplayStart": 0,
-                "iDisplayLength": 15,
-                "mDataProp_0": "kch",
-                "mDataProp_1": "kcmc",
-                "mDataProp_2": "xf",
-                "mDataProp_3": "skls",
-                "mDataProp_4": "sksj",
-                "mDataProp_5": "skdd",
-                "mDataProp_6": "xqmc",
-                "mDataProp_7": "xxrs",
-                "mDataProp_8": "xkrs",
-                "mDataProp_9": "syrs",
-                "mDataProp_10": "ctsm",
-                "mDataProp_11": "szkcflmc",
-                "mDataProp_12": "czOper",
-            },
-        )
-        if response.status_code == 404:
-            raise Exception("404 Not Found")
+        get_catalog_store().expire([jx0404id])
+    except sqlite3.Error as e:
+        logging.warning(f"更新课程数据库失败: {e}")
 
-        response_data = json.loads(response.text)
-        # 检查aaData是否为空
-        if not response_data.get("aaData"):
-            logging.warning("公选选课的API返回的aaData为空，可能该课程不在该分类")
-            return None
 
-        return response_data
-    except Exception as e:
-        logging.error(f"获取公选选课的jx02id和jx0404id失败: {e}")
-        return None
+def search_course_in_category(category, course):
+    """
+    进入选课分类的页面后按课程的编号、教师、上课星期和节次搜索课程，获取所有页的搜索结果
 
+    Args:
+        category: 选课分类，见SEARCH_CATEGORIES
+        course: 课程信息
 
-def get_course_jx02id_and_jx0404id_xsxkXxxk_by_api(course):
-    """通过教务系统API获取选修课课程的jx02id和jx0404id"""
+    Returns:
+        dict: {"aaData": 所有页的课程数据}，搜索不到或请求失败时返回None
+    """
+    name = SEARCH_CATEGORIES[category]["name"]
     try:
         session = get_session()
-        course_id = course["course_id_or_name"]
-        teacher_name = course["teacher_name"]
-        class_period = course["class_period"]
-        week_day = course["week_day"]
-
-        # 选修选课页面
-        response = session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInXxxk",
-        )
-        logging.info(f"获取选修选课页面响应值: {response.status_code}")
-
-        # 请求选课列表数据
-        response = session.post(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkXxxk",
-            params={
-                "kcxx": course_id,  # 课程名称
-                "skls": teacher_name,  # 教师姓名
-                "skxq": week_day,  # 上课星期
-                "skjc": class_period,  # 上课节次
-                "sfym": "false",  # 是否已满
-                "sfct": "true",  # 是否冲突
-                "sfxx": "true",  # 是否限选
-            },
-            data={
-                "sEcho": 1,
-                "iColumns": 11,
-                "sColumns": "",
-                "iDisplayStart": 0,
-                "iDisplayLength": 15,
-                "mDataProp_0": "kch",
-                "mDataProp_1": "kcmc",
-                "mDataProp_2": "fzmc",
-                "mDataProp_3": "ktmc",
-                "mDataProp_4": "xf",
-                "mDataProp_5": "skls",
-                "mDataProp_6": "sksj",
-                "mDataProp_7": "skdd",
-                "mDataProp_8": "xqmc",
-                "mDataProp_9": "ctsm",
-                "mDataProp_10": "czOper",
-            },
-        )
+        response = session.get(COME_IN_URLS[category])
+        if response.status_code == 404:
+            raise Exception("404 Not Found")
+        logging.info(f"获取{name}页面响应值: {response.status_code}")
 
-        logging.info(f"获取选修选课列表数据响应值: {response.status_code}")
-        response_data = json.loads(response.text)
+        # 请求选课列表数据，超过一页时并发请求其余各页
+        try:
+            rows = list(iter_search_rows(session, category, course))
+        except ValueError:
+            logging.error(f"{name}的API返回的数据不是有效的JSON格式")
+            return None
 
         # 检查aaData是否为空
-        if not response_data.get("aaData"):
-            logging.warning("选修选课的API返回的aaData为空，可能该课程不在该分类")
+        if not rows:
+            logging.warning(f"{name}的API返回的aaData为空，可能该课程不在该分类")
             return None
 
-        return response_data
+        return {"aaData": rows}
     except Exception as e:
-        logging.error(f"获取选修选课的jx02id和jx0404id失败: {e}")
+        logging.error(f"获取{name}的jx02id和jx0404id失败: {e}")
         return None
 
 
-def get_course_jx02id_and_jx0404id_xsxkBxqjhxk_by_api(course):
-    """通过教务系统API获取本学期计划选课课程的jx02id和jx0404id"""
-    try:
-        session = get_session()
-        course_id = course["course_id_or_name"]
-        teacher_name = course["teacher_name"]
-        class_period = course["class_period"]
-        week_day = course["week_day"]
-
-        # 选修选课页面
-        response = session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInBxqjhxk",
-        )
-        logging.info(f"获取本学期计划选课页面响应值: {response.status_code}")
-
-        # 请求选课列表数据
-        response = session.post(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkBxqjhxk",
-            params={
-                "kcxx": course_id,  # 课程名称
-                "skls": teacher_name,  # 教师姓名
-                "skxq": week_day,  # 上课星期
-                "skjc": class_period,  # 上课节次
-                "sfym": "false",  # 是否已满
-                "sfct": "true",  # 是否冲突
-                "sfxx": "true",  # 是否限选
-            },
-            data={
-                "sEcho": 1,
-                "iColumns": 12,
-                "sColumns": "",
-                "iDisplayStart": 0,
-                "iDisplayLength": 15,
-                "mDataProp_0": "kch",
-                "mDataProp_1": "kcmc",
-                "mDataProp_2": "fzmc",
-                "mDataProp_3": "ktmc",
-                "mDataProp_4": "xf",
-                "mDataProp_5": "skls",
-                "mDataProp_6": "sksj",
-                "mDataProp_7": "skdd",
-                "mDataProp_8": "xqmc",
-                "mDataProp_9": "ctsm",
-                "mDataProp_10": "czOper",
-            },
-        )
+def get_course_jx02id_and_jx0404id_xsxkGgxxkxk_by_api(course):
+    """通过教务系统API获取公选课课程的jx02id和jx0404id"""
+    return search_course_in_category("ggxxkxk", course)
 
-        logging.info(f"获取本学期计划选课列表数据响应值: {response.status_code}")
-        response_data = json.loads(response.text)
 
-        # 检查aaData是否为空
-        if not response_data.get("aaData"):
-            logging.warning("本学期计划选课的API返回的aaData为空，可能该课程不在该分类")
-            return None
+def get_course_jx02id_and_jx0404id_xsxkXxxk_by_api(course):
+    """通过教务系统API获取选修课课程的jx02id和jx0404id"""
+    return search_course_in_category("xxxk", course)
 
-        return response_data
-    except Exception as e:
-        logging.error(f"获取本学期计划选课的jx02id和jx0404id失败: {e}")
-        return None
+
+def get_course_jx02id_and_jx0404id_xsxkBxqjhxk_by_api(course):
+    """通过教务系统API获取本学期计划选课课程的jx02id和jx0404id"""
+    return search_course_in_category("bxqjhxk", course)
 
 
 def get_course_jx02id_and_jx0404id_xsxkKnjxk_by_api(course):
     """通过教务系统API获取专业内跨年级选课课程的jx02id和jx0404id"""
-    try:
-        session = get_session()
-        course_id = course["course_id_or_name"]
-        teacher_name = course["teacher_name"]
-        class_period = course["class_period"]
-        week_day = course["week_day"]
-
-        # 专业内跨年级选课页面
-        response = session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInKnjxk",
-        )
-        logging.info(f"获取专业内跨年级选课页面响应值: {response.status_code}")
-
-        # 请求选课列表数据
-        response = session.post(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkKnjxk",
-            params={
-                "kcxx": course_id,  # 课程名称
-                "skls": teacher_name,  # 教师姓名
-                "skxq": week_day,  # 上课星期
-                "skjc": class_period,  # 上课节次
-                "sfym": "false",  # 是否已满
-                "sfct": "true",  # 是否冲突
-                "sfxx": "true",  # 是否限选
-            },
-            data={
-                "sEcho": 1,
-                "iColumns": 12,
-                "sColumns": "",
-                "iDisplayStart": 0,
-                "iDisplayLength": 15,
-                "mDataProp_0": "kch",
-                "mDataProp_1": "kcmc",
-                "mDataProp_2": "fzmc",
-                "mDataProp_3": "ktmc",
-                "mDataProp_4": "xf",
-                "mDataProp_5": "skls",
-                "mDataProp_6": "sksj",
-                "mDataProp_7": "skdd",
-                "mDataProp_8": "xqmc",
-                "mDataProp_9": "ctsm",
-                "mDataProp_10": "czOper",
-            },
-        )
-
-        logging.info(f"获取专业内跨年级选课列表数据响应值: {response.status_code}")
-
-        # 新增代码：检查响应内容是否为JSON格式
-        try:
-            response_data = json.loads(response.text)
-
-            # 检查aaData是否为空
-            if not response_data.get("aaData"):
-                logging.warning(
-                    "专业内跨年级选课的API返回的aaData为空，可能该课程不在该分类"
-                )
-                return None
-
-            return response_data
-        except ValueError:
-            logging.error("API返回的数据不是有效的JSON格式")
-            return None
-
-    except Exception as e:
-        logging.error(f"获取专业内跨年级选课的jx02id和jx0404id失败: {e}")
-        return None
+    return search_course_in_category("knjxk", course)
 
 
 def get_course_jx02id_and_jx0404id_xsxkFawxk_by_api(course):
     """通过教务系统API获取计划外选课课程的jx02id和jx0404id"""
-    try:
-        session = get_session()
-        course_id = course["course_id_or_name"]
-        teacher_name = course["teacher_name"]
-        class_period = course["class_period"]
-        week_day = course["week_day"]
-
-        # 计划外选课页面
-        response = session.get(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/comeInFawxk",
-        )
-        logging.info(f"获取计划外选课页面响应值: {response.status_code}")
-
-        # 请求选课列表数据
-        response = session.post(
-            "http://zhjw.qfnu.edu.cn/jsxsd/xsxkkc/xsxkFawxk",
-            params={
-                "kcxx": course_id,  # 课程名称
-                "skls": teacher_name,  # 教师姓名
-                "skxq": week_day,  # 上课星期
-                "skjc": class_period,  # 上课节次
-                "sfym": "false",  # 是否已满
-                "sfct": "true",  # 是否冲突
-                "sfxx": "true",  # 是否限选
-            },
-            data={
-                "sEcho": 1,
-                "iColumns": 12,
-                "sColumns": "",
-                "iDisplayStart": 0,
-                "iDisplayLength": 15,
-                "mDataProp_0": "kch",
-                "mDataProp_1": "kcmc",
-                "mDataProp_2": "fzmc",
-                "mDataProp_3": "ktmc",
-                "mDataProp_4": "xf",
-                "mDataProp_5": "skls",
-                "mDataProp_6": "sksj",
-                "mDataProp_7": "skdd",
-                "mDataProp_8": "xqmc",
-                "mDataProp_9": "ctsm",
-                "mDataProp_10": "czOper",
-            },
-        )
+    return search_course_in_category("fawxk", course)
 
-        logging.info(f"获取计划外选课列表数据响应值: {response.status_code}")
-        response_data = json.loads(response.text)
 
-        # 检查aaData是否为空
-        if not response_data.get("aaData"):
-            logging.warning("计划外选课的API返回的aaData为空，可能该课程不在该分类")
-            return None
-
-        return response_data
-    except Exception as e:
-        logging.error(f"获取计划外选课的jx02id和jx0404id失败: {e}")
-        return None
+# 选课分类及其对应的搜索函数，顺序即依次搜索的顺序
+SEARCH_METHODS = [
+    ("knjxk", get_course_jx02id_and_jx0404id_xsxkKnjxk_by_api),
+    ("bxqjhxk", get_course_jx02id_and_jx0404id_xsxkBxqjhxk_by_api),
+    ("xxxk", get_course_jx02id_and_jx0404id_xsxkXxxk_by_api),
+    ("ggxxkxk", get_course_jx02id_and_jx0404id_xsxkGgxxkxk_by_api),
+    ("fawxk", get_course_jx02id_and_jx0404id_xsxkFawxk_by_api),
+]
@@ -0,0 +1,132 @@
+import re
+from functools import lru_cache
+
+WEEKDAYS = "一二三四五六日"
+# 一个上课时间段，例如 "1-4,6,8-10周 星期一 1-2节"
+WEEKDAY_PATTERN = re.compile(r"星期([一二三四五六日天])")
+PERIOD_PATTERN = re.compile(r"\d+(?:-\d+)?节")
+RANGE_PATTERN = re.compile(r"(\d+)(?:-(\d+))?")
+# 解析结果缓存的不同sksj字符串数，同一学期的上课时间写法有限
+SKSJ_CACHE_SIZE = 8192
+
+
+def range_mask(start, end):
+    """第start到第end位（含）为1的位掩码"""
+    return ((1 << (end - start + 1)) - 1) << start
+
+
+@lru_cache(maxsize=1024)
+def parse_weeks(weeks_str):
+    """
+    把周次字符串解析为位掩码，第n周对应第n位
+
+    支持 "1-12"、"1-12,13-14"、"1,3,5,7" 等写法，无法识别的部分被忽略
+    """
+    mask = 0
+    for part in str(weeks_str).split(","):
+        part = part.strip()
+        try:
+            if "-" in part:
+                start, end = map(int, part.split("-"))
+                mask |= range_mask(start, end)
+            elif part:
+                mask |= 1 << int(part)
+        except ValueError:
+            continue
+    return mask
+
+
+def parse_periods(period_str):
+    """把节次字符串（例如 "1-2"、"9-11节"）解析为位掩码，第n节对应第n位"""
+    match = RANGE_PATTERN.search(str(period_str))
+    if not match:
+        return 0
+    start = int(match.group(1))
+    return range_mask(start, int(match.group(2) or start))
+
+
+def parse_weekday(weekday):
+    """把 "一"~"日" 或 "1"~"7" 转换为1~7，无法识别时返回0"""
+    weekday = str(weekday).strip().replace("天", "日")
+    if weekday in WEEKDAYS:
+        return WEEKDAYS.index(weekday) + 1
+    return int(weekday) if weekday.isdigit() else 0
+
+
+class TimeSlot:
+    """
+    一个上课时间段：周次和节次都是位掩码，星期为1~7，不确定时为0
+    """
+
+    __slots__ = ("weeks", "weekday", "periods")
+
+    def __init__(self, weeks, weekday, periods):
+        self.weeks = weeks
+        self.weekday = weekday
+        self.periods = periods
+
+    def overlaps(self, other):
+        """两个时间段是否在同一周的同一天有重叠的节次"""
+        return (
+            self.weekday == other.weekday
+            and self.weeks & other.weeks != 0
+            and self.periods & other.periods != 0
+        )
+
+    def __repr__(self):
+        return f"TimeSlot(weeks={self.weeks:#x}, weekday={self.weekday}, periods={self.periods:#x})"
+
+
+class Schedule:
+    """
+    一门课程的全部上课时间段
+
+    Attributes:
+        slots: 上课时间段
+        weeks: 所有时间段的周次合并后的位掩码
+    """
+
+    __slots__ = ("slots", "weeks")
+
+    def __init__(self, slots):
+        self.slots = tuple(slots)
+        weeks = 0
+        for slot in self.slots:
+            weeks |= slot.weeks
+        self.weeks = weeks
+
+    def covers_weeks(self, weeks_mask):
+        """是否包含目标周次的每一周"""
+        return weeks_mask & ~self.weeks == 0
+
+    def conflicts(self, other):
+        """与另一门课程是否有时间冲突"""
+        return any(a.overlaps(b) for a in self.slots for b in other.slots)
+
+    def __repr__(self):
+        return f"Schedule({list(self.slots)})"
+
+
+@lru_cache(maxsize=SKSJ_CACHE_SIZE)
+def parse_sksj(sksj):
+    """
+    解析课程的上课时间（sksj），同一个字符串只解析一次
+
+    多个时间段之间用 "<br>" 或 "、" 分隔，每个时间段形如 "1-4,6,8-10周 星期一 1-2节"
+    """
+    slots = []
+    for line in (sksj or "").split("<br>"):
+        for part in line.split("、"):
+            if "周" not in part:
+                continue
+            weeks = parse_weeks(part.split("周")[0].strip())
+            weekday = WEEKDAY_PATTERN.search(part)
+            periods = PERIOD_PATTERN.search(part)
+            slots.append(
+                TimeSlot(
+                    weeks,
+                    parse_weekday(weekday.group(1)) if weekday else 0,
+                    parse_periods(periods.group(0)) if periods else 0,
+                )
+            )
+    return Schedule(slots)
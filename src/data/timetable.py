@@ -0,0 +1,314 @@
+import re
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from bs4 import BeautifulSoup
+from src.utils.config_loader import load_config
+from src.utils.session_manager import get_session
+from src.data.catalog_store import get_catalog_store
+from src.data.time_slot import (
+    Schedule,
+    TimeSlot,
+    parse_sksj,
+    parse_weeks,
+    parse_periods,
+    parse_weekday,
+)
+
+# 选课结果页面，列出本学期已选的课程及其上课时间
+XKJG_URL = "http://zhjw.qfnu.edu.cn/jsxsd/xsxkjg/comeXkjg"
+# 占用表中每个节次占用的位数，第n节第m周对应第n*WEEK_BITS+m位
+WEEK_BITS = 64
+# 选课结果表格中需要的列及其表头关键字
+HEADER_KEYWORDS = {
+    "kch": ("课程号", "课程编号"),
+    "kcmc": ("课程名",),
+    "skls": ("教师",),
+    "sksj": ("上课时间",),
+}
+# 退选链接中带有已选课程的jx0404id
+JX0404ID_PATTERN = re.compile(r"jx0404id=(\w+)")
+
+
+@lru_cache(maxsize=4096)
+def occupancy_mask(weeks, periods):
+    """一个上课时间段在当天占用的位：第n节第m周对应第n*WEEK_BITS+m位"""
+    mask = 0
+    period = 0
+    while periods:
+        if periods & 1:
+            mask |= weeks << (period * WEEK_BITS)
+        periods >>= 1
+        period += 1
+    return mask
+
+
+def get_course_name(course):
+    return f"{course['course_id_or_name']}-{course['teacher_name']}"
+
+
+class Timetable:
+    """
+    已选课程的上课时间占用表
+
+    每个星期用一个整数记录占用情况，判断冲突时每个上课时间段只需一次按位与，
+    确实有冲突时才逐门课程找出冲突的课程用于输出
+    """
+
+    def __init__(self):
+        # (课程名称, jx0404id, Schedule)
+        self.courses = []
+        # 星期（1~7）到占用位的映射
+        self.occupied = {}
+        # 因时间冲突跳过的课程，jx0404id到冲突课程名称的映射
+        self.skipped = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, schedule, jx0404id=""):
+        """把一门课程加入占用表"""
+        with self._lock:
+            self.courses.append((name, str(jx0404id or ""), schedule))
+            for slot in schedule.slots:
+                if slot.weekday:
+                    self.occupied[slot.weekday] = self.occupied.get(
+                        slot.weekday, 0
+                    ) | occupancy_mask(slot.weeks, slot.periods)
+
+    def conflicts(self, schedule, jx0404id=""):
+        """
+        与课程时间冲突的已选课程
+
+        Args:
+            schedule: 课程的上课时间
+            jx0404id: 课程的jx0404id，占用表中的同一门课程不算冲突
+
+        Returns:
+            list: 冲突课程的名称，没有冲突时为空列表
+        """
+        jx0404id = str(jx0404id or "")
+        with self._lock:
+            if not any(
+                self.occupied.get(slot.weekday, 0)
+                & occupancy_mask(slot.weeks, slot.periods)
+                for slot in schedule.slots
+                if slot.weekday
+            ):
+                return []
+            return [
+                name
+                for name, course_id, course_schedule in self.courses
+                if not (jx0404id and course_id == jx0404id)
+                and course_schedule.conflicts(schedule)
+            ]
+
+    def __len__(self):
+        return len(self.courses)
+
+
+def parse_selected_courses(html):
+    """
+    解析选课结果页面中的已选课程
+
+    按表头查找课程号、课程名、教师和上课时间所在的列，上课时间中的换行保留为 "<br>"
+
+    Returns:
+        list: 已选课程，每项包含kch、kcmc、skls、sksj和jx0404id（找不到时为空字符串）
+    """
+    courses = []
+    soup = BeautifulSoup(html, "html.parser")
+    for table in soup.find_all("table"):
+        rows = table.find_all("tr")
+        if not rows:
+            continue
+        headers = [cell.get_text(strip=True) for cell in rows[0].find_all(["th", "td"])]
+        columns = {}
+        for field, keywords in HEADER_KEYWORDS.items():
+            for i, header in enumerate(headers):
+                if any(keyword in header for keyword in keywords):
+                    columns[field] = i
+                    break
+        if "sksj" not in columns:
+            continue
+
+        for row in rows[1:]:
+            cells = row.find_all("td")
+            if len(cells) <= max(columns.values()):
+                continue
+            course = {
+                field: cells[i].get_text("<br>", strip=True)
+                for field, i in columns.items()
+            }
+            match = JX0404ID_PATTERN.search(str(row))
+            course["jx0404id"] = match.group(1) if match else ""
+            courses.append(course)
+    return courses
+
+
+def fetch_timetable(session):
+    """
+    从选课结果页面获取已选课程并建立占用表
+
+    Raises:
+        RequestException: 请求失败时
+    """
+    response = session.get(XKJG_URL)
+    response.raise_for_status()
+    timetable = Timetable()
+    for course in parse_selected_courses(response.text):
+        name = "-".join(
+            part for part in (course.get("kcmc"), course.get("skls")) if part
+        )
+        timetable.add(
+            name or course["jx0404id"], parse_sksj(course["sksj"]), course["jx0404id"]
+        )
+    return timetable
+
+
+def is_timetable_check_enabled():
+    """是否在选课前检查时间冲突，由config.json的timetable_check控制"""
+    try:
+        return bool(load_config().get("timetable_check", True))
+    except (FileNotFoundError, ValueError):
+        return True
+
+
+_timetable = None
+_timetable_lock = threading.Lock()
+
+
+def get_timetable(session=None):
+    """
+    获取已选课程的占用表，未启用时间冲突检查时返回None
+
+    首次调用时请求一次选课结果页面，获取失败时使用空的占用表，
+    之后只检查本次运行中选上的课程之间的冲突
+    """
+    global _timetable
+    if not is_timetable_check_enabled():
+        return None
+    with _timetable_lock:
+        if _timetable is None:
+            try:
+                _timetable = fetch_timetable(session or get_session())
+                logging.info(f"已获取已选课程的上课时间，共 {len(_timetable)} 门")
+            except Exception as e:
+                logging.warning(
+                    f"获取已选课程失败，只检查本次选上的课程之间的时间冲突: {e}"
+                )
+                _timetable = Timetable()
+        return _timetable
+
+
+def get_course_schedule(course, course_jx02id_and_jx0404id):
+    """
+    获取课程的上课时间
+
+    依次使用课程数据中的sksj、课程数据库中该jx0404id的sksj，以及课程配置中的
+    week_day、class_period和weeks（三项都填写时）
+
+    Returns:
+        Optional[Schedule]: 无法确定上课时间时返回None
+    """
+    sksj = course_jx02id_and_jx0404id.get("sksj")
+    if not sksj:
+        try:
+            row = get_catalog_store().get(course_jx02id_and_jx0404id["jx0404id"])
+        except sqlite3.Error as e:
+            logging.warning(f"查询课程数据库失败: {e}")
+            row = None
+        sksj = row.get("sksj") if row else None
+    if sksj:
+        schedule = parse_sksj(sksj)
+        if schedule.slots:
+            return schedule
+
+    if course.get("week_day") and course.get("class_period") and course.get("weeks"):
+        return Schedule(
+            [
+                TimeSlot(
+                    parse_weeks(course["weeks"]),
+                    parse_weekday(course["week_day"]),
+                    parse_periods(course["class_period"]),
+                )
+            ]
+        )
+    return None
+
+
+def check_timetable_conflicts(course, course_jx02id_and_jx0404id):
+    """
+    发送选课请求前检查课程与已选课程的时间冲突
+
+    Returns:
+        list: 冲突课程的名称，没有冲突、无法确定上课时间或未启用检查时为空列表
+    """
+    timetable = get_timetable()
+    if timetable is None:
+        return []
+    schedule = get_course_schedule(course, course_jx02id_and_jx0404id)
+    if schedule is None:
+        return []
+
+    jx0404id = course_jx02id_and_jx0404id["jx0404id"]
+    conflicts = timetable.conflicts(schedule, jx0404id)
+    if conflicts:
+        if timetable.skipped.get(jx0404id) != conflicts:
+            logging.error(
+                f"课程【{get_course_name(course)}】与已选课程【{'、'.join(conflicts)}】时间冲突，跳过选课"
+            )
+        else:
+            logging.info(f"课程【{get_course_name(course)}】时间冲突，跳过选课")
+        timetable.skipped[jx0404id] = conflicts
+    return conflicts
+
+
+def record_selected_course(course, course_jx02id_and_jx0404id):
+    """把选上的课程加入占用表，之后与它冲突的课程不再发送选课请求"""
+    timetable = get_timetable()
+    if timetable is None:
+        return
+    schedule = get_course_schedule(course, course_jx02id_and_jx0404id)
+    if schedule is not None:
+        timetable.add(
+            get_course_name(course), schedule, course_jx02id_and_jx0404id["jx0404id"]
+        )
+
+
+def report_candidate_conflicts(resolved):
+    """
+    选课开始前检查所有课程与已选课程、以及课程之间的时间冲突并输出
+
+    课程之间冲突时按配置顺序优先选择靠前的课程，它选上后靠后的课程会被跳过
+
+    Args:
+        resolved: (课程, 包含jx02id和jx0404id的字典) 列表，按配置顺序
+
+    Returns:
+        int: 与已选课程冲突、选课时将被跳过的课程数
+    """
+    timetable = get_timetable()
+    if timetable is None:
+        return 0
+    candidates = Timetable()
+    skipped = 0
+    for course, course_jx02id_and_jx0404id in resolved:
+        schedule = get_course_schedule(course, course_jx02id_and_jx0404id)
+        if schedule is None:
+            continue
+        name = get_course_name(course)
+        jx0404id = course_jx02id_and_jx0404id["jx0404id"]
+        conflicts = timetable.conflicts(schedule, jx0404id)
+        if conflicts:
+            logging.warning(
+                f"课程【{name}】与已选课程【{'、'.join(conflicts)}】时间冲突，选课时将跳过"
+            )
+            skipped += 1
+            continue
+        earlier = candidates.conflicts(schedule, jx0404id)
+        if earlier:
+            logging.warning(
+                f"课程【{name}】与课程【{'、'.join(earlier)}】时间冲突，将优先选择配置中靠前的课程，选上后跳过该课程"
+            )
+        candidates.add(name, schedule, jx0404id)
+    return skipped
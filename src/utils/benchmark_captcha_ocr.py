@@ -0,0 +1,182 @@
+"""
+验证码识别基准测试
+
+用保存下来的 verifycode.servlet 验证码图片测试不同识别引擎配置的速度和准确率，
+图片文件名（去掉扩展名，下划线之后的部分忽略）作为标注，例如 a1b2.jpg、a1b2_3.jpg
+
+用法:
+    python -m src.utils.benchmark_captcha_ocr --fetch 50 captchas
+    python -m src.utils.benchmark_captcha_ocr captchas
+    python -m src.utils.benchmark_captcha_ocr captchas --engines default threads_1 beta
+    python -m src.utils.benchmark_captcha_ocr captchas --engine-file engines.json
+"""
+
+import os
+import json
+import math
+import time
+import argparse
+import statistics
+from src.utils.captcha_ocr import OcrEngine, parse_probability_result
+
+# 预置的引擎配置，未写出的项使用DEFAULT_OCR_ENGINE中的默认值
+BENCHMARK_ENGINES = {
+    "default": {},
+    "old": {"model": "old"},
+    "beta": {"model": "beta"},
+    "threads_1": {"intra_op_num_threads": 1, "inter_op_num_threads": 1},
+    "threads_2": {"intra_op_num_threads": 2, "inter_op_num_threads": 1},
+    "threads_4": {"intra_op_num_threads": 4, "inter_op_num_threads": 1},
+    "parallel": {"execution_mode": "parallel"},
+    "basic_optimization": {"graph_optimization_level": "basic"},
+    "grayscale": {"preprocess": ["grayscale"]},
+    "threshold": {"preprocess": ["grayscale", "threshold"]},
+    "median_filter": {"preprocess": ["median_filter"]},
+    "autocontrast": {"preprocess": ["autocontrast"]},
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp")
+
+
+def get_label(filename):
+    """从文件名中取出标注"""
+    return os.path.splitext(filename)[0].split("_")[0]
+
+
+def load_samples(image_dir):
+    """
+    读取目录中的验证码图片
+
+    Returns:
+        list: (标注, 图片字节) 列表
+    """
+    samples = []
+    for filename in sorted(os.listdir(image_dir)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(image_dir, filename), "rb") as f:
+                samples.append((get_label(filename), f.read()))
+    return samples
+
+
+def fetch_samples(image_dir, count):
+    """从教务系统下载count张验证码图片，文件名需要手动改成验证码内容作为标注"""
+    from src.core.login import RandCodeUrl
+    from src.utils.session_manager import create_browser_session
+
+    os.makedirs(image_dir, exist_ok=True)
+    session = create_browser_session()
+    for i in range(count):
+        response = session.get(RandCodeUrl)
+        with open(os.path.join(image_dir, f"unlabeled_{i:04d}.jpg"), "wb") as f:
+            f.write(response.content)
+    print(f"已下载 {count} 张验证码到 {image_dir}，请把文件名改成验证码内容")
+
+
+def percentile(values, percent):
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def benchmark_engine(name, config, samples, warmup=3, repeat=1):
+    """
+    测试一个引擎配置
+
+    Returns:
+        dict: 加载耗时、延迟分位数、吞吐量和准确率
+    """
+    start = time.perf_counter()
+    engine = OcrEngine(config)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    for _, image in samples[:warmup]:
+        engine.classification(image)
+
+    latencies = []
+    correct = 0
+    confidences = []
+    total_start = time.perf_counter()
+    for _ in range(repeat):
+        for label, image in samples:
+            start = time.perf_counter()
+            res = engine.classification(image, probability=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+            text, confidence = parse_probability_result(res)
+            confidences.append(confidence)
+            correct += text.lower() == label.lower()
+    total_seconds = time.perf_counter() - total_start
+
+    return {
+        "engine": name,
+        "load_ms": load_ms,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "throughput": len(latencies) / total_seconds,
+        "accuracy": correct / len(latencies),
+        "mean_confidence": statistics.mean(confidences),
+    }
+
+
+def print_results(results):
+    print(
+        f"{'引擎':<20}{'加载ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'张/秒':>10}{'准确率':>10}{'平均置信度':>12}"
+    )
+    for r in results:
+        print(
+            f"{r['engine']:<20}{r['load_ms']:>10.0f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+            f"{r['throughput']:>10.1f}{r['accuracy']:>10.1%}{r['mean_confidence']:>12.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证码识别基准测试")
+    parser.add_argument("image_dir", help="验证码图片目录，文件名为标注")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=list(BENCHMARK_ENGINES),
+        help=f"要测试的预置引擎配置，可选: {', '.join(BENCHMARK_ENGINES)}",
+    )
+    parser.add_argument(
+        "--engine-file",
+        help="引擎配置JSON文件，格式为 {名称: 配置}，与config.json中的ocr_engine格式相同",
+    )
+    parser.add_argument("--warmup", type=int, default=3, help="每个引擎的预热次数")
+    parser.add_argument("--repeat", type=int, default=1, help="重复测试的轮数")
+    parser.add_argument("--fetch", type=int, help="先从教务系统下载指定数量的验证码")
+    parser.add_argument("--output", help="把测试结果保存为JSON文件")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_samples(args.image_dir, args.fetch)
+        return
+
+    samples = load_samples(args.image_dir)
+    if not samples:
+        print(f"{args.image_dir} 中没有验证码图片")
+        return
+
+    if args.engine_file:
+        with open(args.engine_file, "r", encoding="utf-8") as f:
+            engines = json.load(f)
+    else:
+        engines = {name: BENCHMARK_ENGINES[name] for name in args.engines}
+
+    print(f"共 {len(samples)} 张验证码，测试 {len(engines)} 个引擎配置")
+    results = []
+    for name, config in engines.items():
+        results.append(
+            benchmark_engine(name, config, samples, args.warmup, args.repeat)
+        )
+    results.sort(key=lambda r: (-r["accuracy"], r["p50_ms"]))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
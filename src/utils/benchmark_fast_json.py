@@ -0,0 +1,122 @@
+"""
+JSON解析基准测试
+
+用仿照教务系统课程搜索接口生成的aaData响应，对比各JSON解析库直接解析响应字节的速度，
+以及旧版 json.loads(response.text) 的写法（包含response.text的编码检测和解码）
+
+用法:
+    python -m src.utils.benchmark_fast_json
+    python -m src.utils.benchmark_fast_json --rows 15 100 1000 --repeat 200
+"""
+
+import json
+import time
+import random
+import argparse
+from requests import Response
+from src.utils.fast_json import available_backends
+
+TEACHERS = ["张三", "李四", "王五", "赵六", "孙七", "周八", "吴九", "郑十"]
+PLACES = ["格物楼A101", "综合楼B203", "致知楼C305", "实验楼D402", "体育馆"]
+COURSE_NAMES = [
+    "高等数学",
+    "大学英语",
+    "中国近现代史纲要",
+    "数据结构",
+    "羽毛球",
+    "心理健康教育",
+]
+
+
+def make_row(index, rng):
+    """生成一行与课程搜索接口返回格式相同的课程数据"""
+    week_day = rng.randint(1, 7)
+    start = rng.choice([1, 3, 5, 7, 9])
+    capacity = rng.choice([30, 60, 90, 120])
+    selected = rng.randint(0, capacity)
+    return {
+        "kch": f"g{20060000 + index}",
+        "kcmc": rng.choice(COURSE_NAMES),
+        "fzmc": "",
+        "ktmc": f"{rng.choice(COURSE_NAMES)}-{index % 9 + 1}班",
+        "xf": rng.choice([1, 1.5, 2, 3, 4]),
+        "skls": rng.choice(TEACHERS),
+        "sksj": f"1-16周 星期{'一二三四五六日'[week_day - 1]} {start}-{start + 1}节",
+        "skdd": rng.choice(PLACES),
+        "xqmc": "曲阜校区",
+        "xxrs": capacity,
+        "xkrs": selected,
+        "syrs": capacity - selected,
+        "ctsm": "",
+        "szkcflmc": "公共选修课",
+        "jx02id": "".join(rng.choice("0123456789ABCDEF") for _ in range(32)),
+        "jx0404id": f"2024202520{index:05d}",
+        "kkapList": [
+            {
+                "xq": week_day,
+                "skjcmc": f"{start}-{start + 1}节",
+                "kkzc": "1-16",
+                "jsmc": rng.choice(PLACES),
+            }
+        ],
+        "czOper": "",
+    }
+
+
+def make_payload(rows, seed=0):
+    """生成包含rows行课程数据的响应内容"""
+    rng = random.Random(seed)
+    data = {
+        "sEcho": "1",
+        "iTotalRecords": rows,
+        "iTotalDisplayRecords": rows,
+        "aaData": [make_row(i, rng) for i in range(rows)],
+    }
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def make_response(payload):
+    """构造一个与教务系统响应相同、Content-Type中没有声明编码的响应"""
+    response = Response()
+    response.status_code = 200
+    response._content = payload
+    response.headers["Content-Type"] = "text/html"
+    return response
+
+
+def measure(func, repeat):
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON解析基准测试")
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[15, 100, 1000], help="每个响应的行数"
+    )
+    parser.add_argument("--repeat", type=int, default=100, help="每种写法的解析次数")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"已安装的JSON解析库: {', '.join(backends)}")
+    for rows in args.rows:
+        payload = make_payload(rows)
+        repeat = max(5, args.repeat * 15 // rows)
+        print(f"\n{rows} 行，{len(payload) / 1024:.1f} KB，解析 {repeat} 次")
+
+        # 旧版写法每次都是新的响应，response.text不会被缓存
+        baseline = measure(lambda: json.loads(make_response(payload).text), repeat)
+        print(f"  {'json.loads(response.text)':<36}{baseline:>10.1f} µs/次")
+        for name, loads in backends.items():
+            elapsed = measure(lambda: loads(make_response(payload).content), repeat)
+            print(
+                f"  {name + '.loads(response.content)':<36}{elapsed:>10.1f} µs/次"
+                f"{baseline / elapsed:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
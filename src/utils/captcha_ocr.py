@@ -1,12 +1,249 @@
-import ddddocr
+import io
+import time
+import logging
+import threading
+from src.utils.config_loader import load_config
 
-ocr = ddddocr.DdddOcr(show_ad=False)
+# 识别模型在第一次使用时才加载，避免不需要验证码登录时也要等待模型加载
+_ocr = None
+_ocr_lock = threading.Lock()
+_first_inference_done = False
 
+# 识别引擎默认配置，可在config.json的ocr_engine中覆盖
+DEFAULT_OCR_ENGINE = {
+    "model": "default",  # ddddocr模型: default、old 或 beta
+    "intra_op_num_threads": 0,  # 单个算子使用的线程数，0 表示由onnxruntime决定
+    "inter_op_num_threads": 0,  # 算子之间并行的线程数，0 表示由onnxruntime决定
+    "execution_mode": "sequential",  # 算子执行方式: sequential 或 parallel
+    "graph_optimization_level": "all",  # 图优化级别: disable、basic、extended 或 all
+    "preprocess": [],  # 识别前的图片预处理步骤，按顺序执行，见PREPROCESSORS
+}
 
-def get_ocr_res(cap_pic_bytes):  # 识别验证码
-    res = ocr.classification(cap_pic_bytes)
+
+def _grayscale(image):
+    return image.convert("L")
+
+
+def _threshold(image, level=128):
+    return image.convert("L").point(lambda p: 255 if p > level else 0)
+
+
+def _median_filter(image, size=3):
+    from PIL import ImageFilter
+
+    return image.filter(ImageFilter.MedianFilter(size))
+
+
+def _autocontrast(image):
+    from PIL import ImageOps
+
+    return ImageOps.autocontrast(image.convert("L"))
+
+
+def _resize_half(image):
+    return image.resize((max(1, image.width // 2), max(1, image.height // 2)))
+
+
+# 可用的图片预处理步骤，输入输出都是PIL图片
+PREPROCESSORS = {
+    "grayscale": _grayscale,
+    "threshold": _threshold,
+    "median_filter": _median_filter,
+    "autocontrast": _autocontrast,
+    "resize_half": _resize_half,
+}
+
+
+class OcrEngine:
+    """
+    可配置的验证码识别引擎：ddddocr模型 + onnxruntime会话选项 + 图片预处理
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_OCR_ENGINE)
+        self.config.update(config or {})
+        for step in self.config["preprocess"]:
+            if step not in PREPROCESSORS:
+                raise ValueError(f"未知的图片预处理步骤: {step}")
+        self.ocr = self._load()
+
+    def _load(self):
+        import ddddocr
+
+        model = self.config["model"]
+        if model not in ("default", "old", "beta"):
+            raise ValueError(f"未知的识别模型: {model}")
+        ocr = ddddocr.DdddOcr(old=model == "old", beta=model == "beta", show_ad=False)
+        if self._has_session_options():
+            self._apply_session_options(ocr)
+        return ocr
+
+    def _has_session_options(self):
+        return any(
+            self.config[key] != DEFAULT_OCR_ENGINE[key]
+            for key in (
+                "intra_op_num_threads",
+                "inter_op_num_threads",
+                "execution_mode",
+                "graph_optimization_level",
+            )
+        )
+
+    def _apply_session_options(self, ocr):
+        """按配置的会话选项重新创建ddddocr内部的onnxruntime会话"""
+        import onnxruntime
+
+        # ddddocr 1.6 起模型会话在ocr_engine.session，旧版本是私有属性__ort_session
+        holder, attr = getattr(ocr, "ocr_engine", None), "session"
+        if holder is None:
+            holder, attr = ocr, "_DdddOcr__ort_session"
+        session = getattr(holder, attr, None)
+        if session is None:
+            logging.warning("未找到ddddocr的模型会话，忽略onnxruntime会话选项")
+            return
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.config["intra_op_num_threads"]
+        options.inter_op_num_threads = self.config["inter_op_num_threads"]
+        options.execution_mode = {
+            "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+        }[self.config["execution_mode"]]
+        options.graph_optimization_level = {
+            "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.config["graph_optimization_level"]]
+        setattr(
+            holder,
+            attr,
+            onnxruntime.InferenceSession(
+                session._model_path,
+                sess_options=options,
+                providers=session.get_providers(),
+            ),
+        )
+
+    def preprocess(self, cap_pic):
+        """按配置执行图片预处理，没有配置预处理时原样返回"""
+        if not self.config["preprocess"]:
+            return cap_pic
+        from PIL import Image
+
+        if isinstance(cap_pic, bytes):
+            cap_pic = Image.open(io.BytesIO(cap_pic))
+        for step in self.config["preprocess"]:
+            cap_pic = PREPROCESSORS[step](cap_pic)
+        return cap_pic
+
+    def classification(self, cap_pic, **kwargs):
+        return self.ocr.classification(self.preprocess(cap_pic), **kwargs)
+
+
+def get_ocr_engine_config(config=None):
+    """
+    读取识别引擎配置，未配置的项使用默认值
+
+    Args:
+        config: 完整的配置，默认读取当前进程使用的配置
+    """
+    engine_config = dict(DEFAULT_OCR_ENGINE)
+    try:
+        if config is None:
+            config = load_config()
+        engine_config.update(config.get("ocr_engine") or {})
+    except (FileNotFoundError, ValueError):
+        pass
+    return engine_config
+
+
+def _load_ocr(engine_config):
+    start = time.perf_counter()
+    ocr = OcrEngine(engine_config)
+    logging.info(
+        f"验证码识别模型加载完成，耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+    )
+    return ocr
+
+
+def get_ocr():
+    """获取验证码识别引擎，第一次调用时按当前进程的配置加载模型"""
+    global _ocr
+    if _ocr is None:
+        with _ocr_lock:
+            if _ocr is None:
+                _ocr = _load_ocr(get_ocr_engine_config())
+    return _ocr
+
+
+def preload_ocr(engine_config):
+    """按指定的识别引擎配置提前加载模型，之后get_ocr直接返回该引擎"""
+    global _ocr
+    with _ocr_lock:
+        if _ocr is None or _ocr.config != {**DEFAULT_OCR_ENGINE, **engine_config}:
+            _ocr = _load_ocr(engine_config)
+    return _ocr
+
+
+def warm_up_ocr_in_background():
+    """在后台线程中提前加载验证码识别模型"""
+    thread = threading.Thread(target=get_ocr, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _classify(cap_pic, **kwargs):
+    global _first_inference_done
+    ocr = get_ocr()
+    start = time.perf_counter()
+    res = ocr.classification(cap_pic, **kwargs)
+    if not _first_inference_done:
+        _first_inference_done = True
+        logging.info(f"首次验证码识别耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
     return res
 
 
+def get_ocr_res(cap_pic_bytes):  # 识别验证码
+    return _classify(cap_pic_bytes)
+
+
+def parse_probability_result(res):
+    """
+    解析probability=True时的识别结果
+
+    Returns:
+        tuple: (识别结果, 置信度)，置信度在0到1之间
+    """
+    if "confidence" in res:
+        return res["text"], res["confidence"]
+
+    # 旧版ddddocr只返回每个位置在字符集上的概率分布：取每个位置概率最大的字符后
+    # 按CTC规则合并连续重复的位置并去掉空白（第0个字符），置信度取各位置最大概率的
+    # 平均值，与新版ddddocr的_process_probability_output一致
+    text = ""
+    maxima = []
+    previous = None
+    for probabilities in res["probability"]:
+        index = max(range(len(probabilities)), key=probabilities.__getitem__)
+        maxima.append(probabilities[index])
+        char = res["charsets"][index]
+        if index != previous and index != 0 and char:
+            text += char
+        previous = index
+    confidence = sum(maxima) / len(maxima) if maxima else 0.0
+    return text, confidence
+
+
+def get_ocr_res_with_confidence(cap_pic):
+    """
+    识别验证码并返回识别结果的置信度
+
+    Returns:
+        tuple: (识别结果, 置信度)，置信度在0到1之间
+    """
+    return parse_probability_result(_classify(cap_pic, probability=True))
+
+
 if __name__ == "__main__":
     get_ocr_res("123")
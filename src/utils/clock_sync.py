@@ -0,0 +1,131 @@
+import math
+import time
+import logging
+import statistics
+from email.utils import parsedate_to_datetime
+
+# 用于获取服务器时间的地址，只读取响应头中的Date
+CLOCK_SYNC_URL = "http://zhjw.qfnu.edu.cn/"
+# 默认采样次数
+DEFAULT_SAMPLES = 10
+
+
+class ClockOffset:
+    """
+    本地时钟与服务器时钟的偏差估计
+
+    服务器时间 = 本地时间 + offset，真实偏差在[lower, upper]之间
+    """
+
+    def __init__(self, lower, upper, rtts):
+        self.lower = lower
+        self.upper = upper
+        self.rtts = rtts
+
+    @property
+    def offset(self):
+        return (self.lower + self.upper) / 2
+
+    @property
+    def error(self):
+        return (self.upper - self.lower) / 2
+
+    @property
+    def one_way_latency(self):
+        """单程延迟估计，取最小往返时间的一半，受排队抖动影响最小"""
+        return min(self.rtts) / 2
+
+    def to_local_time(self, server_timestamp):
+        """把服务器时间戳换算成本地时间戳"""
+        return server_timestamp - self.offset
+
+    def __str__(self):
+        return (
+            f"时钟偏差 {self.offset * 1000:+.1f}ms (±{self.error * 1000:.1f}ms)，"
+            f"往返时间 最小 {min(self.rtts) * 1000:.1f}ms / "
+            f"中位数 {statistics.median(self.rtts) * 1000:.1f}ms"
+        )
+
+
+def sample_server_time(session, url=CLOCK_SYNC_URL):
+    """
+    发送一次请求并读取服务器时间
+
+    Returns:
+        tuple: (发送时的本地时间, 收到响应时的本地时间, 服务器时间)
+    """
+    t_send = time.time()
+    response = session.head(url, allow_redirects=False)
+    t_recv = time.time()
+    server_time = parsedate_to_datetime(response.headers["Date"]).timestamp()
+    return t_send, t_recv, server_time
+
+
+def estimate_clock_offset(session, samples=DEFAULT_SAMPLES, url=CLOCK_SYNC_URL):
+    """
+    根据多次采样的Date响应头估计本地时钟与服务器时钟的偏差
+
+    Date只精确到秒：服务器在本地时间[t_send, t_recv]内的某一时刻处理请求，
+    该时刻的服务器时间落在[D, D+1)，所以偏差落在[D - t_recv, D + 1 - t_send)。
+    每次采样都把请求安排在当前估计的服务器整秒跳变附近发出，
+    多个区间取交集后误差可以缩小到接近单程延迟的抖动
+
+    Args:
+        session: 请求会话
+        samples: 采样次数
+        url: 采样地址
+
+    Returns:
+        ClockOffset: 偏差估计
+    """
+    lower, upper = -math.inf, math.inf
+    rtts = []
+
+    for _ in range(samples):
+        if rtts and math.isfinite(lower):
+            # 让请求到达服务器的时刻对准当前估计的服务器整秒跳变
+            estimate = (lower + upper) / 2
+            arrival = time.time() + 0.05 + min(rtts) / 2
+            boundary = math.ceil(arrival + estimate)
+            time.sleep(max(0, boundary - estimate - min(rtts) / 2 - time.time()))
+
+        t_send, t_recv, server_time = sample_server_time(session, url)
+        rtts.append(t_recv - t_send)
+        sample_lower = server_time - t_recv
+        sample_upper = server_time + 1 - t_send
+
+        if sample_lower > upper or sample_upper < lower:
+            # 与之前的采样矛盾（服务器时间抖动或时钟被调整），重新开始估计
+            logging.warning("服务器时间采样结果不一致，重新估计时钟偏差")
+            lower, upper = sample_lower, sample_upper
+        else:
+            lower = max(lower, sample_lower)
+            upper = min(upper, sample_upper)
+
+    return ClockOffset(lower, upper, rtts)
+
+
+def wait_until_local_time(local_timestamp):
+    """等待到指定的本地时间，最后一秒缩短休眠间隔以减少唤醒误差"""
+    while True:
+        remaining = local_timestamp - time.time()
+        if remaining <= 0:
+            return
+        if remaining > 1:
+            time.sleep(min(remaining - 1, 1))
+        else:
+            time.sleep(min(remaining, 0.001))
+
+
+def get_fire_time(server_timestamp, clock_offset):
+    """
+    计算让请求恰好在服务器时间server_timestamp到达服务器的本地发送时间
+
+    Args:
+        server_timestamp: 服务器时间戳
+        clock_offset: 时钟偏差估计
+
+    Returns:
+        float: 本地时间戳
+    """
+    return clock_offset.to_local_time(server_timestamp) - clock_offset.one_way_latency
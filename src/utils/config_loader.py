@@ -0,0 +1,30 @@
+import json
+
+# 配置文件路径
+CONFIG_FILE = "config.json"
+
+# 多账号运行时每个进程使用自己的配置，不再读取config.json
+_config_override = None
+
+
+def set_config(config):
+    """设置当前进程使用的配置，之后读取配置都返回该配置"""
+    global _config_override
+    _config_override = config
+
+
+def load_config():
+    """
+    读取当前进程使用的配置
+
+    Returns:
+        dict: 配置内容
+
+    Raises:
+        FileNotFoundError: 没有设置配置且config.json不存在时
+        ValueError: config.json格式错误时
+    """
+    if _config_override is not None:
+        return _config_override
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,4 +1,3 @@
-import requests
 import json
 import time
 import hmac
@@ -7,13 +6,15 @@ import urllib
 import base64
 import urllib.parse
 import logging
+from src.utils.session_manager import get_notify_session
+from src.utils.config_loader import load_config
+from src.utils.fast_json import decode_response
 
 
 # 读取config.json获取钉钉webhook和secret
 def get_dingtalk_config():
     try:
-        with open("config.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = load_config()
         webhook = config.get("dingtalk_webhook")
         secret = config.get("dingtalk_secret")
         if not webhook:
@@ -70,12 +71,12 @@ def dingtalk(title, content):
 
         if not isinstance(dingtalk_webhook, str):
             return {"error": "钉钉webhook未配置"}
-        response = requests.post(
+        response = get_notify_session().post(
             dingtalk_webhook, headers=headers, data=json.dumps(payload)
         )
 
         try:
-            data = response.json()
+            data = decode_response(response)
             if response.status_code == 200 and data.get("errcode") == 0:
                 logging.info("钉钉发送通知消息成功🎉")
             else:
@@ -83,7 +84,7 @@ def dingtalk(title, content):
         except Exception as e:
             logging.error(f"钉钉发送通知消息失败😞\n{e}")
 
-        return response.json()
+        return decode_response(response)
     except Exception as e:
         logging.error(f"钉钉发送通知消息失败😞\n{e}")
 
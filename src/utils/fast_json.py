@@ -0,0 +1,74 @@
+import json
+import logging
+
+# 按速度从快到慢排列的JSON解析库，使用第一个可以导入的
+BACKEND_PRIORITY = ["orjson", "ujson", "rapidjson", "json"]
+
+
+def _import_loads(name):
+    """导入指定解析库的loads函数，未安装时返回None"""
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return module.loads
+
+
+def available_backends():
+    """
+    获取已安装的JSON解析库
+
+    Returns:
+        dict: 解析库名称到loads函数的映射，按速度从快到慢排列
+    """
+    backends = {}
+    for name in BACKEND_PRIORITY:
+        loads = _import_loads(name)
+        if loads is not None:
+            backends[name] = loads
+    return backends
+
+
+def set_backend(name=None):
+    """
+    设置使用的JSON解析库
+
+    Args:
+        name: 解析库名称，默认使用已安装的最快的解析库
+    """
+    global BACKEND, _loads
+    backends = available_backends()
+    if name is None:
+        name = next(iter(backends))
+    elif name not in backends:
+        raise ValueError(f"JSON解析库 {name} 未安装，可用: {', '.join(backends)}")
+    BACKEND, _loads = name, backends[name]
+    logging.debug(f"使用 {BACKEND} 解析JSON")
+
+
+BACKEND = None
+_loads = None
+set_backend()
+
+
+def loads(data):
+    """使用当前的解析库解析JSON，data可以是bytes或str"""
+    return _loads(data)
+
+
+def decode_response(response):
+    """
+    把响应内容解析为JSON
+
+    直接解析response.content的字节，不经过response.text的编码检测和解码；
+    快速解析库解析失败时（例如响应不是UTF-8编码）退回到标准库解析response.text
+
+    Raises:
+        ValueError: 响应内容不是合法的JSON时
+    """
+    try:
+        return _loads(response.content)
+    except ValueError:
+        if BACKEND == "json":
+            raise
+    return json.loads(response.text)
@@ -2,16 +2,17 @@ import time
 import hmac
 import hashlib
 import base64
-import requests
 import json
 import logging
+from src.utils.session_manager import get_notify_session
+from src.utils.config_loader import load_config
+from src.utils.fast_json import decode_response
 
 
 # 读取config.json获取飞书webhook和secret
 def get_feishu_config():
     try:
-        with open("config.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = load_config()
         webhook = config.get("feishu_webhook")
         secret = config.get("feishu_secret")
         if not webhook:
@@ -68,8 +69,10 @@ def feishu(title: str, content: str) -> dict:
     try:
         if not isinstance(feishu_webhook, str):
             return {"error": "飞书webhook未配置"}
-        response = requests.post(feishu_webhook, headers=headers, data=json.dumps(msg))
-        return response.json()
+        response = get_notify_session().post(
+            feishu_webhook, headers=headers, data=json.dumps(msg)
+        )
+        return decode_response(response)
     except Exception as e:
         return {"error": str(e)}
 
@@ -0,0 +1,42 @@
+import os
+import json
+import logging
+
+# 缓存文件所在目录，多账号同时运行时每个账号使用各自的子目录
+CACHE_DIR = "cache"
+_cache_dir = CACHE_DIR
+
+
+def set_cache_dir(path):
+    """设置当前进程的缓存目录，之后读写的缓存文件都在该目录下"""
+    global _cache_dir
+    _cache_dir = path
+
+
+def get_cache_path(filename):
+    """当前进程缓存目录下的文件路径"""
+    return os.path.join(_cache_dir, filename)
+
+
+def load_json(path, default=None):
+    """读取JSON文件，文件不存在或损坏时返回default"""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"读取缓存文件 {path} 失败，将忽略该文件: {e}")
+        return default
+
+
+def save_json(path, data):
+    """原子地写入JSON文件，避免写入中途退出导致文件损坏"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    # 多个进程可能同时写同一个文件，临时文件按进程区分
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
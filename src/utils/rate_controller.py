@@ -0,0 +1,265 @@
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+from src.utils.config_loader import load_config
+from src.utils.session_manager import BASE_URL, add_response_observer
+
+# 各选课模式的请求间隔预设（秒）：
+#   initial_interval: 初始间隔
+#   min_interval / max_interval: 间隔的下限和上限，即最高和最低请求速率
+#   additive_step: 每次请求正常时间隔减少的量
+#   backoff_factor: 服务器过载时间隔乘以的倍数
+#   min_backoff: 间隔为0时过载后至少退避到的间隔
+MODE_PRESETS = {
+    "fast": {
+        "initial_interval": 0,
+        "min_interval": 0,
+        "max_interval": 5,
+        "additive_step": 0.05,
+        "backoff_factor": 2,
+        "min_backoff": 0.2,
+    },
+    "normal": {
+        "initial_interval": 5,
+        "min_interval": 3,
+        "max_interval": 30,
+        "additive_step": 0.25,
+        "backoff_factor": 2,
+        "min_backoff": 3,
+    },
+    "snipe": {
+        "initial_interval": 2,
+        "min_interval": 1,
+        "max_interval": 15,
+        "additive_step": 0.1,
+        "backoff_factor": 2,
+        "min_backoff": 1,
+    },
+    "watch": {
+        "initial_interval": 1,
+        "min_interval": 0.5,
+        "max_interval": 10,
+        "additive_step": 0.05,
+        "backoff_factor": 2,
+        "min_backoff": 1,
+    },
+}
+# 并发模式的节奏与高速模式相同
+MODE_PRESETS["concurrent"] = MODE_PRESETS["fast"]
+# 单个接口的请求间隔预设，服务器正常时不限速，只在该接口过载时退避
+ENDPOINT_PRESET = MODE_PRESETS["fast"]
+
+# 响应时间超过该值（秒）或超过历史最短响应时间的LATENCY_FACTOR倍时认为服务器过载
+LATENCY_THRESHOLD = 3.0
+LATENCY_FACTOR = 5
+
+# 出现这些内容说明服务器过载或限流
+CONGESTION_KEYWORDS = ("频繁", "繁忙", "稍后", "过多", "超时", "拥挤")
+
+# 教务系统的主机，只对发往该主机的请求调整速率
+SERVER_HOST = urlparse(BASE_URL).netloc
+# 整体选课节奏的控制器名，所有接口的请求结果都会影响它
+PACING = "选课节奏"
+
+# 各接口的速率控制器
+_controllers = {}
+_controllers_lock = threading.Lock()
+_presets = {"pacing": dict(MODE_PRESETS["fast"]), "endpoint": dict(ENDPOINT_PRESET)}
+_observing = False
+
+
+def is_congestion_message(message):
+    """判断服务器返回的消息是否表示过载或限流"""
+    return bool(message) and any(k in str(message) for k in CONGESTION_KEYWORDS)
+
+
+class RateController:
+    """
+    按加性减、乘性增（AIMD）调整单个接口的请求间隔：
+    请求正常时间隔每次减少additive_step，逐步逼近最高速率；
+    出现HTTP错误、请求异常、响应过慢或服务器提示繁忙时间隔翻倍，迅速退避
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        initial_interval=0,
+        min_interval=0,
+        max_interval=5,
+        additive_step=0.05,
+        backoff_factor=2,
+        min_backoff=0.2,
+    ):
+        self.endpoint = endpoint
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.additive_step = additive_step
+        self.backoff_factor = backoff_factor
+        self.min_backoff = min_backoff
+        self.interval = min(max(initial_interval, min_interval), max_interval)
+        self.min_latency = None
+        self.requests = 0
+        self.congestions = 0
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """当前允许的请求速率（次/秒），间隔为0时不限速"""
+        return 1 / self.interval if self.interval else float("inf")
+
+    def wait(self):
+        """等待到下一个允许发送请求的时刻，多个线程共用时按间隔依次放行"""
+        with self._lock:
+            now = time.time()
+            send_time = max(now, self._next_time)
+            self._next_time = send_time + self.interval
+        if send_time > now:
+            time.sleep(send_time - now)
+
+    def record(self, latency=None, ok=True):
+        """
+        记录一次请求的结果并调整间隔
+
+        Args:
+            latency: 响应时间（秒），请求异常时为None
+            ok: 请求是否正常完成（没有异常、HTTP状态码不是429或5xx）
+
+        Returns:
+            bool: 本次请求是否被判断为服务器过载
+        """
+        with self._lock:
+            self.requests += 1
+            congested = not ok
+            if latency is not None:
+                if self.min_latency is None or latency < self.min_latency:
+                    self.min_latency = latency
+                if latency > max(LATENCY_THRESHOLD, self.min_latency * LATENCY_FACTOR):
+                    congested = True
+        self.adjust(congested)
+        return congested
+
+    def adjust(self, congested):
+        """过载时退避，否则减少请求间隔"""
+        if congested:
+            self.backoff()
+            return
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval - self.additive_step)
+
+    def backoff(self):
+        """服务器过载，按倍数增加请求间隔"""
+        with self._lock:
+            self.congestions += 1
+            previous = self.interval
+            self.interval = min(
+                self.max_interval,
+                max(self.interval * self.backoff_factor, self.min_backoff),
+            )
+            interval = self.interval
+        if interval != previous:
+            logging.warning(
+                f"【{self.endpoint}】接口响应异常，请求间隔从 {previous:.2f} 秒增加到 {interval:.2f} 秒"
+            )
+
+    def snapshot(self):
+        return {
+            "endpoint": self.endpoint,
+            "interval": self.interval,
+            "requests": self.requests,
+            "congestions": self.congestions,
+            "min_latency": self.min_latency,
+        }
+
+
+def get_endpoint(url):
+    """取请求地址的最后一段作为接口名，例如 ggxxkxkOper、xsxkGgxxkxk"""
+    return urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def observe_response(url, latency, status_code, error):
+    """会话每完成一次教务系统请求时调用，按接口记录响应时间和是否出错"""
+    if urlparse(url).netloc != SERVER_HOST:
+        return
+    ok = error is None and status_code != 429 and status_code < 500
+    congested = get_rate_controller(get_endpoint(url)).record(
+        latency if error is None else None, ok
+    )
+    get_rate_controller(PACING).adjust(congested)
+
+
+def report_message(url, message):
+    """服务器返回的消息提示繁忙或限流时退避该接口和整体节奏"""
+    if is_congestion_message(message):
+        get_rate_controller(get_endpoint(url)).backoff()
+        get_rate_controller(PACING).backoff()
+
+
+def get_rate_config(mode):
+    """
+    获取选课模式的速率预设，config.json的rate_control中的配置优先
+
+    rate_control中的配置项覆盖整体选课节奏的预设，其中的endpoint覆盖单个接口的预设
+
+    Args:
+        mode: 选课模式
+
+    Returns:
+        dict: {"pacing": 整体选课节奏的预设, "endpoint": 单个接口的预设}
+    """
+    pacing = dict(MODE_PRESETS.get(mode, MODE_PRESETS["fast"]))
+    endpoint = dict(ENDPOINT_PRESET)
+    try:
+        rate_control = dict(load_config().get("rate_control") or {})
+    except (FileNotFoundError, ValueError):
+        rate_control = {}
+    endpoint.update(rate_control.pop("endpoint", None) or {})
+    pacing.update(rate_control)
+    return {"pacing": pacing, "endpoint": endpoint}
+
+
+def configure_rate_controllers(mode):
+    """按选课模式重新设置所有接口的速率控制器，并开始记录每个请求的结果"""
+    global _presets, _observing
+    with _controllers_lock:
+        _presets = get_rate_config(mode)
+        _controllers.clear()
+        if not _observing:
+            add_response_observer(observe_response)
+            _observing = True
+    pacing = _presets["pacing"]
+    logging.info(
+        f"选课间隔: 初始 {pacing['initial_interval']} 秒，"
+        f"范围 {pacing['min_interval']}-{pacing['max_interval']} 秒，根据服务器响应自动调整"
+    )
+
+
+def get_rate_controller(endpoint):
+    """获取接口的速率控制器，不存在时按当前预设创建"""
+    with _controllers_lock:
+        controller = _controllers.get(endpoint)
+        if controller is None:
+            preset = _presets["pacing" if endpoint == PACING else "endpoint"]
+            controller = RateController(endpoint, **preset)
+            _controllers[endpoint] = controller
+        return controller
+
+
+def get_pacing_interval():
+    """两轮选课之间的间隔（秒）"""
+    return get_rate_controller(PACING).interval
+
+
+def pause():
+    """按整体节奏在两轮选课之间休眠，返回休眠的秒数"""
+    interval = get_pacing_interval()
+    if interval:
+        time.sleep(interval)
+    return interval
+
+
+def get_rate_stats():
+    """获取所有接口的请求数、过载次数和当前间隔"""
+    with _controllers_lock:
+        return [c.snapshot() for c in _controllers.values()]
@@ -1,9 +1,260 @@
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import time
 import threading
+import logging
+from src.utils.config_loader import load_config
 
 # 全局session变量
 _session = None
 _session_lock = threading.Lock()
+# 通知专用session，避免每次通知都重新建立连接
+_notify_session = None
+# 同一账号的多个已登录会话
+_session_pool = None
+# 会话失效时的回调，例如让心跳线程立即重新登录
+_unhealthy_callbacks = []
+# 每个请求完成后的回调，例如按接口调整请求速率
+_response_observers = []
+
+# 教务系统地址，预热连接时使用
+BASE_URL = "http://zhjw.qfnu.edu.cn/"
+
+# 连接池默认配置，可在config.json中覆盖
+DEFAULT_POOL_CONFIG = {
+    "pool_connections": 4,  # 缓存连接池的主机数
+    "pool_maxsize": 20,  # 每个主机最多保持的连接数
+    "max_retries": 2,  # 建立连接失败时的重试次数
+    "timeout": 10,  # 请求超时时间（秒）
+    "warm_connections": 5,  # 预热时建立的空闲连接数
+    "session_pool_size": 1,  # 同一账号同时保持登录的会话数
+    "session_pool_strategy": "round_robin",  # 会话分配策略: round_robin 或 least_loaded
+    "heartbeat_interval": 30,  # 检查登录状态的间隔（秒），0 表示不检查
+}
+
+# 模拟浏览器的默认请求头
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Connection": "keep-alive",
+}
+
+
+class TimeoutSession(Session):
+    """
+    为所有请求设置默认超时时间的会话，请求时显式指定timeout仍然优先
+
+    同时记录正在进行的请求数，供会话池按负载分配会话
+    """
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.timeout = timeout
+        self.in_flight = 0
+        self.healthy = True
+        # 为True时会话失效后由心跳在原会话上重新登录，会话池不再为它补充新会话
+        self.external_recovery = False
+        self._in_flight_lock = threading.Lock()
+        self._environment_settings = {}
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._in_flight_lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        response = error = None
+        try:
+            response = super().request(method, url, **kwargs)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+            if _response_observers:
+                _notify_response_observers(
+                    url,
+                    time.perf_counter() - start,
+                    response.status_code if response is not None else None,
+                    error,
+                )
+
+    def merge_environment_settings(self, url, proxies, stream, verify, cert):
+        # 每次请求都要遍历环境变量查找代理设置，占了单次请求本地开销的大部分；
+        # 运行期间环境变量不会变化，没有显式指定代理时按主机缓存结果
+        if proxies:
+            return super().merge_environment_settings(
+                url, proxies, stream, verify, cert
+            )
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc, stream, verify, cert)
+        settings = self._environment_settings.get(key)
+        if settings is None:
+            settings = super().merge_environment_settings(
+                url, proxies, stream, verify, cert
+            )
+            self._environment_settings[key] = settings
+        return dict(settings, proxies=dict(settings["proxies"]))
+
+
+class SessionPool:
+    """
+    同一账号的多个独立登录的会话，每个会话有自己的JSESSIONID和连接池
+
+    不健康的会话会被移出会话池，并在后台重新登录补充；由心跳负责恢复的会话
+    （external_recovery）只移出不补充，恢复后由心跳放回会话池
+    """
+
+    def __init__(self, sessions, size, factory, strategy="round_robin"):
+        """
+        Args:
+            sessions: 已登录的会话列表
+            size: 会话池的目标大小
+            factory: 创建一个新的已登录会话的函数
+            strategy: 分配策略，round_robin 轮流分配，least_loaded 分配正在进行请求最少的会话
+        """
+        self.size = size
+        self.factory = factory
+        self.strategy = strategy
+        self._sessions = list(sessions)
+        self._next = 0
+        self._replenishing = 0
+        # 移出会话池、正在由心跳恢复的会话
+        self._recovering = set()
+        self._lock = threading.Lock()
+
+    def get(self):
+        """分配一个会话，会话池为空时返回None"""
+        with self._lock:
+            if not self._sessions:
+                return None
+            if self.strategy == "least_loaded":
+                return min(self._sessions, key=lambda s: s.in_flight)
+            session = self._sessions[self._next % len(self._sessions)]
+            self._next += 1
+            return session
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def retire(self, session):
+        """移除不健康的会话，由心跳恢复的会话等待放回，其余会话在后台补充新的会话"""
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.remove(session)
+            if session.external_recovery:
+                self._recovering.add(session)
+        session.healthy = False
+        logging.warning(
+            f"会话已失效，移出会话池，当前可用会话数: {len(self._sessions)}/{self.size}"
+        )
+        if not session.external_recovery:
+            self.replenish()
+
+    def restore(self, session):
+        """把恢复登录的会话放回会话池"""
+        with self._lock:
+            self._recovering.discard(session)
+            if session in self._sessions:
+                return
+            self._sessions.append(session)
+        logging.info(
+            f"会话已恢复，放回会话池，当前可用会话数: {len(self._sessions)}/{self.size}"
+        )
+
+    def replenish(self):
+        """在后台登录新的会话，直到会话池达到目标大小"""
+        with self._lock:
+            missing = (
+                self.size
+                - len(self._sessions)
+                - self._replenishing
+                - len(self._recovering)
+            )
+            self._replenishing += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._add_session, daemon=True).start()
+
+    def _add_session(self):
+        try:
+            session = self.factory()
+            with self._lock:
+                self._sessions.append(session)
+            logging.info(
+                f"已补充一个新的登录会话，当前可用会话数: {len(self._sessions)}/{self.size}"
+            )
+        except Exception as e:
+            logging.error(f"补充登录会话失败: {e}")
+        finally:
+            with self._lock:
+                self._replenishing -= 1
+
+
+def add_response_observer(callback):
+    """
+    注册每个请求完成后的回调
+
+    回调参数为(url, 耗时秒数, HTTP状态码, 异常)，请求异常时状态码为None
+    """
+    _response_observers.append(callback)
+
+
+def _notify_response_observers(url, latency, status_code, error):
+    for callback in list(_response_observers):
+        try:
+            callback(url, latency, status_code, error)
+        except Exception as e:
+            logging.debug(f"处理请求回调时出错: {e}")
+
+
+def get_pool_config():
+    """读取config.json中的连接池配置，未配置的项使用默认值"""
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+    try:
+        config = load_config()
+        for key in DEFAULT_POOL_CONFIG:
+            if config.get(key) not in (None, ""):
+                pool_config[key] = config[key]
+    except (FileNotFoundError, ValueError):
+        pass
+    return pool_config
+
+
+def create_session():
+    """创建挂载了连接池配置的会话"""
+    pool_config = get_pool_config()
+    session = TimeoutSession(timeout=pool_config["timeout"])
+    # 只重试建立连接阶段的失败，已发出的选课请求不重试
+    retries = Retry(
+        total=pool_config["max_retries"],
+        connect=pool_config["max_retries"],
+        read=0,
+        status=0,
+        backoff_factor=0.1,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_config["pool_connections"],
+        pool_maxsize=pool_config["pool_maxsize"],
+        max_retries=retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def create_browser_session():
+    """创建带有浏览器请求头的会话"""
+    session = create_session()
+    session.headers.update(DEFAULT_HEADERS)
+    return session
 
 
 def init_session():
@@ -11,26 +262,85 @@ def init_session():
     global _session
     with _session_lock:
         if _session is None:
-            _session = Session()
-            _session.headers.update(
-                {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                    "Connection": "keep-alive",
-                }
-            )
+            _session = create_browser_session()
         return _session
 
 
 def get_session():
-    """获取当前会话，如果不存在则初始化"""
+    """获取当前会话，如果不存在则初始化；启用会话池时从会话池中分配"""
     global _session
+    if _session_pool is not None:
+        session = _session_pool.get()
+        if session is not None:
+            return session
     if _session is None:
         return init_session()
     return _session
 
 
+def init_session_pool(size, factory, strategy=None):
+    """
+    启用会话池，当前的全局会话作为第一个会话，其余会话在后台登录
+
+    Args:
+        size: 会话池大小
+        factory: 创建一个新的已登录会话的函数
+        strategy: 分配策略，默认使用配置中的session_pool_strategy
+    """
+    global _session_pool
+    strategy = strategy or get_pool_config()["session_pool_strategy"]
+    _session_pool = SessionPool([init_session()], size, factory, strategy)
+    logging.info(f"启用会话池，目标会话数: {size}，分配策略: {strategy}")
+    _session_pool.replenish()
+    return _session_pool
+
+
+def get_all_sessions():
+    """获取所有可用的会话"""
+    if _session_pool is not None:
+        sessions = _session_pool.sessions()
+        if sessions:
+            return sessions
+    return [get_session()]
+
+
+def on_session_unhealthy(callback):
+    """注册会话失效时的回调，回调参数为失效的会话"""
+    _unhealthy_callbacks.append(callback)
+
+
+def mark_session_unhealthy(session):
+    """
+    标记会话已失效（例如登录状态异常），启用会话池时将其移出
+
+    由心跳负责恢复的会话只由心跳重新登录，恢复后调用restore_pooled_session放回；
+    其余会话由会话池在后台补充新会话，同一次失效只会重新登录一次
+    """
+    session.healthy = False
+    for callback in list(_unhealthy_callbacks):
+        try:
+            callback(session)
+        except Exception as e:
+            logging.error(f"处理会话失效回调时出错: {e}")
+    if _session_pool is not None:
+        _session_pool.retire(session)
+
+
+def restore_pooled_session(session):
+    """心跳恢复会话后调用，启用会话池时把会话放回会话池"""
+    if _session_pool is not None:
+        _session_pool.restore(session)
+
+
+def get_notify_session():
+    """获取发送钉钉、飞书通知使用的会话"""
+    global _notify_session
+    with _session_lock:
+        if _notify_session is None:
+            _notify_session = create_session()
+        return _notify_session
+
+
 def reset_session():
     """重置会话"""
     global _session
@@ -38,3 +348,73 @@ def reset_session():
         if _session is not None:
             _session.close()
         _session = None
+
+
+def warm_connections(count=None, session=None, url=BASE_URL, timeout=None):
+    """
+    提前建立count个到教务系统的空闲长连接，选课时不必再等待连接建立
+
+    Args:
+        count: 连接数，默认使用配置中的warm_connections，0 表示不预热
+        session: 要预热的会话，默认使用全局会话
+        url: 预热请求的地址
+        timeout: 每个预热请求的超时时间（秒），默认使用会话的超时时间
+
+    Returns:
+        int: 成功的预热请求数
+    """
+    if count is None:
+        count = get_pool_config()["warm_connections"]
+    count = int(count)
+    if count <= 0:
+        return 0
+    session = session or get_session()
+
+    def head(_):
+        try:
+            if timeout is None:
+                session.head(url, allow_redirects=False)
+            else:
+                session.head(url, allow_redirects=False, timeout=timeout)
+            return True
+        except Exception as e:
+            logging.debug(f"预热连接失败: {e}")
+            return False
+
+    # 同时发出count个请求，连接池会为它们各建立一个连接，请求结束后连接保持空闲
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        succeeded = sum(executor.map(head, range(count)))
+    logging.info(
+        f"已预热 {succeeded}/{count} 个连接，连接池状态: {get_pool_stats(session)}"
+    )
+    return succeeded
+
+
+def get_pool_stats(session=None):
+    """
+    获取会话连接池的状态
+
+    Returns:
+        list: 每个主机连接池的状态，包含主机、已建立连接数、处理请求数和空闲连接数
+    """
+    session = session or get_session()
+    stats = []
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            stats.append(
+                {
+                    "host": f"{pool.host}:{pool.port}",
+                    "num_connections": pool.num_connections,
+                    "num_requests": pool.num_requests,
+                    "idle_connections": sum(
+                        1 for conn in list(pool.pool.queue) if conn is not None
+                    ),
+                    "maxsize": pool.pool.maxsize,
+                }
+            )
+    return stats